@@ -0,0 +1,26 @@
+"""Add content_hash to validation_requests
+
+Revision ID: 003_add_content_hash
+Revises: 002_add_filename_filesize
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '003_add_content_hash'
+down_revision = '002_add_filename_filesize'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('validation_requests', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_validation_requests_content_hash', 'validation_requests', ['content_hash'])
+
+
+def downgrade():
+    op.drop_index('ix_validation_requests_content_hash', table_name='validation_requests')
+    op.drop_column('validation_requests', 'content_hash')
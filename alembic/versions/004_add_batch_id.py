@@ -0,0 +1,26 @@
+"""Add batch_id to validation_requests
+
+Revision ID: 004_add_batch_id
+Revises: 003_add_content_hash
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004_add_batch_id'
+down_revision = '003_add_content_hash'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('validation_requests', sa.Column('batch_id', sa.String(), nullable=True))
+    op.create_index('ix_validation_requests_batch_id', 'validation_requests', ['batch_id'])
+
+
+def downgrade():
+    op.drop_index('ix_validation_requests_batch_id', table_name='validation_requests')
+    op.drop_column('validation_requests', 'batch_id')
@@ -0,0 +1,35 @@
+"""Add validation_result_cache table
+
+Revision ID: 005_add_result_cache
+Revises: 004_add_batch_id
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '005_add_result_cache'
+down_revision = '004_add_batch_id'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('validation_result_cache',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('config_version', sa.String(length=64), nullable=False),
+        sa.Column('overall_status', sa.String(), nullable=False),
+        sa.Column('checks', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('issues', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('created_at', sa.TIMESTAMP(), nullable=False),
+        sa.PrimaryKeyConstraint('content_hash', 'config_version')
+    )
+    op.create_index('ix_validation_result_cache_config_version', 'validation_result_cache', ['config_version'])
+
+
+def downgrade():
+    op.drop_index('ix_validation_result_cache_config_version', table_name='validation_result_cache')
+    op.drop_table('validation_result_cache')
@@ -0,0 +1,24 @@
+"""Add perceptual_hash to validation_result_cache
+
+Revision ID: 006_add_perceptual_hash
+Revises: 005_add_result_cache
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006_add_perceptual_hash'
+down_revision = '005_add_result_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('validation_result_cache', sa.Column('perceptual_hash', sa.String(length=16), nullable=True))
+
+
+def downgrade():
+    op.drop_column('validation_result_cache', 'perceptual_hash')
@@ -0,0 +1,43 @@
+"""Add callback_url and webhook_deliveries outbox
+
+Revision ID: 007_add_webhooks
+Revises: 006_add_perceptual_hash
+Create Date: 2026-10-16 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '007_add_webhooks'
+down_revision = '006_add_perceptual_hash'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('validation_requests', sa.Column('callback_url', sa.String(length=2048), nullable=True))
+    op.create_table('webhook_deliveries',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('request_id', sa.String(), nullable=False),
+        sa.Column('url', sa.String(length=2048), nullable=False),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.TIMESTAMP(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.TIMESTAMP(), nullable=False),
+        sa.Column('delivered_at', sa.TIMESTAMP(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_webhook_deliveries_request_id', 'webhook_deliveries', ['request_id'])
+    op.create_index('ix_webhook_deliveries_status_next_attempt', 'webhook_deliveries', ['status', 'next_attempt_at'])
+
+
+def downgrade():
+    op.drop_index('ix_webhook_deliveries_status_next_attempt', table_name='webhook_deliveries')
+    op.drop_index('ix_webhook_deliveries_request_id', table_name='webhook_deliveries')
+    op.drop_table('webhook_deliveries')
+    op.drop_column('validation_requests', 'callback_url')
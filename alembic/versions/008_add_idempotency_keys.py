@@ -0,0 +1,31 @@
+"""Add idempotency_keys table
+
+Revision ID: 008_add_idempotency_keys
+Revises: 007_add_webhooks
+Create Date: 2026-10-16 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008_add_idempotency_keys'
+down_revision = '007_add_webhooks'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('idempotency_keys',
+        sa.Column('key_hash', sa.String(length=64), nullable=False),
+        sa.Column('request_id', sa.String(length=36), nullable=False),
+        sa.Column('expires_at', sa.TIMESTAMP(), nullable=False),
+        sa.PrimaryKeyConstraint('key_hash')
+    )
+    op.create_index('ix_idempotency_keys_expires_at', 'idempotency_keys', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_idempotency_keys_expires_at', table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
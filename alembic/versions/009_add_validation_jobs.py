@@ -0,0 +1,42 @@
+"""Add validation_jobs queue table
+
+Revision ID: 009_add_validation_jobs
+Revises: 008_add_idempotency_keys
+Create Date: 2026-10-17 01:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009_add_validation_jobs'
+down_revision = '008_add_idempotency_keys'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('validation_jobs',
+        sa.Column('request_id', sa.String(length=36), nullable=False),
+        sa.Column('file_path', sa.String(), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=True),
+        sa.Column('priority', sa.String(length=16), nullable=False),
+        sa.Column('tenant', sa.String(length=64), nullable=False),
+        sa.Column('deadline', sa.Float(), nullable=True),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('available_at', sa.TIMESTAMP(), nullable=False),
+        sa.Column('locked_by', sa.String(length=128), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.TIMESTAMP(), nullable=False),
+        sa.PrimaryKeyConstraint('request_id')
+    )
+    op.create_index(
+        'ix_validation_jobs_status_available', 'validation_jobs', ['status', 'priority', 'available_at']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_validation_jobs_status_available', table_name='validation_jobs')
+    op.drop_table('validation_jobs')
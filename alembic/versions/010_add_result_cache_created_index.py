@@ -0,0 +1,26 @@
+"""Add config_version/created_at index to validation_result_cache
+
+Revision ID: 010_add_result_cache_created_index
+Revises: 009_add_validation_jobs
+Create Date: 2026-10-17 02:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010_add_result_cache_created_index'
+down_revision = '009_add_validation_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_validation_result_cache_version_created', 'validation_result_cache', ['config_version', 'created_at']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_validation_result_cache_version_created', table_name='validation_result_cache')
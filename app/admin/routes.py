@@ -1285,8 +1285,9 @@ async def get_recent_logs(
 async def clear_application_cache():
     """Очистить кэш приложения"""
     try:
-        # Очищаем кэш performance monitor
-        performance_monitor.clear_cache()
+        # Очищаем кэш результатов валидации
+        from app.core.result_cache import result_cache
+        result_cache.clear()
         
         # Очищаем кэш registry модулей
         from app.cv.checks.registry import check_registry
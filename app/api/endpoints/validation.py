@@ -1,6 +1,12 @@
-from typing import Any
-from fastapi import APIRouter, HTTPException, UploadFile, File, status, BackgroundTasks
-from fastapi.responses import JSONResponse
+from collections import Counter
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+from functools import partial
+from urllib.parse import unquote, urlsplit
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Header, Query, Request, status, BackgroundTasks
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, StreamingResponse
+import hashlib
+import re
 import uuid
 import cv2
 import numpy as np
@@ -8,33 +14,112 @@ from datetime import datetime
 import os
 import time
 import asyncio
-import magic
-import io
-from PIL import Image
 
-from app.api.models.validation import ValidationResponse, ValidationResult
-from app.db.repositories import ValidationRequestRepository
+from app.api.models.validation import (
+    BatchResult, BatchValidationResponse, CancellationResponse, NearDuplicatePolicy, Priority, ValidationResponse, ValidationResult,
+    to_result_response
+)
+from app.db.repositories import IdempotencyKeyRepository, ValidationRequestRepository
 from app.storage.client import storage_client
 from app.core.config import settings
+from app.core.admission import AdmissionRejected, admission_controller
 from app.core.exceptions import FileValidationError, StorageError
+from app.core.executors import run_blocking
+from app.core.image_header import ImageInfo, probe_image_header
+from app.api.ingest import (
+    IngestedUpload, MultipartUpload, aiter_archive_members, is_archive, iter_bytes, iter_upload_file,
+    read_multipart_upload, read_upload_stream
+)
+from app.config.manager import get_config_manager
+from app.core.notifications import TERMINAL_STATUSES, result_notifier
+from app.core.result_cache import NearDuplicate, result_cache
+from app.cv.perceptual_hash import dhash
+from app.cv.decoding import choose_reduction, decode_image
 from app.core.logging import get_logger
-from app.worker.tasks import add_processing_task
+from app.worker.tasks import (
+    active_tasks, add_processing_task, cancel_processing_task, follow_inflight_job, run_inline_validation
+)
+from app.worker.scheduler import DEFAULT_TENANT
+from app.worker.single_flight import inflight_jobs
+from app.worker.frames import create_frame_handle
+from app.worker.webhooks import UnsafeCallbackHost, check_callback_host
 
 logger = get_logger(__name__)
 
 router = APIRouter()
 
-def validate_image_file(content: bytes, filename: str) -> None:
+NEAR_DUPLICATES_DESCRIPTION = (
+    "Handling of re-encoded or resized copies of already validated photos: "
+    "reuse - return the known result, flag - run the checks and report the match, off - skip the lookup "
+    "(default: NEAR_DUPLICATE_POLICY)"
+)
+
+CALLBACK_URL_DESCRIPTION = "URL that receives the final validation result as a POST request (webhook)"
+
+PRIORITY_DESCRIPTION = (
+    "Processing queue: interactive - a user waits for the result, bulk - backfills and imports "
+    "(default: priority of the API key, otherwise interactive; bulk for batches)"
+)
+
+API_KEY_DESCRIPTION = "API key of the caller; may select the default priority (PRIORITY_API_KEYS) and the tenant (TENANT_API_KEYS)"
+
+TENANT_DESCRIPTION = "Tenant the upload is processed for (default: tenant of the API key)"
+
+DEADLINE_DESCRIPTION = (
+    "Milliseconds from now after which the result is no longer needed; "
+    "the job is then dropped with status EXPIRED instead of being processed"
+)
+
+IDEMPOTENCY_KEY_DESCRIPTION = (
+    "Client-generated key of the upload (up to 255 characters); a repeated request with the same key "
+    "and tenant within IDEMPOTENCY_TTL_SECONDS returns the original requestId without processing the upload again"
+)
+
+TENANT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+def photo_form_body(**fields: dict) -> dict:
     """
-    Comprehensive image file validation.
+    OpenAPI request body of a multipart form with a `file` part; the form is
+    parsed by read_photo_form, so FastAPI does not document it by itself.
     """
-    # Check file extension
-    allowed_extensions = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tiff', '.tif')
-    if not filename.lower().endswith(allowed_extensions):
+    return {"requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["file"],
+            "properties": {
+                "file": {"type": "string", "format": "binary", "description": "Photo file for validation"},
+                **fields,
+            },
+        }}},
+    }}
+
+ALLOWED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tiff', '.tif')
+
+def validate_filename(filename: str) -> None:
+    """
+    Checks the upload file extension.
+    """
+    if not filename.lower().endswith(ALLOWED_EXTENSIONS):
         raise FileValidationError(
-            message=f"Unsupported file format. Allowed: {', '.join(allowed_extensions)}",
+            message=f"Unsupported file format. Allowed: {', '.join(ALLOWED_EXTENSIONS)}",
             code="INVALID_FILE_FORMAT"
         )
+
+def validate_image_header(
+    content: bytes,
+    filename: str,
+    image_info: Optional[ImageInfo] = None
+) -> ImageInfo:
+    """
+    Validates file name, size, format and dimensions without decoding pixels.
+
+    image_info may carry a header already parsed while the upload was streamed.
+    """
+    # Check file extension
+    validate_filename(filename)
     
     # Check file size
     if len(content) > settings.MAX_FILE_SIZE_BYTES:
@@ -50,113 +135,492 @@ def validate_image_file(content: bytes, filename: str) -> None:
             code="FILE_TOO_SMALL"
         )
     
-    # Check MIME type via python-magic
-    try:
-        mime_type = magic.from_buffer(content, mime=True)
-        allowed_mime_types = [
-            'image/jpeg', 'image/jpg', 'image/png', 'image/webp', 
-            'image/bmp', 'image/tiff', 'image/x-ms-bmp'
-        ]
-        if mime_type not in allowed_mime_types:
-            logger.warning(f"Unexpected MIME type: {mime_type}, but continuing validation")
-    except Exception as e:
-        logger.warning(f"Could not determine MIME type: {e}")
-    
-    # Check image decodability
+    # Read format and dimensions from the container header (no pixel decode)
+    if image_info is None:
+        image_info = probe_image_header(content)
+    if image_info is None:
+        raise FileValidationError(
+            message="File cannot be decoded as a valid image",
+            code="INVALID_IMAGE_DATA"
+        )
+    if image_info.mime_type not in settings.ALLOWED_MIME_TYPES:
+        raise FileValidationError(
+            message=f"Unsupported image type: {image_info.mime_type}",
+            code="INVALID_FILE_FORMAT"
+        )
+
+    # Check image dimensions before decoding
+    width, height = image_info.width, image_info.height
+    total_pixels = image_info.pixels
+
+    if total_pixels > settings.MAX_IMAGE_PIXELS:
+        raise FileValidationError(
+            message=f"Image is too large: {total_pixels} pixels (max: {settings.MAX_IMAGE_PIXELS})",
+            code="IMAGE_TOO_LARGE"
+        )
+
+    if width < settings.MIN_IMAGE_WIDTH or height < settings.MIN_IMAGE_HEIGHT:
+        raise FileValidationError(
+            message=f"Image dimensions too small: {width}x{height} (min: {settings.MIN_IMAGE_WIDTH}x{settings.MIN_IMAGE_HEIGHT})",
+            code="IMAGE_TOO_SMALL"
+        )
+
+    return image_info
+
+def validate_image_file(
+    content: bytes,
+    filename: str,
+    analysis_target_size: int = 0,
+    image_info: Optional[ImageInfo] = None
+) -> Tuple[np.ndarray, int]:
+    """
+    Comprehensive image file validation.
+
+    Returns the decoded working image and its reduction factor so that it can be
+    handed to the worker without a second decode. JPEGs are decoded at reduced
+    scale when analysis_target_size allows it. image_info may carry a header
+    already parsed while the upload was streamed.
+    """
+    image_info = validate_image_header(content, filename, image_info)
+    return decode_validated_image(content, image_info, analysis_target_size)
+
+def decode_validated_image(
+    content: bytes,
+    image_info: ImageInfo,
+    analysis_target_size: int = 0
+) -> Tuple[np.ndarray, int]:
+    """
+    Decodes an image whose header already passed validation.
+
+    Returns the decoded working image and its reduction factor.
+    """
+    # Decode the image once (same flags as the worker, the frame is reused there)
+    reduction = choose_reduction(image_info.format, image_info.width, image_info.height, analysis_target_size)
     try:
-        # Check via OpenCV
-        nparr = np.frombuffer(content, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        if img is None:
-            raise FileValidationError(
-                message="File cannot be decoded as a valid image",
-                code="INVALID_IMAGE_DATA"
-            )
-        
-        # Check image dimensions
-        height, width = img.shape[:2]
-        total_pixels = height * width
-        
-        if total_pixels > settings.MAX_IMAGE_PIXELS:
-            raise FileValidationError(
-                message=f"Image is too large: {total_pixels} pixels (max: {settings.MAX_IMAGE_PIXELS})",
-                code="IMAGE_TOO_LARGE"
-            )
-        
-        if width < settings.MIN_IMAGE_WIDTH or height < settings.MIN_IMAGE_HEIGHT:
-            raise FileValidationError(
-                message=f"Image dimensions too small: {width}x{height} (min: {settings.MIN_IMAGE_WIDTH}x{settings.MIN_IMAGE_HEIGHT})",
-                code="IMAGE_TOO_SMALL"
-            )
-        
-        # Additional check via PIL for corrupted images
-        try:
-            pil_img = Image.open(io.BytesIO(content))
-            pil_img.verify()
-        except Exception as pil_e:
-            logger.warning(f"PIL verification failed: {str(pil_e)}, but continuing")
-            
-    except FileValidationError:
-        raise
+        img = decode_image(content, reduction)
     except Exception as e:
         raise FileValidationError(
             message=f"Error validating image: {str(e)}",
             code="IMAGE_VALIDATION_ERROR"
         )
 
-@router.post(
-    "/validate",
-    response_model=ValidationResponse,
-    status_code=status.HTTP_202_ACCEPTED,
-    summary="Upload photo for validation",
-    description="Uploads a photo and initiates validation process"
-)
-async def validate_photo(
-    file: UploadFile = File(..., description="Photo file for validation")
-) -> Any:
+    if img is None:
+        raise FileValidationError(
+            message="File cannot be decoded as a valid image",
+            code="INVALID_IMAGE_DATA"
+        )
+
+    return img, reduction
+
+def _validation_http_error(error: FileValidationError) -> HTTPException:
+    """Maps upload validation errors to HTTP errors."""
+    return HTTPException(
+        status_code=(
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            if error.code == "FILE_TOO_LARGE" else status.HTTP_400_BAD_REQUEST
+        ),
+        detail=error.message
+    )
+
+_WAIT_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(ms|s)?\s*$")
+
+def parse_wait(value: Optional[str]) -> float:
     """
-    Endpoint for uploading photo for validation.
+    Parses a long-poll duration such as "30s", "500ms" or "30" (seconds).
+    The result is capped at RESULT_WAIT_MAX_SECONDS.
     """
-    request_id = str(uuid.uuid4())
-    logger.info(f"Received validation request: {request_id}")
+    if not value:
+        return 0.0
+    match = _WAIT_PATTERN.match(value)
+    if not match:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid wait duration, expected e.g. 30s or 500ms"
+        )
+    seconds = float(match.group(1))
+    if match.group(2) == "ms":
+        seconds /= 1000
+    return min(seconds, float(settings.RESULT_WAIT_MAX_SECONDS))
+
+def _format_result_event(result: dict) -> str:
+    """Formats a request state as a server-sent event."""
+    event = "result" if result.get("status") in TERMINAL_STATUSES else "status"
+    data = ValidationResult(**to_result_response(result)).model_dump_json()
+    return f"event: {event}\ndata: {data}\n\n"
+
+async def ingest_upload(filename: Optional[str], chunks: AsyncIterator[bytes]) -> IngestedUpload:
+    """
+    Validates the filename and streams the body with size, header
+    and dimension checks. Pixels are not decoded here.
+    """
+    # Check filename presence
+    if not filename:
+        raise FileValidationError(
+            message="Filename is required",
+            code="MISSING_FILENAME"
+        )
+    validate_filename(filename)
     
+    # Read file content in chunks: size limit, header sniff and hash on the fly
+    upload = await read_upload_stream(chunks, settings.MAX_FILE_SIZE_BYTES)
+    upload.image_info = validate_image_header(upload.content, filename, upload.image_info)
+    return upload
+
+def decode_upload(upload: IngestedUpload) -> Tuple[np.ndarray, int]:
+    """
+    Decodes a validated upload once for the worker.
+
+    Returns:
+        Decoded working image and its reduction factor
+    """
+    processing_config = get_config_manager().get_config().system.processing
+    return decode_validated_image(
+        upload.content,
+        upload.image_info,
+        analysis_target_size=processing_config.analysis_target_size
+    )
+
+def estimate_decoded_megapixels(image_info: ImageInfo) -> float:
+    """Size of the working frame the upload decodes to, in megapixels."""
+    target_size = get_config_manager().get_config().system.processing.analysis_target_size
+    reduction = choose_reduction(image_info.format, image_info.width, image_info.height, target_size)
+    return (image_info.width // reduction) * (image_info.height // reduction) / 1_000_000
+
+def _form_error(name: str, message: str, value: Optional[str] = None) -> RequestValidationError:
+    """Validation error of a form field in FastAPI's 422 format."""
+    return RequestValidationError([{
+        "type": "missing" if value is None else "value_error",
+        "loc": ("body", name),
+        "msg": message,
+        "input": value,
+    }])
+
+async def read_photo_form(request: Request) -> MultipartUpload:
+    """
+    Streams a multipart/form-data body with a `file` part through the ingest
+    checks. The file part is validated and hashed as it arrives instead of
+    being spooled by the form parser, so an oversized or non-image upload is
+    rejected without reading the rest of the body.
+    """
+    form = await read_multipart_upload(
+        request.headers.get("content-type", ""), request.stream(), "file", ingest_upload
+    )
+    if form.upload is None:
+        raise _form_error("file", "Field required")
+    return form
+
+def form_priority(form: MultipartUpload) -> Optional[Priority]:
+    """The optional `priority` form field."""
+    value = form.fields.get("priority") or None
+    if value is None:
+        return None
+    try:
+        return Priority(value)
+    except ValueError:
+        allowed = ", ".join(f"'{priority.value}'" for priority in Priority)
+        raise _form_error("priority", f"Input should be {allowed}", value)
+
+def form_deadline_ms(form: MultipartUpload) -> Optional[int]:
+    """The optional `deadline_ms` form field (milliseconds, at least 1)."""
+    value = form.fields.get("deadline_ms") or None
+    if value is None:
+        return None
+    try:
+        deadline_ms = int(value)
+    except ValueError:
+        raise _form_error("deadline_ms", "Input should be a valid integer", value)
+    if deadline_ms < 1:
+        raise _form_error("deadline_ms", "Input should be greater than or equal to 1", value)
+    return deadline_ms
+
+def _resolve_near_duplicate_policy(policy: Optional[NearDuplicatePolicy]) -> NearDuplicatePolicy:
+    """Returns the request policy or the configured default."""
+    if policy is not None:
+        return policy
+    try:
+        return NearDuplicatePolicy(settings.NEAR_DUPLICATE_POLICY)
+    except ValueError:
+        logger.warning(f"Unknown NEAR_DUPLICATE_POLICY '{settings.NEAR_DUPLICATE_POLICY}', using 'flag'")
+        return NearDuplicatePolicy.FLAG
+
+def find_near_duplicate(image: np.ndarray, policy: NearDuplicatePolicy) -> Optional[NearDuplicate]:
+    """Looks up a previously validated near-identical photo by perceptual hash."""
+    if policy == NearDuplicatePolicy.OFF:
+        return None
+    return result_cache.find_similar(dhash(image), settings.NEAR_DUPLICATE_MAX_DISTANCE)
+
+def _near_duplicate_info(near: NearDuplicate, reused: bool) -> dict:
+    return {"contentHash": near.content_hash, "distance": near.distance, "reused": reused}
+
+def validate_callback_url(callback_url: Optional[str]) -> Optional[str]:
+    """
+    Checks that the webhook URL is an absolute http(s) URL of an allowed host.
+
+    Without WEBHOOK_ALLOWED_HOSTS, loopback, private, link-local and reserved
+    address literals are rejected; host names are checked again after DNS
+    resolution on every delivery (see app.worker.webhooks).
+    """
+    if not callback_url:
+        return None
+    parts = urlsplit(callback_url)
+    if parts.scheme not in ("http", "https") or not parts.hostname or len(callback_url) > 2048:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="callback_url must be an absolute http(s) URL"
+        )
+    try:
+        check_callback_host(parts.hostname)
+    except UnsafeCallbackHost:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="callback_url host is not allowed"
+        )
+    return callback_url
+
+def resolve_priority(
+    priority: Optional[Priority],
+    api_key: Optional[str],
+    default: Priority = Priority.INTERACTIVE
+) -> Priority:
+    """
+    Processing priority: the request field, otherwise the priority
+    configured for the API key, otherwise the endpoint default.
+    """
+    if priority is not None:
+        return priority
+    configured = settings.PRIORITY_API_KEYS.get(api_key) if api_key else None
+    if configured in (Priority.INTERACTIVE.value, Priority.BULK.value):
+        return Priority(configured)
+    return default
+
+def resolve_tenant(tenant_id: Optional[str], api_key: Optional[str]) -> str:
+    """
+    Tenant whose processing queue receives the upload: the X-Tenant-ID
+    header, otherwise the tenant configured for the API key.
+    """
+    if tenant_id:
+        if not TENANT_ID_PATTERN.match(tenant_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="X-Tenant-ID must be 1-64 characters: letters, digits, '.', '_' or '-'"
+            )
+        return tenant_id
+    return settings.TENANT_API_KEYS.get(api_key, DEFAULT_TENANT) if api_key else DEFAULT_TENANT
+
+def resolve_deadline(
+    deadline_ms: Optional[int],
+    x_deadline_ms: Optional[int],
+    received_at: Optional[float] = None
+) -> Optional[float]:
+    """
+    Absolute deadline (time.time()) from the request field or the
+    X-Deadline-Ms header, counted from the moment the request arrived.
+    """
+    budget_ms = deadline_ms if deadline_ms is not None else x_deadline_ms
+    if budget_ms is None:
+        return None
+    return (received_at if received_at is not None else time.time()) + budget_ms / 1000
+
+def idempotency_key_hash(idempotency_key: Optional[str], tenant: str) -> Optional[str]:
+    """
+    Fixed-size hash of the Idempotency-Key header scoped to the tenant,
+    so that tenants cannot replay each other's requests.
+    """
+    if idempotency_key is None:
+        return None
+    if not 0 < len(idempotency_key) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1-{IDEMPOTENCY_KEY_MAX_LENGTH} characters"
+        )
+    return hashlib.sha256(f"{tenant}\n{idempotency_key}".encode("utf-8")).hexdigest()
+
+async def _leave_inflight_job(content_hash: str, request_id: str, follower: asyncio.Future) -> None:
+    """Stops waiting for an in-flight job; a file handed over to this upload is passed on or deleted."""
+    file_path = inflight_jobs.leave(content_hash, request_id, follower)
+    if file_path is not None:
+        await run_blocking("storage", storage_client.delete_file, file_path)
+
+
+async def accept_idempotent_upload(
+    key_hash: Optional[str],
+    request_id: str,
+    accept: Callable[[], Awaitable[dict]]
+) -> Any:
+    """
+    Runs the ingest pipeline at most once per idempotency key.
+
+    A key that is already claimed returns the original requestId with the
+    Idempotent-Replayed header; nothing is stored, inserted or queued again.
+    If the upload is rejected, the key is released so that the client can retry.
+    """
+    if key_hash is None:
+        return await accept()
+    original_id = await run_blocking(
+        "db", IdempotencyKeyRepository.claim, key_hash, request_id, settings.IDEMPOTENCY_TTL_SECONDS
+    )
+    if original_id is not None:
+        logger.info(f"Idempotent replay of request: {original_id}")
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={"requestId": original_id},
+            headers={"Idempotent-Replayed": "true"}
+        )
+    try:
+        return await accept()
+    except Exception:
+        await run_blocking("db", IdempotencyKeyRepository.release, key_hash, request_id)
+        raise
+
+async def accept_upload(
+    request_id: str,
+    filename: Optional[str],
+    chunks: AsyncIterator[bytes],
+    near_duplicates: Optional[NearDuplicatePolicy] = None,
+    callback_url: Optional[str] = None,
+    priority: Priority = Priority.INTERACTIVE,
+    tenant: str = DEFAULT_TENANT,
+    deadline: Optional[float] = None,
+    upload: Optional[IngestedUpload] = None
+) -> dict:
+    """
+    Common ingest pipeline for uploaded photos.
+
+    Validates the upload and either answers from the result cache (exact or
+    near-duplicate match) or decodes it, saves the file, creates the DB record
+    and enqueues processing with the given priority in the tenant's queue.
+    Jobs still queued at their deadline are dropped with status EXPIRED. With callback_url, the
+    final result is also POSTed to that URL (see app.worker.webhooks).
+    An upload already read by read_photo_form is passed as upload instead of chunks.
+    """
+    policy = _resolve_near_duplicate_policy(near_duplicates)
+    callback_url = validate_callback_url(callback_url)
     try:
-        # Check filename presence
-        if not file.filename:
-            raise FileValidationError(
-                message="Filename is required",
-                code="MISSING_FILENAME"
+        if upload is None:
+            upload = await ingest_upload(filename, chunks)
+        
+        # Same content with the same check configuration: reuse the result
+        cached = await run_blocking("cache_lookup", result_cache.get, upload.content_hash)
+        if cached is not None:
+            await run_blocking(
+                "db",
+                ValidationRequestRepository.create,
+                request_id,
+                filename=filename,
+                file_size=upload.size,
+                content_hash=upload.content_hash,
+                callback_url=callback_url,
+                status="COMPLETED",
+                **cached
             )
+            return {"requestId": request_id}
         
-        # Read file content
-        content = await file.read()
+        # The same content is being processed right now: wait for that job
+        follower = inflight_jobs.follow(upload.content_hash, request_id)
+        if follower is not None:
+            try:
+                await run_blocking(
+                    "db",
+                    ValidationRequestRepository.create,
+                    request_id,
+                    filename=filename,
+                    file_size=upload.size,
+                    content_hash=upload.content_hash,
+                    callback_url=callback_url
+                )
+            except BaseException:
+                await _leave_inflight_job(upload.content_hash, request_id, follower)
+                raise
+            active_tasks.add(asyncio.create_task(follow_inflight_job(
+                request_id, follower, upload.content_hash,
+                priority=priority.value, tenant=tenant, deadline=deadline
+            )))
+            return {"requestId": request_id}
         
-        # Comprehensive file validation
-        validate_image_file(content, file.filename)
+        # Reserve queue capacity before decoding; rejected uploads cost no decode
+        admission_controller.admit(request_id, estimate_decoded_megapixels(upload.image_info))
+        image, reduction = await run_blocking("decode", decode_upload, upload)
+        
+        # Re-encoded or resized copy of an already validated photo
+        near = await run_blocking("near_duplicate", find_near_duplicate, image, policy)
+        if near is not None and policy == NearDuplicatePolicy.REUSE:
+            admission_controller.release(request_id, completed=False)
+            await run_blocking(
+                "db",
+                ValidationRequestRepository.create,
+                request_id,
+                filename=filename,
+                file_size=upload.size,
+                content_hash=upload.content_hash,
+                callback_url=callback_url,
+                status="COMPLETED",
+                **near.result
+            )
+            return {"requestId": request_id, "nearDuplicate": _near_duplicate_info(near, reused=True)}
         
         # Save file to storage
         file_path = f"{request_id}.jpg"
-        storage_client.save_file(file_path, content)
+        await run_blocking("storage", storage_client.save_file, file_path, upload.content)
         
         # Create database record
-        ValidationRequestRepository.create(request_id, filename=file.filename, file_size=len(content))
+        await run_blocking(
+            "db",
+            ValidationRequestRepository.create,
+            request_id,
+            filename=filename,
+            file_size=upload.size,
+            content_hash=upload.content_hash,
+            callback_url=callback_url
+        )
         
-        # Add processing task to queue
-        await add_processing_task(request_id, file_path)
+        # Add processing task to queue together with the decoded frame
+        inflight_jobs.register(upload.content_hash)
+        try:
+            await add_processing_task(
+                request_id,
+                file_path,
+                frame=create_frame_handle(image, scale=reduction),
+                content_hash=upload.content_hash,
+                priority=priority.value,
+                tenant=tenant,
+                deadline=deadline
+            )
+        except Exception as e:
+            inflight_jobs.resolve(upload.content_hash, {
+                "status": "FAILED",
+                "overall_status": "FAILED",
+                "checks": [],
+                "issues": [],
+                "error_message": f"Unexpected error: {str(e)}",
+                "processed_at": datetime.utcnow(),
+                "processing_time": 0.0,
+            })
+            # The job was not queued: nothing else will delete the saved file
+            try:
+                await run_blocking("storage", storage_client.delete_file, file_path)
+            except Exception as delete_error:
+                logger.warning(f"Failed to delete file {file_path}: {str(delete_error)}", extra={"request_id": request_id})
+            raise
         
-        return {"requestId": request_id}
+        response = {"requestId": request_id}
+        if near is not None:
+            response["nearDuplicate"] = _near_duplicate_info(near, reused=False)
+        return response
+    
+    except AdmissionRejected:
+        raise
     
     except FileValidationError as e:
+        admission_controller.release(request_id, completed=False)
         logger.warning(f"File validation error: {str(e)}", extra={"request_id": request_id})
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=e.message
-        )
+        raise _validation_http_error(e)
     
     except StorageError as e:
+        admission_controller.release(request_id, completed=False)
         logger.error(f"Storage error: {str(e)}", extra={"request_id": request_id})
         # Update status in DB on error
-        ValidationRequestRepository.update_error(
+        await run_blocking(
+            "db", ValidationRequestRepository.update_error,
             request_id, error_message=f"Storage error: {str(e)}"
         )
         raise HTTPException(
@@ -165,9 +629,11 @@ async def validate_photo(
         )
     
     except Exception as e:
+        admission_controller.release(request_id, completed=False)
         logger.error(f"Unexpected error: {str(e)}", extra={"request_id": request_id})
         # Update status in DB on error
-        ValidationRequestRepository.update_error(
+        await run_blocking(
+            "db", ValidationRequestRepository.update_error,
             request_id, error_message=f"Unexpected error: {str(e)}"
         )
         raise HTTPException(
@@ -175,24 +641,517 @@ async def validate_photo(
             detail="An unexpected error occurred"
         )
 
+@router.post(
+    "/validate",
+    response_model=ValidationResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Upload photo for validation",
+    description="Uploads a photo and initiates validation process",
+    openapi_extra=photo_form_body(
+        callback_url={"type": "string", "description": CALLBACK_URL_DESCRIPTION},
+        priority={"type": "string", "enum": [priority.value for priority in Priority], "description": PRIORITY_DESCRIPTION},
+        deadline_ms={"type": "integer", "minimum": 1, "description": DEADLINE_DESCRIPTION}
+    )
+)
+async def validate_photo(
+    request: Request,
+    near_duplicates: Optional[NearDuplicatePolicy] = Query(None, description=NEAR_DUPLICATES_DESCRIPTION),
+    x_api_key: Optional[str] = Header(None, description=API_KEY_DESCRIPTION),
+    x_tenant_id: Optional[str] = Header(None, description=TENANT_DESCRIPTION),
+    x_deadline_ms: Optional[int] = Header(None, ge=1, description=DEADLINE_DESCRIPTION),
+    idempotency_key: Optional[str] = Header(None, description=IDEMPOTENCY_KEY_DESCRIPTION)
+) -> Any:
+    """
+    Endpoint for uploading photo for validation.
+
+    The multipart body is read only after the idempotency key is claimed,
+    so a replayed request does not upload the file again.
+    """
+    received_at = time.time()
+    request_id = str(uuid.uuid4())
+    tenant = resolve_tenant(x_tenant_id, x_api_key)
+    key_hash = idempotency_key_hash(idempotency_key, tenant)
+    
+    async def accept() -> dict:
+        try:
+            form = await read_photo_form(request)
+        except FileValidationError as e:
+            logger.warning(f"File validation error: {str(e)}", extra={"request_id": request_id})
+            raise _validation_http_error(e)
+        priority = resolve_priority(form_priority(form), x_api_key)
+        deadline = resolve_deadline(form_deadline_ms(form), x_deadline_ms, received_at)
+        logger.info(f"Received validation request: {request_id}, priority: {priority.value}, tenant: {tenant}")
+        return await accept_upload(
+            request_id, form.filename, None, near_duplicates, form.fields.get("callback_url") or None,
+            priority, tenant, deadline, upload=form.upload
+        )
+    
+    return await accept_idempotent_upload(key_hash, request_id, accept)
+
+
+@router.post(
+    "/validate/raw",
+    response_model=ValidationResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Upload raw photo body for validation",
+    description=(
+        "Accepts the photo as the raw request body (application/octet-stream or image/*) "
+        "with the filename in the X-Filename header, without multipart encoding"
+    )
+)
+async def validate_photo_raw(
+    request: Request,
+    x_filename: Optional[str] = Header(None, description="Original file name (URL-encoded if non-ASCII)"),
+    callback_url: Optional[str] = Query(None, description=CALLBACK_URL_DESCRIPTION),
+    priority: Optional[Priority] = Query(None, description=PRIORITY_DESCRIPTION),
+    deadline_ms: Optional[int] = Query(None, ge=1, description=DEADLINE_DESCRIPTION),
+    near_duplicates: Optional[NearDuplicatePolicy] = Query(None, description=NEAR_DUPLICATES_DESCRIPTION),
+    x_api_key: Optional[str] = Header(None, description=API_KEY_DESCRIPTION),
+    x_tenant_id: Optional[str] = Header(None, description=TENANT_DESCRIPTION),
+    x_deadline_ms: Optional[int] = Header(None, ge=1, description=DEADLINE_DESCRIPTION),
+    idempotency_key: Optional[str] = Header(None, description=IDEMPOTENCY_KEY_DESCRIPTION)
+) -> Any:
+    """
+    Endpoint for uploading photo as raw request body.
+    """
+    deadline = resolve_deadline(deadline_ms, x_deadline_ms)
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type != "application/octet-stream" and not content_type.startswith("image/"):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Content-Type must be application/octet-stream or image/*"
+        )
+    
+    request_id = str(uuid.uuid4())
+    priority = resolve_priority(priority, x_api_key)
+    tenant = resolve_tenant(x_tenant_id, x_api_key)
+    key_hash = idempotency_key_hash(idempotency_key, tenant)
+    logger.info(f"Received raw validation request: {request_id}, priority: {priority.value}, tenant: {tenant}")
+    filename = unquote(x_filename) if x_filename else None
+    return await accept_idempotent_upload(key_hash, request_id, partial(
+        accept_upload,
+        request_id, filename, request.stream(), near_duplicates, callback_url, priority, tenant, deadline
+    ))
+
+
+@router.post(
+    "/validate/sync",
+    response_model=ValidationResult,
+    responses={status.HTTP_202_ACCEPTED: {"model": ValidationResponse}},
+    summary="Validate photo synchronously",
+    description=(
+        "Uploads a photo and returns the validation result in the same response. "
+        "If the result is not ready within timeout_ms, returns 202 with the requestId "
+        "and processing continues in the background"
+    ),
+    openapi_extra=photo_form_body()
+)
+async def validate_photo_sync(
+    request: Request,
+    timeout_ms: int = Query(
+        settings.SYNC_VALIDATION_TIMEOUT_MS,
+        ge=1,
+        le=settings.SYNC_VALIDATION_MAX_TIMEOUT_MS,
+        description="Deadline for the inline result in milliseconds"
+    ),
+    near_duplicates: Optional[NearDuplicatePolicy] = Query(None, description=NEAR_DUPLICATES_DESCRIPTION),
+    x_api_key: Optional[str] = Header(None, description=API_KEY_DESCRIPTION),
+    x_tenant_id: Optional[str] = Header(None, description=TENANT_DESCRIPTION)
+) -> Any:
+    """
+    Endpoint for synchronous photo validation with a latency deadline.
+
+    The processing slot is granted by the scheduler in the interactive lane
+    of the caller's tenant, alongside queued jobs.
+    """
+    request_id = str(uuid.uuid4())
+    tenant = resolve_tenant(x_tenant_id, x_api_key)
+    logger.info(f"Received sync validation request: {request_id}, timeout: {timeout_ms} ms, tenant: {tenant}")
+    
+    policy = _resolve_near_duplicate_policy(near_duplicates)
+    near = None
+    follower = None
+    try:
+        form = await read_photo_form(request)
+        upload = form.upload
+        cached = await run_blocking("cache_lookup", result_cache.get, upload.content_hash)
+        if cached is None:
+            follower = inflight_jobs.follow(upload.content_hash, request_id)
+        if cached is None and follower is None:
+            admission_controller.admit(request_id, estimate_decoded_megapixels(upload.image_info))
+            image, reduction = await run_blocking("decode", decode_upload, upload)
+            near = await run_blocking("near_duplicate", find_near_duplicate, image, policy)
+            if near is not None and policy == NearDuplicatePolicy.REUSE:
+                admission_controller.release(request_id, completed=False)
+                cached = near.result
+            else:
+                frame = create_frame_handle(image, scale=reduction)
+    except AdmissionRejected:
+        raise
+    except FileValidationError as e:
+        admission_controller.release(request_id, completed=False)
+        logger.warning(f"File validation error: {str(e)}", extra={"request_id": request_id})
+        raise _validation_http_error(e)
+    except Exception as e:
+        # The reservation is otherwise released only by the inline validation task
+        admission_controller.release(request_id, completed=False)
+        logger.error(f"Unexpected error: {str(e)}", extra={"request_id": request_id})
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred"
+        )
+    
+    # The DB record is created in the background, in parallel with the checks
+    create_record = partial(
+        ValidationRequestRepository.create,
+        request_id,
+        filename=form.filename,
+        file_size=upload.size,
+        content_hash=upload.content_hash
+    )
+    
+    if cached is not None:
+        record_task = asyncio.ensure_future(
+            run_blocking("db", create_record, status="COMPLETED", **cached)
+        )
+        active_tasks.add(record_task)
+        result = {
+            "request_id": request_id,
+            "status": "COMPLETED",
+            "processed_at": datetime.utcnow(),
+            "processing_time": 0.0,
+            **cached
+        }
+        if near is not None:
+            result["nearDuplicate"] = _near_duplicate_info(near, reused=True)
+        return to_result_response(result)
+    
+    if follower is not None:
+        # The same content is being processed right now: wait for that job
+        task = asyncio.create_task(follow_inflight_job(
+            request_id, follower, upload.content_hash, create_record, tenant=tenant
+        ))
+    else:
+        inflight_jobs.register(upload.content_hash)
+        task = asyncio.create_task(run_inline_validation(
+            request_id,
+            frame,
+            upload.content,
+            create_record,
+            content_hash=upload.content_hash,
+            tenant=tenant
+        ))
+    active_tasks.add(task)
+    
+    try:
+        # shield: on timeout the validation keeps running and stores its result
+        result = await asyncio.wait_for(asyncio.shield(task), timeout=timeout_ms / 1000)
+    except asyncio.TimeoutError:
+        logger.info(f"Sync validation deadline exceeded for request: {request_id}, falling back to polling")
+        content = {"requestId": request_id}
+        if near is not None:
+            content["nearDuplicate"] = _near_duplicate_info(near, reused=False)
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=content)
+    
+    result = to_result_response(result)
+    if near is not None:
+        result["nearDuplicate"] = _near_duplicate_info(near, reused=False)
+    return result
+
+
+async def _iter_batch_sources(files: List[UploadFile]) -> AsyncIterator[Tuple[str, Optional[bytes], Optional[UploadFile]]]:
+    """
+    Yields batch items as (filename, content, upload): archive members come with
+    their content (None if too large), plain files come as the UploadFile itself.
+    """
+    for file in files:
+        if file.filename and is_archive(file.filename):
+            async for name, content in aiter_archive_members(file.file, file.filename, settings.MAX_FILE_SIZE_BYTES):
+                yield name, content, None
+        else:
+            yield file.filename, None, file
+
+
+@router.post(
+    "/validate/batch",
+    response_model=BatchValidationResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Upload many photos for validation",
+    description=(
+        "Uploads many photos in one request, as several `files` parts and/or ZIP/TAR "
+        "archives, and initiates validation of every item"
+    )
+)
+async def validate_photo_batch(
+    files: List[UploadFile] = File(..., description="Photo files and/or ZIP/TAR archives"),
+    priority: Optional[Priority] = Form(None, description=PRIORITY_DESCRIPTION),
+    deadline_ms: Optional[int] = Form(None, ge=1, description=DEADLINE_DESCRIPTION),
+    x_api_key: Optional[str] = Header(None, description=API_KEY_DESCRIPTION),
+    x_tenant_id: Optional[str] = Header(None, description=TENANT_DESCRIPTION),
+    x_deadline_ms: Optional[int] = Header(None, ge=1, description=DEADLINE_DESCRIPTION)
+) -> Any:
+    """
+    Endpoint for batch photo upload.
+
+    Items are validated by header only; decoding and checks run in the worker.
+    All DB records of the batch are created with a single bulk insert.
+    Batches are queued as bulk unless another priority is requested.
+    The batch is admitted as one unit: its items take no admission slots and
+    wait in the scheduler, which hands them out only as processing slots free up.
+    """
+    deadline = resolve_deadline(deadline_ms, x_deadline_ms)
+    batch_id = str(uuid.uuid4())
+    priority = resolve_priority(priority, x_api_key, default=Priority.BULK)
+    tenant = resolve_tenant(x_tenant_id, x_api_key)
+    logger.info(f"Received batch validation request: {batch_id}, parts: {len(files)}, priority: {priority.value}, tenant: {tenant}")
+    admission_controller.check(batch_id)
+    
+    records: List[dict] = []
+    queued: List[Tuple[str, str, str]] = []
+    followers: List[Tuple[str, str, Optional[asyncio.Future]]] = []
+    items: List[dict] = []
+    queued_hashes = set()
+    
+    try:
+        async for filename, content, upload_file in _iter_batch_sources(files):
+            if len(items) >= settings.MAX_BATCH_FILES:
+                raise FileValidationError(
+                    message=f"Batch exceeds {settings.MAX_BATCH_FILES} files limit",
+                    code="BATCH_TOO_LARGE"
+                )
+            
+            request_id = str(uuid.uuid4())
+            record = {"request_id": request_id, "batch_id": batch_id, "filename": filename}
+            try:
+                if not filename:
+                    raise FileValidationError(message="Filename is required", code="MISSING_FILENAME")
+                validate_filename(filename)
+                if upload_file is None and content is None:
+                    raise FileValidationError(
+                        message=f"File size exceeds {settings.MAX_FILE_SIZE_BYTES // 1024} KB limit",
+                        code="FILE_TOO_LARGE"
+                    )
+                chunks = iter_upload_file(upload_file) if upload_file is not None else iter_bytes(content)
+                upload = await read_upload_stream(chunks, settings.MAX_FILE_SIZE_BYTES)
+                validate_image_header(upload.content, filename, upload.image_info)
+                
+                cached = await run_blocking("cache_lookup", result_cache.get, upload.content_hash)
+                if cached is not None:
+                    records.append({
+                        **record,
+                        "status": "COMPLETED",
+                        "file_size": upload.size,
+                        "content_hash": upload.content_hash,
+                        "processed_at": datetime.utcnow(),
+                        "processing_time": 0.0,
+                        **cached
+                    })
+                    items.append({"filename": filename, "requestId": request_id})
+                    continue
+                
+                # Duplicate of an item in this batch or of an in-flight job: reuse its processing
+                leader = None if upload.content_hash in queued_hashes else inflight_jobs.follow(upload.content_hash, request_id)
+                if upload.content_hash in queued_hashes or leader is not None:
+                    records.append({
+                        **record,
+                        "status": "PENDING",
+                        "file_size": upload.size,
+                        "content_hash": upload.content_hash
+                    })
+                    followers.append((request_id, upload.content_hash, leader))
+                    items.append({"filename": filename, "requestId": request_id})
+                    continue
+                
+                file_path = f"{request_id}.jpg"
+                await run_blocking("storage", storage_client.save_file, file_path, upload.content)
+            except (FileValidationError, StorageError) as e:
+                logger.warning(f"Batch {batch_id} item {filename} rejected: {e.message}")
+                records.append({**record, "status": "FAILED", "error_message": e.message})
+                items.append({"filename": filename or "", "requestId": request_id, "error": e.message, "code": e.code})
+                continue
+            
+            records.append({
+                **record,
+                "status": "PENDING",
+                "file_size": upload.size,
+                "content_hash": upload.content_hash
+            })
+            queued.append((request_id, file_path, upload.content_hash))
+            queued_hashes.add(upload.content_hash)
+            items.append({"filename": filename, "requestId": request_id})
+    
+    except FileValidationError as e:
+        logger.warning(f"Batch {batch_id} rejected: {str(e)}")
+        # Files saved before the batch was rejected are not processed
+        for request_id, content_hash, leader in followers:
+            if leader is not None:
+                await _leave_inflight_job(content_hash, request_id, leader)
+        for request_id, file_path, _ in queued:
+            await run_blocking("storage", storage_client.delete_file, file_path)
+        raise _validation_http_error(e)
+    
+    if not items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Batch contains no files"
+        )
+    
+    # Single bulk insert for the whole batch
+    try:
+        await run_blocking("db", ValidationRequestRepository.create_many, records)
+    except BaseException:
+        for request_id, content_hash, leader in followers:
+            if leader is not None:
+                await _leave_inflight_job(content_hash, request_id, leader)
+        raise
+    
+    for _, _, content_hash in queued:
+        inflight_jobs.register(content_hash)
+    for request_id, content_hash, leader in followers:
+        leader = leader or inflight_jobs.follow(content_hash, request_id)
+        active_tasks.add(asyncio.create_task(follow_inflight_job(
+            request_id, leader, content_hash, priority=priority.value, tenant=tenant, deadline=deadline
+        )))
+    for request_id, file_path, content_hash in queued:
+        await add_processing_task(
+            request_id, file_path, content_hash=content_hash,
+            priority=priority.value, tenant=tenant, deadline=deadline
+        )
+    
+    logger.info(f"Batch {batch_id} accepted: {len(items)} items, {len(queued)} queued, {len(followers)} coalesced")
+    return {"batchId": batch_id, "items": items}
+
+
+@router.get(
+    "/results/batch/{batch_id}",
+    response_model=BatchResult,
+    summary="Get batch validation result",
+    description="Returns aggregated validation status of all items in a batch"
+)
+async def get_batch_result(
+    batch_id: str
+) -> Any:
+    """
+    Endpoint for getting aggregated batch results.
+    """
+    logger.info(f"Retrieving results for batch: {batch_id}")
+    
+    db_requests = await run_blocking("db", ValidationRequestRepository.get_by_batch_id, batch_id)
+    if not db_requests:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Batch not found"
+        )
+    
+    status_counts = Counter(db_request.status for db_request in db_requests)
+    overall_status_counts = Counter(
+        db_request.overall_status for db_request in db_requests if db_request.overall_status
+    )
+    return {
+        "batchId": batch_id,
+        "total": len(db_requests),
+        "completed": all(db_request.status in TERMINAL_STATUSES for db_request in db_requests),
+        "statusCounts": dict(status_counts),
+        "overallStatusCounts": dict(overall_status_counts),
+        "items": [
+            {
+                "requestId": db_request.request_id,
+                "filename": db_request.filename,
+                "status": db_request.status,
+                "overallStatus": db_request.overall_status,
+                "errorMessage": db_request.error_message,
+            }
+            for db_request in db_requests
+        ],
+    }
+
+
+@router.get(
+    "/results/{request_id}/events",
+    summary="Stream validation result",
+    description=(
+        "Server-sent events stream of the request state: a status event on connect "
+        "and on every change, and a final result event when processing completes"
+    ),
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}}
+)
+async def stream_validation_result(
+    request_id: str,
+    request: Request
+) -> Any:
+    """
+    Endpoint for receiving the validation result as server-sent events.
+    """
+    # Subscribe before reading the record so that no update is missed
+    updates = result_notifier.subscribe(request_id)
+    try:
+        db_request = await run_blocking("db", ValidationRequestRepository.get_by_id, request_id)
+    except Exception:
+        result_notifier.unsubscribe(request_id, updates)
+        raise
+    if not db_request:
+        result_notifier.unsubscribe(request_id, updates)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Request not found"
+        )
+    
+    async def events() -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.RESULT_EVENTS_MAX_SECONDS
+        state = db_request.to_dict()
+        try:
+            yield _format_result_event(state)
+            while state.get("status") not in TERMINAL_STATUSES:
+                remaining = deadline - loop.time()
+                if remaining <= 0 or await request.is_disconnected():
+                    return
+                try:
+                    state = await asyncio.wait_for(
+                        updates.get(), min(remaining, settings.RESULT_EVENTS_KEEPALIVE_SECONDS)
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _format_result_event(state)
+        finally:
+            result_notifier.unsubscribe(request_id, updates)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 
 @router.get(
     "/results/{request_id}",
     response_model=ValidationResult,
     summary="Get validation result",
-    description="Returns validation status and result by request ID"
+    description=(
+        "Returns validation status and result by request ID. With wait (e.g. 30s), "
+        "holds the request until processing completes or the wait expires"
+    )
 )
 async def get_validation_result(
-    request_id: str
+    request_id: str,
+    wait: Optional[str] = Query(
+        None,
+        description=f"Long-poll duration (e.g. 30s, 500ms), at most {settings.RESULT_WAIT_MAX_SECONDS}s"
+    )
 ) -> Any:
     """
     Endpoint for getting validation result by request ID.
     """
     logger.info(f"Retrieving results for request: {request_id}")
     
+    wait_seconds = parse_wait(wait)
+    # Subscribe before reading the record so that no update is missed
+    updates = result_notifier.subscribe(request_id) if wait_seconds else None
     try:
         # Get request from DB
-        db_request = ValidationRequestRepository.get_by_id(request_id)
+        db_request = await run_blocking("db", ValidationRequestRepository.get_by_id, request_id)
         
         if not db_request:
             logger.warning(f"Request not found: {request_id}")
@@ -205,21 +1164,12 @@ async def get_validation_result(
         # Important: create copy of data, don't use object directly
         result = db_request.to_dict()
         
-        # Adapt keys for Pydantic model compliance (camelCase)
-        if "overall_status" in result:
-            result["overallStatus"] = result.pop("overall_status")
-        if "created_at" in result:
-            result["createdAt"] = result.pop("created_at")
-        if "processed_at" in result:
-            result["processedAt"] = result.pop("processed_at")
-        if "error_message" in result:
-            result["errorMessage"] = result.pop("error_message")
-        if "request_id" in result:
-            result["requestId"] = result.pop("request_id")
-        if "processing_time" in result:
-            result["processingTime"] = result.pop("processing_time")
+        if updates is not None and result["status"] not in TERMINAL_STATUSES:
+            completed = await result_notifier.wait_for_result(request_id, updates, wait_seconds)
+            if completed is not None:
+                result = completed
         
-        return result
+        return to_result_response(result)
     
     except HTTPException:
         raise
@@ -230,3 +1180,52 @@ async def get_validation_result(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to retrieve validation results"
         )
+    
+    finally:
+        if updates is not None:
+            result_notifier.unsubscribe(request_id, updates)
+
+
+@router.delete(
+    "/results/{request_id}",
+    response_model=CancellationResponse,
+    responses={status.HTTP_202_ACCEPTED: {"model": CancellationResponse}},
+    summary="Cancel validation",
+    description=(
+        "Cancels a queued or running validation and deletes the stored photo. "
+        "A queued job is removed at once (200, status CANCELLED); a running job stops "
+        "before its next check (202, status CANCELLING) and then gets status CANCELLED"
+    )
+)
+async def cancel_validation(
+    request_id: str
+) -> Any:
+    """
+    Endpoint for cancelling validation by request ID.
+    """
+    logger.info(f"Cancelling request: {request_id}")
+    
+    db_request = await run_blocking("db", ValidationRequestRepository.get_by_id, request_id)
+    if not db_request:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Request not found"
+        )
+    if db_request.status in TERMINAL_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Request is already finished with status {db_request.status}"
+        )
+    
+    outcome = await cancel_processing_task(request_id)
+    if outcome is None:
+        # Waiting for another job with the same content or handled by another process
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Request is not queued or running in this worker and cannot be cancelled"
+        )
+    
+    response = {"requestId": request_id, "status": outcome}
+    if outcome == "CANCELLING":
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=response)
+    return response
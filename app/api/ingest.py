@@ -0,0 +1,302 @@
+"""
+Потоковый прием загружаемых изображений.
+
+Тело загрузки читается частями: размер проверяется по мере поступления данных,
+заголовок контейнера разбирается по первым байтам, а хэш содержимого
+вычисляется инкрементально. Слишком большие или не являющиеся изображениями
+загрузки отклоняются, не дочитываясь до конца.
+
+Тело multipart/form-data разбирается потоково (read_multipart_upload): часть
+с файлом передается в проверку по мере поступления, без сохранения во
+временный файл, как это делает разбор формы Starlette.
+"""
+import asyncio
+import hashlib
+import tarfile
+import zipfile
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import UploadFile
+from python_multipart.multipart import MultipartParseError, MultipartParser, parse_options_header
+
+from app.core.exceptions import FileValidationError
+from app.core.image_header import ImageInfo, probe_image_header
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class IngestedUpload:
+    """Результат потокового чтения загрузки"""
+    content: bytes
+    content_hash: str
+    image_info: Optional[ImageInfo]
+
+    @property
+    def size(self) -> int:
+        return len(self.content)
+
+
+async def iter_upload_file(file: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Читает UploadFile частями"""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def read_upload_stream(chunks: AsyncIterator[bytes], max_size: int) -> IngestedUpload:
+    """
+    Читает загрузку из потока частей с ранним прерыванием.
+
+    Args:
+        chunks: Асинхронный поток частей тела загрузки
+        max_size: Максимальный размер файла в байтах
+
+    Returns:
+        IngestedUpload с содержимым, SHA-256 и сведениями из заголовка
+
+    Raises:
+        FileValidationError: FILE_TOO_LARGE при превышении лимита,
+            INVALID_FILE_FORMAT / INVALID_IMAGE_DATA при неверном заголовке
+    """
+    buffer = bytearray()
+    digest = hashlib.sha256()
+    image_info: Optional[ImageInfo] = None
+
+    async for chunk in chunks:
+        if len(buffer) + len(chunk) > max_size:
+            logger.warning(f"Upload aborted after {len(buffer) + len(chunk)} bytes: exceeds {max_size} bytes")
+            raise FileValidationError(
+                message=f"File size exceeds {max_size // 1024} KB limit",
+                code="FILE_TOO_LARGE"
+            )
+        buffer.extend(chunk)
+        digest.update(chunk)
+
+        # Разбираем заголовок, как только пришло достаточно байт
+        if image_info is None:
+            image_info = probe_image_header(buffer)
+
+    return IngestedUpload(
+        content=bytes(buffer),
+        content_hash=digest.hexdigest(),
+        image_info=image_info
+    )
+
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+
+def is_archive(filename: str) -> bool:
+    """Проверяет, является ли файл архивом пакетной загрузки (по расширению)"""
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def _skip_member(name: str) -> bool:
+    """Служебные файлы архивов (.DS_Store, __MACOSX и т.п.) пропускаются"""
+    parts = name.replace("\\", "/").split("/")
+    return any(part.startswith(".") or part == "__MACOSX" for part in parts if part)
+
+
+def iter_archive_members(
+    fileobj: BinaryIO,
+    filename: str,
+    max_size: int
+) -> Iterator[Tuple[str, Optional[bytes]]]:
+    """
+    Читает файлы архива по одному, не распаковывая его на диск.
+
+    TAR читается в потоковом режиме, ZIP - через центральный каталог
+    (нужен файл с произвольным доступом). Содержимое файла больше max_size
+    не читается: для него возвращается None.
+
+    Yields:
+        Пары (путь внутри архива, содержимое или None)
+
+    Raises:
+        FileValidationError: INVALID_ARCHIVE, если архив поврежден
+    """
+    try:
+        if filename.lower().endswith(".zip"):
+            with zipfile.ZipFile(fileobj) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or _skip_member(info.filename):
+                        continue
+                    if info.file_size > max_size:
+                        yield info.filename, None
+                        continue
+                    yield info.filename, archive.read(info)
+        else:
+            with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+                for member in archive:
+                    if not member.isfile() or _skip_member(member.name):
+                        continue
+                    if member.size > max_size:
+                        yield member.name, None
+                        continue
+                    yield member.name, archive.extractfile(member).read()
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+        raise FileValidationError(
+            message=f"Cannot read archive {filename}: {str(e)}",
+            code="INVALID_ARCHIVE"
+        )
+
+
+async def aiter_archive_members(
+    fileobj: BinaryIO,
+    filename: str,
+    max_size: int
+) -> AsyncIterator[Tuple[str, Optional[bytes]]]:
+    """Асинхронная обертка над iter_archive_members: чтение и распаковка идут в пуле потоков"""
+    loop = asyncio.get_running_loop()
+    members = iter_archive_members(fileobj, filename, max_size)
+    done = object()
+    while True:
+        member = await loop.run_in_executor(None, next, members, done)
+        if member is done:
+            break
+        yield member
+
+
+async def iter_bytes(content: bytes) -> AsyncIterator[bytes]:
+    """Представляет уже прочитанное содержимое как поток из одной части"""
+    yield content
+
+
+# Предел размера текстового поля формы
+MAX_FORM_FIELD_SIZE = 64 * 1024
+
+
+@dataclass
+class MultipartUpload:
+    """Результат потокового разбора multipart-формы с одним файлом"""
+    filename: Optional[str] = None
+    upload: Optional[IngestedUpload] = None
+    fields: Dict[str, str] = field(default_factory=dict)
+
+
+def _invalid_form(message: str) -> FileValidationError:
+    return FileValidationError(message=message, code="INVALID_FORM")
+
+
+async def _iter_multipart_events(boundary: bytes, stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[str, object]]:
+    """
+    События разбора тела: ("headers", {имя: значение}), ("data", bytes), ("end", None).
+    Тело читается по мере запроса событий.
+    """
+    events: List[Tuple[str, object]] = []
+    headers: Dict[str, str] = {}
+    header = [b"", b""]
+
+    def on_header_field(data, start, end):
+        header[0] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header[1] += data[start:end]
+
+    def on_header_end():
+        headers[header[0].decode("latin-1").lower()] = header[1].decode("latin-1")
+        header[0] = header[1] = b""
+
+    def on_headers_finished():
+        events.append(("headers", dict(headers)))
+        headers.clear()
+
+    def on_part_data(data, start, end):
+        events.append(("data", bytes(data[start:end])))
+
+    def on_part_end():
+        events.append(("end", None))
+
+    parser = MultipartParser(boundary, {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    try:
+        async for chunk in stream:
+            parser.write(chunk)
+            for event in events:
+                yield event
+            events.clear()
+        parser.finalize()
+    except MultipartParseError as e:
+        raise _invalid_form(f"Malformed multipart body: {str(e)}")
+    for event in events:
+        yield event
+
+
+async def _iter_part_data(events: AsyncIterator[Tuple[str, object]]) -> AsyncIterator[bytes]:
+    """Данные текущей части до ее конца"""
+    async for kind, value in events:
+        if kind == "end":
+            return
+        if kind == "data":
+            yield value
+
+
+async def read_multipart_upload(
+    content_type: str,
+    stream: AsyncIterator[bytes],
+    file_field: str,
+    ingest: Callable[[Optional[str], AsyncIterator[bytes]], Awaitable[IngestedUpload]]
+) -> MultipartUpload:
+    """
+    Потоково разбирает multipart/form-data с одним файлом.
+
+    Части с файлом file_field передаются в ingest по мере поступления (проверка
+    имени, размера и заголовка с ранним прерыванием); текстовые поля
+    собираются до и после файла.
+
+    Args:
+        content_type: Заголовок Content-Type запроса (с boundary)
+        stream: Поток частей тела запроса
+        file_field: Имя поля формы с файлом
+        ingest: Прием файла: (имя файла, поток частей) -> IngestedUpload
+
+    Returns:
+        MultipartUpload; upload равен None, если файла в форме нет
+        или тело не multipart/form-data (тело тогда не читается)
+
+    Raises:
+        FileValidationError: INVALID_FORM для неверного тела, ошибки ingest
+    """
+    result = MultipartUpload()
+    media_type, params = parse_options_header(content_type)
+    if media_type != b"multipart/form-data":
+        return result
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise _invalid_form("Multipart boundary is missing")
+
+    events = _iter_multipart_events(boundary, stream)
+    async for kind, value in events:
+        if kind != "headers":
+            continue
+        _, disposition = parse_options_header(value.get("content-disposition", ""))
+        name = disposition.get(b"name", b"").decode("utf-8", "replace")
+        filename = disposition.get(b"filename")
+        if name == file_field and filename and result.upload is None:
+            result.filename = filename.decode("utf-8", "replace")
+            result.upload = await ingest(result.filename, _iter_part_data(events))
+            continue
+        content = bytearray()
+        async for chunk in _iter_part_data(events):
+            if filename is not None:
+                # Посторонние файлы формы не сохраняются
+                continue
+            content.extend(chunk)
+            if len(content) > MAX_FORM_FIELD_SIZE:
+                raise _invalid_form(f"Form field {name} exceeds {MAX_FORM_FIELD_SIZE // 1024} KB")
+        if filename is None:
+            result.fields[name] = content.decode("utf-8", "replace")
+    return result
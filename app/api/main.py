@@ -8,14 +8,27 @@ from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import time
 from app.api.endpoints import validation, config
+from app.api.middleware import UploadSizeLimitMiddleware
 from app.admin.app import admin_app
 from app.db.models import init_db
 from app.core.config import settings
+from app.core.admission import AdmissionRejected, admission_controller
 from app.core.exceptions import PhotoValidationError
 from app.core.logging import get_logger
-from app.core.monitoring import performance_monitor, periodic_metrics_update
+from app.core.executors import check_executor, ingest_executor
+from app.core.monitoring import monitor_event_loop_lag, performance_monitor, periodic_metrics_update
+from app.core.notification_bus import create_notification_bus
+from app.core.notifications import result_notifier
+from app.core.result_cache import result_cache
+from app.cv.checks.runner import check_runner
+from app.db.repositories import ValidationRequestRepository
+from app.config.manager import get_config_manager
 import asyncio
-from app.worker.tasks import start_worker
+from app.worker.tasks import job_queue, processing_queue, start_worker
+from app.worker.job_queue import durable_queue_enabled
+from app.worker.webhooks import webhook_dispatcher
+from app.worker.idempotency import periodic_idempotency_sweep
+from app.worker.process_engine import process_check_engine, process_engine_enabled
 
 logger = get_logger(__name__)
 
@@ -29,12 +42,35 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.ALLOWED_ORIGINS,  # Использование списка разрешенных доменов
     allow_credentials=True,
-    allow_methods=["POST", "GET", "OPTIONS"],  # Ограничение методов
-    allow_headers=["Content-Type", "X-Request-ID"],  # Ограничение заголовков
+    allow_methods=["POST", "GET", "DELETE", "OPTIONS"],  # Ограничение методов (DELETE - отмена обработки)
+    allow_headers=[  # Ограничение заголовков: только принимаемые API
+        "Content-Type", "X-Request-ID", "X-API-Key", "X-Tenant-ID",
+        "X-Deadline-Ms", "X-Filename", "Idempotency-Key"
+    ],
+    expose_headers=["Retry-After", "Idempotent-Replayed"],
+)
+
+# Ограничение размера тела загрузок с ранним прерыванием
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        f"{settings.API_V1_STR}/validate": settings.MAX_FILE_SIZE_BYTES + settings.UPLOAD_OVERHEAD_BYTES,
+        f"{settings.API_V1_STR}/validate/batch": settings.MAX_BATCH_SIZE_BYTES,
+    },
 )
 
 engine = init_db()
 
+notification_bus = create_notification_bus(
+    settings.DATABASE_URL, settings.NOTIFICATION_BUS, settings.NOTIFICATION_SOCKET_DIR
+)
+
+
+def _load_request_state(request_id: str):
+    """Состояние запроса для подписчиков, разбуженных шиной уведомлений"""
+    db_request = ValidationRequestRepository.get_by_id(request_id)
+    return db_request.to_dict() if db_request else None
+
 # Middleware для логирования запросов и мониторинга
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
@@ -68,6 +104,16 @@ async def validation_exception_handler(request: Request, exc: PhotoValidationErr
     )
 
 
+@app.exception_handler(AdmissionRejected)
+async def admission_exception_handler(request: Request, exc: AdmissionRejected):
+    # Очередь обработки заполнена: клиент повторяет запрос позже
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": exc.message, "code": exc.code},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
 # Подключение роутеров
 app.include_router(validation.router, prefix="/api/v1")
 app.include_router(config.router, prefix="/api/v1/config", tags=["Configuration Management"])
@@ -104,7 +150,14 @@ async def get_metrics():
     """
     Эндпоинт для получения метрик производительности
     """
-    return performance_monitor.get_metrics()
+    return {
+        **performance_monitor.get_metrics(),
+        "admission": admission_controller.get_stats(),
+        "scheduler": processing_queue.get_stats(),
+        "check_engine": process_check_engine.get_stats() if process_engine_enabled() else {"engine": settings.CHECK_ENGINE},
+        "check_threads": check_executor.get_stats(),
+        "job_queue": job_queue.get_stats() if durable_queue_enabled() else {"queue": settings.JOB_QUEUE},
+    }
 
 @app.get("/metrics/detailed")
 async def get_detailed_metrics():
@@ -120,10 +173,54 @@ async def startup_event():
     asyncio.create_task(start_worker())
     logger.info("Started image processing worker")
     
+    # Уведомления о результатах из других процессов API и обработчиков
+    result_notifier.attach_bus(notification_bus, _load_request_state)
+    try:
+        await notification_bus.start(result_notifier.handle_remote)
+        logger.info(f"Started {notification_bus.name} notification bus")
+    except Exception as e:
+        logger.warning(f"Notification bus unavailable, results are pushed within this process only: {str(e)}")
+    
+    # Доставка webhook с результатами из outbox
+    if settings.WEBHOOKS_ENABLED:
+        await webhook_dispatcher.start()
+    
+    # Очистка просроченных ключей идемпотентности
+    asyncio.create_task(periodic_idempotency_sweep())
+    
+    # Инвалидация кэша результатов при изменении конфигурации
+    get_config_manager().add_change_callback(result_cache.on_config_change)
+    
+    # Пул процессов проверок: модели загружаются до первых запросов;
+    # иначе - пул потоков проверок, согласованный с потоками OpenCV и BLAS
+    if process_engine_enabled():
+        get_config_manager().add_change_callback(process_check_engine.on_config_change)
+        await process_check_engine.start()
+    else:
+        check_executor.configure()
+        # Экземпляры проверок создаются до первых запросов и пересоздаются при изменении конфигурации
+        check_runner.rebuild()
+        get_config_manager().add_change_callback(check_runner.on_config_change)
+    
+    # Очередь обработки в БД: задачи арендуются по числу свободных слотов процесса
+    if durable_queue_enabled():
+        await job_queue.start()
+    
     # Запуск периодического обновления метрик
     asyncio.create_task(periodic_metrics_update())
+    asyncio.create_task(monitor_event_loop_lag())
     logger.info("Started performance monitoring")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await job_queue.stop()
+    await webhook_dispatcher.stop()
+    ingest_executor.shutdown()
+    check_executor.shutdown()
+    process_check_engine.shutdown()
+    # Закрытие соединения или сокета шины уведомлений
+    await notification_bus.stop()
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app.api.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("app.api.main:app", host="0.0.0.0", port=8000, reload=True)
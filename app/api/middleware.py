@@ -0,0 +1,106 @@
+"""
+ASGI middleware для API.
+"""
+import json
+from typing import Dict
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class RequestBodyTooLarge(Exception):
+    """Тело запроса превысило лимит"""
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Ограничивает размер тела запросов загрузки.
+
+    Запрос с заголовком Content-Length больше лимита отклоняется с 413 до чтения тела.
+    Для запросов без Content-Length (chunked) байты считаются по мере поступления:
+    при превышении лимита чтение прерывается и вместо ответа обработчика
+    отправляется 413. Для /validate и /validate/sync это дополнительная защита:
+    файл из multipart-тела и так проверяется по мере чтения (app.api.ingest),
+    а пакетная загрузка разбирается формой Starlette и без лимита сохранялась бы целиком.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        """
+        Args:
+            app: ASGI-приложение
+            limits: Лимиты размера тела по префиксам путей (для POST-запросов)
+        """
+        self.app = app
+        # Более длинные префиксы проверяются первыми
+        self.limits = sorted(limits.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def _get_limit(self, scope) -> int:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return 0
+        for prefix, limit in self.limits:
+            if scope["path"].startswith(prefix):
+                return limit
+        return 0
+
+    async def _send_too_large(self, send, limit: int) -> None:
+        body = json.dumps({
+            "detail": f"Request body exceeds {limit // 1024} KB limit",
+            "code": "FILE_TOO_LARGE"
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        limit = self._get_limit(scope)
+        if not limit:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            logger.warning(f"Rejected {scope['path']} upload: Content-Length {int(content_length)} exceeds {limit}")
+            await self._send_too_large(send, limit)
+            return
+
+        received = 0
+        exceeded = False
+        response_replaced = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    logger.warning(f"Aborted {scope['path']} upload after {received} bytes: exceeds {limit}")
+                    raise RequestBodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_replaced
+            if exceeded:
+                # Ответ обработчика (ошибка разбора тела) заменяется на 413
+                if not response_replaced:
+                    response_replaced = True
+                    await self._send_too_large(send, limit)
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+            if not response_replaced:
+                await self._send_too_large(send, limit)
@@ -1,12 +1,44 @@
 from typing import List, Dict, Any, Optional
+from enum import Enum
 from pydantic import BaseModel, Field
 from datetime import datetime
 
+class NearDuplicatePolicy(str, Enum):
+    """
+    Обработка почти одинаковых (пересжатых, уменьшенных) копий уже проверенных фото
+    """
+    REUSE = "reuse"  # Вернуть известный результат без проверок
+    FLAG = "flag"    # Выполнить проверки и отметить совпадение в ответе
+    OFF = "off"      # Не искать совпадения
+
+class Priority(str, Enum):
+    """
+    Очередь обработки: интерактивные загрузки обслуживаются раньше массовых
+    """
+    INTERACTIVE = "interactive"  # Клиент ждет результат (киоск, форма)
+    BULK = "bulk"                # Массовая загрузка, задержка не критична
+
+class NearDuplicateInfo(BaseModel):
+    """
+    Сведения о найденной почти одинаковой фотографии
+    """
+    contentHash: str = Field(..., description="SHA-256 ранее проверенного файла")
+    distance: int = Field(..., description="Расстояние Хэмминга между перцептивными хэшами")
+    reused: bool = Field(..., description="Результат взят у найденного файла")
+
 class ValidationResponse(BaseModel):
     """
     Модель ответа при загрузке фото на валидацию
     """
     requestId: str = Field(..., description="Уникальный идентификатор запроса")
+    nearDuplicate: Optional[NearDuplicateInfo] = Field(None, description="Найденная почти одинаковая фотография")
+
+class CancellationResponse(BaseModel):
+    """
+    Модель ответа на отмену обработки
+    """
+    requestId: str = Field(..., description="Уникальный идентификатор запроса")
+    status: str = Field(..., description="CANCELLED - задача снята с очереди, CANCELLING - выполняющиеся проверки будут прерваны")
 
 class CheckResult(BaseModel):
     """
@@ -22,13 +54,73 @@ class ValidationResult(BaseModel):
     Модель результата валидации
     """
     requestId: str = Field(..., description="Уникальный идентификатор запроса")
-    status: str = Field(..., description="Статус обработки (PENDING, PROCESSING, COMPLETED, FAILED)")
+    status: str = Field(..., description="Статус обработки (PENDING, PROCESSING, COMPLETED, FAILED, EXPIRED, CANCELLED)")
     overallStatus: Optional[str] = Field(None, description="Итоговый статус валидации (APPROVED, REJECTED, MANUAL_REVIEW)")
     processedAt: Optional[datetime] = Field(None, description="Время завершения обработки")
     processingTime: Optional[float] = Field(None, description="Время обработки в секундах")
     checks: Optional[List[CheckResult]] = Field(None, description="Результаты отдельных проверок")
     issues: Optional[List[str]] = Field(None, description="Коды обнаруженных проблем")
-    errorMessage: Optional[str] = Field(None, description="Сообщение об ошибке (если status=FAILED)")
+    errorMessage: Optional[str] = Field(None, description="Сообщение об ошибке (если status=FAILED, EXPIRED или CANCELLED)")
+    batchId: Optional[str] = Field(None, description="Идентификатор пакетной загрузки")
+    nearDuplicate: Optional[NearDuplicateInfo] = Field(None, description="Найденная почти одинаковая фотография")
+
+def to_result_response(result: dict) -> dict:
+    """
+    Приводит ключи результата (ValidationRequest.to_dict()) к полям ValidationResult (camelCase)
+    """
+    result = dict(result)
+    if "overall_status" in result:
+        result["overallStatus"] = result.pop("overall_status")
+    if "created_at" in result:
+        result["createdAt"] = result.pop("created_at")
+    if "processed_at" in result:
+        result["processedAt"] = result.pop("processed_at")
+    if "error_message" in result:
+        result["errorMessage"] = result.pop("error_message")
+    if "request_id" in result:
+        result["requestId"] = result.pop("request_id")
+    if "processing_time" in result:
+        result["processingTime"] = result.pop("processing_time")
+    if "batch_id" in result:
+        result["batchId"] = result.pop("batch_id")
+    return result
+
+class BatchItem(BaseModel):
+    """
+    Элемент пакетной загрузки
+    """
+    filename: str = Field(..., description="Имя файла (для архивов - путь внутри архива)")
+    requestId: str = Field(..., description="Идентификатор запроса для элемента")
+    error: Optional[str] = Field(None, description="Ошибка приема файла (элемент не будет обработан)")
+    code: Optional[str] = Field(None, description="Код ошибки приема файла")
+
+class BatchValidationResponse(BaseModel):
+    """
+    Модель ответа при пакетной загрузке
+    """
+    batchId: str = Field(..., description="Идентификатор пакетной загрузки")
+    items: List[BatchItem] = Field(..., description="Элементы пакета")
+
+class BatchResultItem(BaseModel):
+    """
+    Краткий результат элемента пакета
+    """
+    requestId: str = Field(..., description="Идентификатор запроса")
+    filename: Optional[str] = Field(None, description="Имя файла")
+    status: str = Field(..., description="Статус обработки")
+    overallStatus: Optional[str] = Field(None, description="Итоговый статус валидации")
+    errorMessage: Optional[str] = Field(None, description="Сообщение об ошибке")
+
+class BatchResult(BaseModel):
+    """
+    Сводный результат пакетной загрузки
+    """
+    batchId: str = Field(..., description="Идентификатор пакетной загрузки")
+    total: int = Field(..., description="Количество элементов")
+    completed: bool = Field(..., description="Обработаны ли все элементы")
+    statusCounts: Dict[str, int] = Field(..., description="Количество элементов по статусу обработки")
+    overallStatusCounts: Dict[str, int] = Field(..., description="Количество элементов по итоговому статусу")
+    items: List[BatchResultItem] = Field(..., description="Результаты элементов")
 
 class ErrorResponse(BaseModel):
     """
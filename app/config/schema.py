@@ -45,6 +45,12 @@ class ProcessingConfig(BaseModel):
         default=True,
         description="Run checks in parallel when possible"
     )
+    analysis_target_size: int = Field(
+        default=1280,
+        ge=0,
+        le=10000,
+        description="Target long side of the working image in pixels; JPEGs are decoded at 1/2, 1/4 or 1/8 scale down to it (0 disables)"
+    )
 
 
 class StorageConfig(BaseModel):
@@ -0,0 +1,163 @@
+"""
+Контроль приема задач обработки (admission control).
+
+Каждая принятая обработка занимает место в очереди и бюджет памяти,
+выраженный в мегапикселях декодированного кадра, до своего завершения
+(ожидание слота, проверки). Если места или бюджета нет, загрузка отклоняется
+сразу, до декодирования, с Retry-After, рассчитанным по наблюдаемой
+скорости обработки: лучше отказать рано, чем нарушить SLA всех запросов.
+"""
+import math
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.exceptions import PhotoValidationError
+from app.core.logging import get_logger
+from app.core.monitoring import performance_monitor
+
+logger = get_logger(__name__)
+
+
+class AdmissionRejected(PhotoValidationError):
+    """Очередь обработки заполнена"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(
+            message=f"Processing queue is full ({reason}), retry in {retry_after} s",
+            code="QUEUE_FULL"
+        )
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Учет принятых, но не завершенных обработок.
+    Потокобезопасен: освобождение может происходить из пула потоков.
+    """
+
+    def __init__(
+        self,
+        max_depth: int = settings.PROCESSING_QUEUE_MAX_DEPTH,
+        max_megapixels: float = settings.PROCESSING_QUEUE_MAX_MEGAPIXELS,
+        rate_window: int = 100
+    ):
+        """
+        Args:
+            max_depth: Максимальное число принятых обработок
+            max_megapixels: Бюджет декодированных кадров принятых обработок, Мп
+            rate_window: Число последних завершений для оценки скорости обработки
+        """
+        self.max_depth = max_depth
+        self.max_megapixels = max_megapixels
+        self._admitted: Dict[str, float] = {}
+        self._megapixels = 0.0
+        self._completions = deque(maxlen=rate_window)
+        self._rejections: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def depth(self) -> int:
+        return len(self._admitted)
+
+    def service_rate(self) -> Optional[float]:
+        """Наблюдаемая скорость завершения обработок, задач в секунду"""
+        with self._lock:
+            if len(self._completions) < 2:
+                return None
+            elapsed = time.monotonic() - self._completions[0]
+            count = len(self._completions)
+        return count / elapsed if elapsed > 0 else None
+
+    def retry_after(self) -> int:
+        """
+        Через сколько секунд стоит повторить запрос: время, за которое
+        текущая очередь обрабатывается с наблюдаемой скоростью.
+        """
+        rate = self.service_rate()
+        if not rate:
+            return settings.ADMISSION_DEFAULT_RETRY_AFTER
+        seconds = math.ceil(max(1, self.depth) / rate)
+        return max(1, min(settings.ADMISSION_MAX_RETRY_AFTER, seconds))
+
+    def admit(self, request_id: str, megapixels: float) -> None:
+        """
+        Резервирует место для обработки.
+
+        Raises:
+            AdmissionRejected: Очередь заполнена по числу задач или по бюджету памяти
+        """
+        with self._lock:
+            if len(self._admitted) >= self.max_depth:
+                reason = "depth"
+            elif self._admitted and self._megapixels + megapixels > self.max_megapixels:
+                # Один кадр больше бюджета принимается только в пустую очередь
+                reason = "megapixels"
+            else:
+                self._admitted[request_id] = megapixels
+                self._megapixels += megapixels
+                performance_monitor.record_queue_depth(len(self._admitted))
+                return
+            self._rejections[reason] += 1
+        self._reject(request_id, reason)
+
+    def check(self, request_id: str) -> None:
+        """
+        Проверяет, что очередь принимает задачи, не резервируя места.
+        Так принимается пакет целиком: его элементы не декодируются до
+        получения слота и ждут в очереди bulk, не занимая места и бюджета.
+
+        Raises:
+            AdmissionRejected: Очередь заполнена по числу задач
+        """
+        with self._lock:
+            if len(self._admitted) < self.max_depth:
+                return
+            self._rejections["depth"] += 1
+        self._reject(request_id, "depth")
+
+    def _reject(self, request_id: str, reason: str) -> None:
+        retry_after = self.retry_after()
+        logger.warning(f"Rejected request {request_id}: processing queue full ({reason}), retry after {retry_after} s")
+        raise AdmissionRejected(reason, retry_after)
+
+    def release(self, request_id: str, completed: bool = True) -> None:
+        """
+        Освобождает место обработки; completed учитывает завершение в скорости обработки.
+        Для непринятых запросов ничего не делает.
+        """
+        with self._lock:
+            megapixels = self._admitted.pop(request_id, None)
+            if megapixels is None:
+                return
+            self._megapixels = max(0.0, self._megapixels - megapixels)
+            if completed:
+                self._completions.append(time.monotonic())
+            performance_monitor.record_queue_depth(len(self._admitted))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Глубина очереди, занятый бюджет и число отказов"""
+        rate = self.service_rate()
+        with self._lock:
+            return {
+                "depth": len(self._admitted),
+                "max_depth": self.max_depth,
+                "megapixels": round(self._megapixels, 2),
+                "max_megapixels": self.max_megapixels,
+                "rejected": dict(self._rejections),
+                "rejected_total": sum(self._rejections.values()),
+                "service_rate_per_second": round(rate, 3) if rate else None,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._admitted.clear()
+            self._megapixels = 0.0
+            self._completions.clear()
+            self._rejections.clear()
+
+
+admission_controller = AdmissionController()
@@ -1,9 +1,20 @@
 # ФАЙЛ: app/core/config.py
 
 import os
-from typing import Optional, List
+import tempfile
+from typing import Dict, Optional, List
 import logging
 
+
+def _parse_mapping(value: str) -> Dict[str, str]:
+    """Разбирает строку вида "key1:value1,key2:value2" """
+    return {
+        key.strip(): item.strip()
+        for key, _, item in (pair.partition(":") for pair in value.split(","))
+        if key.strip() and item.strip()
+    }
+
+
 class Settings:
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "Photo Validation Service"
@@ -21,6 +32,9 @@ class Settings:
     MIN_IMAGE_WIDTH: int = max(100, int(os.getenv("MIN_IMAGE_WIDTH", "400")))
     MIN_IMAGE_HEIGHT: int = max(100, int(os.getenv("MIN_IMAGE_HEIGHT", "500")))
     MAX_FILE_SIZE_BYTES: int = min(10 * 1024 * 1024, max(100 * 1024, int(os.getenv("MAX_FILE_SIZE_BYTES", str(1 * 1024 * 1024)))))  # Ограничение: 100KB - 10MB
+    MAX_BATCH_FILES: int = max(1, min(100000, int(os.getenv("MAX_BATCH_FILES", "1000"))))  # Файлов в одной пакетной загрузке
+    MAX_BATCH_SIZE_BYTES: int = max(10 * 1024 * 1024, min(4 * 1024 * 1024 * 1024, int(os.getenv("MAX_BATCH_SIZE_BYTES", str(256 * 1024 * 1024)))))  # Ограничение тела пакетной загрузки
+    UPLOAD_OVERHEAD_BYTES: int = max(4 * 1024, int(os.getenv("UPLOAD_OVERHEAD_BYTES", str(64 * 1024))))  # Запас на multipart-заголовки сверх размера файла
 
     # Validation settings - Face Detection & Position
     FACE_CONFIDENCE_THRESHOLD: float = max(0.1, min(0.9, float(os.getenv("FACE_CONFIDENCE_THRESHOLD", "0.4"))))
@@ -53,7 +67,92 @@ class Settings:
     ALLOWED_ORIGINS: List[str] = [origin.strip() for origin in os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",") if origin.strip()]
 
     # Processing settings
-    MAX_CONCURRENT_PROCESSING: int = max(1, min(20, int(os.getenv("MAX_CONCURRENT_PROCESSING", "5"))))
+    MAX_CONCURRENT_PROCESSING: int = max(1, min(256, int(os.getenv("MAX_CONCURRENT_PROCESSING", "5"))))
+    # Движок проверок: thread - пул потоков процесса API, process - пул процессов,
+    # каждый выполняет конвейер проверок целиком (число процессов, 0 - по числу доступных ядер)
+    CHECK_ENGINE: str = os.getenv("CHECK_ENGINE", "thread").lower()
+    CHECK_PROCESS_WORKERS: int = max(0, min(256, int(os.getenv("CHECK_PROCESS_WORKERS", "0"))))
+    # Пул потоков проверок (0 - по числу доступных ядер) и потоки OpenCV и BLAS одной проверки
+    # (0 - ядра / размер пула, чтобы проверки * потоки не превышали числа ядер)
+    CHECK_EXECUTOR_WORKERS: int = max(0, min(256, int(os.getenv("CHECK_EXECUTOR_WORKERS", "0"))))
+    CV_THREADS_PER_CHECK: int = max(0, min(64, int(os.getenv("CV_THREADS_PER_CHECK", "0"))))
+    # Одновременно выполняемые проверки одного запроса (по графу requires/provides)
+    MAX_PARALLEL_CHECKS: int = max(1, min(64, int(os.getenv("MAX_PARALLEL_CHECKS", "4"))))
+    # Admission control: принятые, но не завершенные обработки (очередь + выполняемые)
+    PROCESSING_QUEUE_MAX_DEPTH: int = max(1, min(100000, int(os.getenv("PROCESSING_QUEUE_MAX_DEPTH", "200"))))
+    PROCESSING_QUEUE_MAX_MEGAPIXELS: float = max(1.0, float(os.getenv("PROCESSING_QUEUE_MAX_MEGAPIXELS", "2000")))  # Декодированные кадры
+    ADMISSION_DEFAULT_RETRY_AFTER: int = max(1, min(3600, int(os.getenv("ADMISSION_DEFAULT_RETRY_AFTER", "5"))))  # Пока скорость обработки неизвестна
+    ADMISSION_MAX_RETRY_AFTER: int = max(1, min(3600, int(os.getenv("ADMISSION_MAX_RETRY_AFTER", "120"))))
+    # Приоритеты обработки: слоты только для interactive и доля bulk при конкуренции очередей
+    INTERACTIVE_RESERVED_SLOTS: int = max(0, min(20, int(os.getenv("INTERACTIVE_RESERVED_SLOTS", "1"))))
+    INTERACTIVE_WEIGHT: int = max(1, min(100, int(os.getenv("INTERACTIVE_WEIGHT", "4"))))  # Задач interactive на одну bulk
+    # Приоритет по ключу API (X-API-Key): "key1:bulk,key2:interactive"
+    PRIORITY_API_KEYS: Dict[str, str] = {
+        key: value.lower() for key, value in _parse_mapping(os.getenv("PRIORITY_API_KEYS", "")).items()
+    }
+    # Арендаторы (X-Tenant-ID или ключ API): "key1:tenant1,key2:tenant2"
+    TENANT_API_KEYS: Dict[str, str] = _parse_mapping(os.getenv("TENANT_API_KEYS", ""))
+    # Веса арендаторов в deficit round-robin ("tenant1:3,tenant2:1", остальные - 1)
+    TENANT_WEIGHTS: Dict[str, int] = {
+        tenant: max(1, min(1000, int(weight))) for tenant, weight in _parse_mapping(os.getenv("TENANT_WEIGHTS", "")).items()
+    }
+    # Пределы выполняемых задач арендаторов ("tenant1:2") и предел по умолчанию (0 - без предела)
+    TENANT_MAX_IN_FLIGHT: Dict[str, int] = {
+        tenant: max(0, min(1000, int(limit))) for tenant, limit in _parse_mapping(os.getenv("TENANT_MAX_IN_FLIGHT", "")).items()
+    }
+    TENANT_DEFAULT_MAX_IN_FLIGHT: int = max(0, min(1000, int(os.getenv("TENANT_DEFAULT_MAX_IN_FLIGHT", "0"))))
+    # Пул потоков для блокирующих этапов приема (декодирование, запись файла, БД) и его очередь
+    INGEST_EXECUTOR_WORKERS: int = max(1, min(64, int(os.getenv("INGEST_EXECUTOR_WORKERS", "8"))))
+    INGEST_EXECUTOR_MAX_PENDING: int = max(1, min(10000, int(os.getenv("INGEST_EXECUTOR_MAX_PENDING", "64"))))
+    # Измерение задержки цикла событий
+    LOOP_LAG_SAMPLE_INTERVAL_SECONDS: float = max(0.01, min(10.0, float(os.getenv("LOOP_LAG_SAMPLE_INTERVAL_SECONDS", "0.1"))))
+    LOOP_LAG_WARNING_MS: float = max(1.0, min(60000.0, float(os.getenv("LOOP_LAG_WARNING_MS", "200"))))
+    # Кэш результатов по хэшу содержимого файла
+    RESULT_CACHE_ENABLED: bool = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    RESULT_CACHE_SIZE: int = max(0, min(1000000, int(os.getenv("RESULT_CACHE_SIZE", "10000"))))
+    # Почти одинаковые файлы: reuse - вернуть известный результат, flag - обработать и отметить, off - не искать
+    NEAR_DUPLICATE_POLICY: str = os.getenv("NEAR_DUPLICATE_POLICY", "flag").lower()
+    NEAR_DUPLICATE_MAX_DISTANCE: int = max(0, min(20, int(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", "6"))))  # Бит из 64
+    # Период дозагрузки перцептивного индекса записями других процессов, секунды (0 - при каждом поиске)
+    NEAR_DUPLICATE_INDEX_REFRESH_SECONDS: float = max(0.0, min(3600.0, float(os.getenv("NEAR_DUPLICATE_INDEX_REFRESH_SECONDS", "5"))))
+    # Дедлайн синхронной валидации (POST /validate/sync), мс
+    SYNC_VALIDATION_TIMEOUT_MS: int = max(50, min(60000, int(os.getenv("SYNC_VALIDATION_TIMEOUT_MS", "1000"))))
+    SYNC_VALIDATION_MAX_TIMEOUT_MS: int = max(50, min(60000, int(os.getenv("SYNC_VALIDATION_MAX_TIMEOUT_MS", "30000"))))
+    # Ожидание результата: long-poll (GET /results/{id}?wait=) и SSE (GET /results/{id}/events), секунды
+    RESULT_WAIT_MAX_SECONDS: int = max(1, min(300, int(os.getenv("RESULT_WAIT_MAX_SECONDS", "60"))))
+    RESULT_EVENTS_MAX_SECONDS: int = max(1, min(3600, int(os.getenv("RESULT_EVENTS_MAX_SECONDS", "300"))))
+    RESULT_EVENTS_KEEPALIVE_SECONDS: int = max(1, min(300, int(os.getenv("RESULT_EVENTS_KEEPALIVE_SECONDS", "15"))))
+    # Шина уведомлений между процессами: auto (postgres для PostgreSQL, иначе socket), postgres, socket, none
+    NOTIFICATION_BUS: str = os.getenv("NOTIFICATION_BUS", "auto").lower()
+    NOTIFICATION_SOCKET_DIR: str = os.getenv(
+        "NOTIFICATION_SOCKET_DIR", os.path.join(tempfile.gettempdir(), "photo-validation-bus")
+    )
+
+    # Webhook с результатом (callback_url): outbox-таблица, повторы с экспоненциальной задержкой
+    WEBHOOKS_ENABLED: bool = os.getenv("WEBHOOKS_ENABLED", "true").lower() in ("1", "true", "yes")
+    WEBHOOK_ALLOWED_HOSTS: List[str] = [host.strip().lower() for host in os.getenv("WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()]  # Пусто - любые публичные адреса; перечисленные хосты могут быть внутренними
+    WEBHOOK_TIMEOUT_SECONDS: float = max(1.0, min(120.0, float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", "10"))))
+    WEBHOOK_MAX_ATTEMPTS: int = max(1, min(50, int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))))
+    WEBHOOK_RETRY_BASE_SECONDS: float = max(0.1, min(600.0, float(os.getenv("WEBHOOK_RETRY_BASE_SECONDS", "2"))))
+    WEBHOOK_RETRY_MAX_SECONDS: float = max(1.0, min(86400.0, float(os.getenv("WEBHOOK_RETRY_MAX_SECONDS", "3600"))))
+    WEBHOOK_PER_HOST_CONCURRENCY: int = max(1, min(100, int(os.getenv("WEBHOOK_PER_HOST_CONCURRENCY", "4"))))
+    WEBHOOK_MAX_CONNECTIONS: int = max(1, min(1000, int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "100"))))
+    WEBHOOK_BATCH_SIZE: int = max(1, min(1000, int(os.getenv("WEBHOOK_BATCH_SIZE", "100"))))
+    WEBHOOK_POLL_INTERVAL_SECONDS: float = max(0.05, min(60.0, float(os.getenv("WEBHOOK_POLL_INTERVAL_SECONDS", "1"))))
+
+    # Ключи идемпотентности (заголовок Idempotency-Key): срок действия и очистка просроченных
+    IDEMPOTENCY_TTL_SECONDS: int = max(60, min(604800, int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))))
+    IDEMPOTENCY_SWEEP_INTERVAL_SECONDS: float = max(1.0, min(86400.0, float(os.getenv("IDEMPOTENCY_SWEEP_INTERVAL_SECONDS", "300"))))
+    IDEMPOTENCY_SWEEP_BATCH_SIZE: int = max(1, min(100000, int(os.getenv("IDEMPOTENCY_SWEEP_BATCH_SIZE", "1000"))))
+
+    # Очередь обработки: memory - в памяти процесса, database - таблица validation_jobs,
+    # которую разбирают все процессы с JOB_QUEUE_CONSUME (процессы API и python -m app.worker)
+    JOB_QUEUE: str = os.getenv("JOB_QUEUE", "memory").lower()
+    JOB_QUEUE_CONSUME: bool = os.getenv("JOB_QUEUE_CONSUME", "true").lower() in ("1", "true", "yes")
+    # Аренда задачи (продлевается, пока задача у обработчика) и число аренд до перевода в DEAD
+    JOB_QUEUE_VISIBILITY_TIMEOUT_SECONDS: float = max(5.0, min(3600.0, float(os.getenv("JOB_QUEUE_VISIBILITY_TIMEOUT_SECONDS", "60"))))
+    JOB_QUEUE_MAX_ATTEMPTS: int = max(1, min(100, int(os.getenv("JOB_QUEUE_MAX_ATTEMPTS", "3"))))
+    JOB_QUEUE_POLL_INTERVAL_SECONDS: float = max(0.05, min(60.0, float(os.getenv("JOB_QUEUE_POLL_INTERVAL_SECONDS", "0.5"))))
 
     # Validation requirements tolerance (percentage)
     REQUIREMENTS_TOLERANCE: float = max(0.0, min(1.0, float(os.getenv("REQUIREMENTS_TOLERANCE", "0.4"))))
@@ -62,3 +62,15 @@ class CVProcessingError(PhotoValidationError):
         details: Optional[Dict[str, Any]] = None
     ):
         super().__init__(message=message, code=code, details=details)
+
+class ProcessingCancelled(PhotoValidationError):
+    """
+    Обработка отменена клиентом
+    """
+    def __init__(
+        self,
+        message: str = "Cancelled by client",
+        code: str = "CANCELLED",
+        details: Optional[Dict[str, Any]] = None
+    ):
+        super().__init__(message=message, code=code, details=details)
@@ -0,0 +1,199 @@
+"""
+Выделенные пулы потоков: этапы приема загрузок и проверки изображений.
+
+Декодирование изображения, перцептивный хэш, запись файла в хранилище и
+транзакции SQLAlchemy выполняются вне цикла событий, чтобы прием больших
+файлов не задерживал остальные запросы (в том числе /health). Пул отделен
+от пула проверок, а число ожидающих этапов ограничено: при переполнении
+новые этапы ждут в цикле событий, а не в неограниченной очереди пула.
+
+Синхронные проверки выполняются в собственном пуле, размер которого
+согласован с числом ядер и потоками OpenCV и BLAS: проверки * потоки одной
+проверки не превышают числа доступных ядер, иначе одновременные проверки,
+собственные потоки OpenCV и пул BLAS конкурируют за одни ядра.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+import cv2
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.monitoring import performance_monitor
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # Без threadpoolctl ограничение BLAS действует только на новые процессы
+    threadpool_limits = None
+
+# Переменные окружения, задающие число потоков BLAS при загрузке библиотеки
+BLAS_THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+class BoundedExecutor:
+    """Пул потоков с ограничением числа принятых, но не завершенных задач"""
+
+    def __init__(self, max_workers: int, max_pending: int, thread_name_prefix: str):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._loop = loop
+        return self._slots
+
+    async def run(self, stage: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Выполняет func в пуле и учитывает время ожидания и выполнения этапа stage.
+        """
+        queued_at = time.perf_counter()
+        async with self._get_slots():
+            loop = asyncio.get_running_loop()
+            started = [0.0]
+
+            def call() -> T:
+                started[0] = time.perf_counter()
+                return func(*args, **kwargs)
+
+            try:
+                return await loop.run_in_executor(self._executor, call)
+            finally:
+                finished = time.perf_counter()
+                wait = (started[0] or finished) - queued_at
+                performance_monitor.record_stage(stage, finished - (started[0] or finished), wait)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+ingest_executor = BoundedExecutor(
+    max_workers=settings.INGEST_EXECUTOR_WORKERS,
+    max_pending=settings.INGEST_EXECUTOR_MAX_PENDING,
+    thread_name_prefix="ingest"
+)
+
+
+async def run_blocking(stage: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Выполняет блокирующий этап приема загрузки в выделенном пуле"""
+    return await ingest_executor.run(stage, func, *args, **kwargs)
+
+
+def available_cpus() -> int:
+    """Число ядер, доступных процессу (с учетом привязки к ядрам)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def plan_check_threads(cpus: int, workers: int = 0, cv_threads: int = 0) -> Dict[str, int]:
+    """
+    Размер пула проверок и число потоков OpenCV и BLAS одной проверки.
+
+    Args:
+        cpus: Число доступных ядер
+        workers: Размер пула (0 - по числу ядер)
+        cv_threads: Потоки одной проверки (0 - ядра / размер пула, не меньше 1)
+    """
+    workers = workers or cpus
+    cv_threads = cv_threads or max(1, cpus // workers)
+    return {"cpus": cpus, "workers": workers, "cv_threads": cv_threads, "blas_threads": cv_threads}
+
+
+def limit_native_threads(threads: int) -> str:
+    """
+    Ограничивает потоки OpenCV и BLAS процесса.
+
+    Returns:
+        Способ ограничения BLAS: threadpoolctl (в текущем процессе)
+        или env (только для процессов, запущенных после вызова)
+    """
+    cv2.setNumThreads(threads)
+    for variable in BLAS_THREAD_VARIABLES:
+        os.environ[variable] = str(threads)
+    if threadpool_limits is None:
+        return "env"
+    threadpool_limits(limits=threads, user_api="blas")
+    return "threadpoolctl"
+
+
+class CheckExecutor:
+    """
+    Пул потоков синхронных проверок, согласованный с потоками OpenCV и BLAS.
+    Создается при первом обращении или вызове configure.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.CHECK_EXECUTOR_WORKERS,
+        cv_threads: int = settings.CV_THREADS_PER_CHECK
+    ):
+        """
+        Args:
+            workers: Размер пула (0 - по числу ядер)
+            cv_threads: Потоки OpenCV и BLAS одной проверки (0 - ядра / размер пула)
+        """
+        self.workers = workers
+        self.cv_threads = cv_threads
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._sizing: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, cpus: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Рассчитывает размеры, ограничивает потоки OpenCV и BLAS и создает пул.
+
+        Args:
+            cpus: Ядра, доступные проверкам (по умолчанию все доступные процессу)
+        """
+        sizing: Dict[str, Any] = plan_check_threads(cpus or available_cpus(), self.workers, self.cv_threads)
+        sizing["blas_control"] = limit_native_threads(sizing["cv_threads"])
+        executor = ThreadPoolExecutor(max_workers=sizing["workers"], thread_name_prefix="check")
+        with self._lock:
+            previous, self._executor = self._executor, executor
+            self._sizing = sizing
+        if previous is not None:
+            previous.shutdown(wait=False)
+        logger.info(
+            f"Check pool: {sizing['workers']} threads, {sizing['cv_threads']} OpenCV/BLAS threads per check, "
+            f"{sizing['cpus']} CPUs"
+        )
+        return sizing
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self.configure()
+        return self._executor
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Выбранные размеры; oversubscription - потоки проверок на одно ядро"""
+        with self._lock:
+            if not self._sizing:
+                return {"configured": False}
+            sizing = dict(self._sizing)
+        sizing["configured"] = True
+        sizing["oversubscription"] = round(sizing["workers"] * sizing["cv_threads"] / sizing["cpus"], 2)
+        return sizing
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+check_executor = CheckExecutor()
@@ -0,0 +1,201 @@
+"""
+Быстрое чтение заголовков изображений без декодирования пикселей.
+
+Разбирает контейнеры JPEG (маркеры SOF), PNG (IHDR), WebP (VP8/VP8L/VP8X),
+BMP и TIFF (первый IFD) и возвращает формат, размеры и число каналов.
+Позволяет отклонять файлы неверного формата и слишком большие изображения
+до полного декодирования.
+"""
+import struct
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from app.core.exceptions import FileValidationError
+
+
+@dataclass(frozen=True)
+class ImageInfo:
+    """Сведения об изображении, прочитанные из заголовка"""
+    format: str
+    width: int
+    height: int
+    channels: int
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+    @property
+    def mime_type(self) -> str:
+        return FORMAT_MIME_TYPES[self.format]
+
+
+FORMAT_MIME_TYPES = {
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "webp": "image/webp",
+    "bmp": "image/bmp",
+    "tiff": "image/tiff",
+}
+
+# Маркеры SOF, содержащие размеры кадра (C4, C8 и CC - служебные маркеры)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Маркеры без поля длины
+_JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_COLOR_TYPE_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+
+
+def _invalid(message: str) -> FileValidationError:
+    return FileValidationError(message=message, code="INVALID_IMAGE_DATA")
+
+
+def _probe_jpeg(data: bytes) -> Optional[ImageInfo]:
+    pos = 2
+    size = len(data)
+    while pos < size:
+        # Пропускаем байты-заполнители 0xFF перед маркером
+        if data[pos] != 0xFF:
+            raise _invalid("Corrupted JPEG: marker expected")
+        while pos < size and data[pos] == 0xFF:
+            pos += 1
+        if pos >= size:
+            return None
+        marker = data[pos]
+        pos += 1
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (0xD9, 0xDA):
+            raise _invalid("Corrupted JPEG: no frame header before image data")
+        if pos + 2 > size:
+            return None
+        (length,) = struct.unpack(">H", data[pos:pos + 2])
+        if length < 2:
+            raise _invalid("Corrupted JPEG: invalid segment length")
+        if marker in _JPEG_SOF_MARKERS:
+            if pos + 8 > size:
+                return None
+            height, width, components = struct.unpack(">HHB", data[pos + 3:pos + 8])
+            return ImageInfo("jpeg", width, height, components)
+        pos += length
+    return None
+
+
+def _probe_png(data: bytes) -> Optional[ImageInfo]:
+    if len(data) < 26:
+        return None
+    if data[12:16] != b"IHDR":
+        raise _invalid("Corrupted PNG: IHDR chunk expected")
+    width, height, _bit_depth, color_type = struct.unpack(">IIBB", data[16:26])
+    channels = _PNG_COLOR_TYPE_CHANNELS.get(color_type)
+    if channels is None:
+        raise _invalid(f"Corrupted PNG: unknown color type {color_type}")
+    return ImageInfo("png", width, height, channels)
+
+
+def _probe_webp(data: bytes) -> Optional[ImageInfo]:
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+    payload = data[20:]
+    if chunk == b"VP8 ":
+        if payload[3:6] != b"\x9d\x01\x2a":
+            raise _invalid("Corrupted WebP: invalid VP8 start code")
+        width, height = struct.unpack("<HH", payload[6:10])
+        return ImageInfo("webp", width & 0x3FFF, height & 0x3FFF, 3)
+    if chunk == b"VP8L":
+        if payload[0] != 0x2F:
+            raise _invalid("Corrupted WebP: invalid VP8L signature")
+        (bits,) = struct.unpack("<I", payload[1:5])
+        width = (bits & 0x3FFF) + 1
+        height = ((bits >> 14) & 0x3FFF) + 1
+        has_alpha = (bits >> 28) & 0x1
+        return ImageInfo("webp", width, height, 4 if has_alpha else 3)
+    if chunk == b"VP8X":
+        flags = payload[0]
+        width = int.from_bytes(payload[4:7], "little") + 1
+        height = int.from_bytes(payload[7:10], "little") + 1
+        return ImageInfo("webp", width, height, 4 if flags & 0x10 else 3)
+    raise _invalid("Corrupted WebP: unknown bitstream chunk")
+
+
+def _probe_bmp(data: bytes) -> Optional[ImageInfo]:
+    if len(data) < 26:
+        return None
+    (header_size,) = struct.unpack("<I", data[14:18])
+    if header_size == 12:
+        width, height, _planes, bpp = struct.unpack("<HHHH", data[18:26])
+    else:
+        if len(data) < 30:
+            return None
+        width, height, _planes, bpp = struct.unpack("<iiHH", data[18:30])
+        # Отрицательная высота означает порядок строк сверху вниз
+        height = abs(height)
+    if width <= 0 or height <= 0:
+        raise _invalid("Corrupted BMP: invalid dimensions")
+    return ImageInfo("bmp", width, height, 4 if bpp == 32 else 3)
+
+
+def _probe_tiff(data: bytes) -> Optional[ImageInfo]:
+    endian = "<" if data[:2] == b"II" else ">"
+    if len(data) < 8:
+        return None
+    (ifd_offset,) = struct.unpack(endian + "I", data[4:8])
+    if ifd_offset + 2 > len(data):
+        return None
+    (entries,) = struct.unpack(endian + "H", data[ifd_offset:ifd_offset + 2])
+    if ifd_offset + 2 + entries * 12 > len(data):
+        return None
+
+    width = height = None
+    channels = 1
+    for index in range(entries):
+        entry = ifd_offset + 2 + index * 12
+        tag, field_type = struct.unpack(endian + "HH", data[entry:entry + 4])
+        if field_type == 3:  # SHORT
+            (value,) = struct.unpack(endian + "H", data[entry + 8:entry + 10])
+        elif field_type == 4:  # LONG
+            (value,) = struct.unpack(endian + "I", data[entry + 8:entry + 12])
+        else:
+            continue
+        if tag == 256:
+            width = value
+        elif tag == 257:
+            height = value
+        elif tag == 277:
+            channels = value
+    if width is None or height is None:
+        raise _invalid("Corrupted TIFF: image dimensions are missing")
+    return ImageInfo("tiff", width, height, channels)
+
+
+def probe_image_header(data: Union[bytes, bytearray]) -> Optional[ImageInfo]:
+    """
+    Определяет формат, размеры и число каналов изображения по заголовку.
+
+    Args:
+        data: Начало файла (или файл целиком)
+
+    Returns:
+        ImageInfo или None, если данных пока недостаточно для разбора заголовка
+
+    Raises:
+        FileValidationError: Неподдерживаемый формат или поврежденный заголовок
+    """
+    if len(data) < 12:
+        return None
+    if data[:3] == b"\xff\xd8\xff":
+        return _probe_jpeg(data)
+    if data[:8] == _PNG_SIGNATURE:
+        return _probe_png(data)
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return _probe_webp(data)
+    if data[:2] == b"BM":
+        return _probe_bmp(data)
+    if data[:4] in (b"II*\x00", b"MM\x00*"):
+        return _probe_tiff(data)
+    raise FileValidationError(
+        message="File content is not a supported image format",
+        code="INVALID_FILE_FORMAT"
+    )
@@ -4,9 +4,11 @@
 import time
 import asyncio
 import psutil
+from collections import deque
 from typing import Dict, Any, Optional
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from app.core.config import settings
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -23,8 +25,17 @@ class PerformanceMetrics:
     queue_size: int = 0
     cache_hits: int = 0
     cache_misses: int = 0
+    event_loop_lag: float = 0.0  # Последнее измерение задержки цикла событий, с
     last_updated: datetime = field(default_factory=datetime.now)
 
+@dataclass
+class StageMetrics:
+    """Время выполнения блокирующего этапа в выделенном пуле"""
+    count: int = 0
+    total_time: float = 0.0
+    total_wait: float = 0.0
+    max_time: float = 0.0
+
 class PerformanceMonitor:
     """
     Класс для мониторинга производительности системы.
@@ -35,6 +46,9 @@ class PerformanceMonitor:
         self.processing_times = []
         self.max_processing_times = 1000  # Храним последние 1000 времен обработки
         self._start_time = time.time()
+        self.stages: Dict[str, StageMetrics] = {}
+        # Задержки цикла событий за последние ~5 минут при интервале измерения по умолчанию
+        self.loop_lags = deque(maxlen=3000)
         
     def record_request_start(self):
         """Записывает начало обработки запроса"""
@@ -66,6 +80,48 @@ class PerformanceMonitor:
         """Записывает промах кэша"""
         self.metrics.cache_misses += 1
         
+    def record_stage(self, stage: str, run_time: float, wait_time: float):
+        """Записывает время блокирующего этапа и его ожидания в очереди пула"""
+        metrics = self.stages.get(stage)
+        if metrics is None:
+            metrics = self.stages.setdefault(stage, StageMetrics())
+        metrics.count += 1
+        metrics.total_time += run_time
+        metrics.total_wait += wait_time
+        metrics.max_time = max(metrics.max_time, run_time)
+        
+    def record_loop_lag(self, lag: float):
+        """Записывает задержку цикла событий"""
+        self.metrics.event_loop_lag = lag
+        self.loop_lags.append(lag)
+        
+    def get_loop_lag_stats(self) -> Dict[str, Any]:
+        """Возвращает статистику задержки цикла событий, мс"""
+        lags = sorted(self.loop_lags)
+        if not lags:
+            return {"current_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        return {
+            "current_ms": round(self.metrics.event_loop_lag * 1000, 2),
+            "p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 2),
+            "max_ms": round(lags[-1] * 1000, 2),
+        }
+        
+    def get_stage_stats(self) -> Dict[str, Any]:
+        """Возвращает статистику блокирующих этапов, мс"""
+        return {
+            stage: {
+                "count": metrics.count,
+                "average_ms": round(metrics.total_time / metrics.count * 1000, 2),
+                "average_wait_ms": round(metrics.total_wait / metrics.count * 1000, 2),
+                "max_ms": round(metrics.max_time * 1000, 2),
+            }
+            for stage, metrics in list(self.stages.items()) if metrics.count
+        }
+        
+    def record_queue_depth(self, queue_size: int):
+        """Записывает число принятых, но не завершенных обработок"""
+        self.metrics.queue_size = queue_size
+        
     def update_system_metrics(self, active_tasks: int, queue_size: int):
         """Обновляет системные метрики"""
         self.metrics.active_tasks = active_tasks
@@ -124,6 +180,8 @@ class PerformanceMonitor:
             "cache_misses": self.metrics.cache_misses,
             "cache_hit_rate_percent": round(cache_hit_rate, 2),
             "requests_per_minute": round(requests_per_minute, 2),
+            "event_loop_lag": self.get_loop_lag_stats(),
+            "blocking_stages": self.get_stage_stats(),
             "last_updated": self.metrics.last_updated.isoformat()
         }
         
@@ -150,6 +208,10 @@ class PerformanceMonitor:
         if metrics["success_rate_percent"] < 90 and metrics["total_requests"] > 10:
             health_issues.append("Low success rate")
             
+        # Проверяем задержку цикла событий (блокирующий код в обработчиках)
+        if metrics["event_loop_lag"]["current_ms"] > settings.LOOP_LAG_WARNING_MS:
+            health_issues.append("High event loop lag")
+            
         # Проверяем медленную обработку
         if metrics["average_processing_time_seconds"] > 30:
             health_issues.append("Slow processing")
@@ -188,6 +250,21 @@ class PerformanceContext:
             else:
                 logger.error(f"{self.operation_name} failed after {processing_time:.3f}s: {exc_val}")
 
+async def monitor_event_loop_lag(interval: float = settings.LOOP_LAG_SAMPLE_INTERVAL_SECONDS):
+    """
+    Измеряет задержку цикла событий: насколько позже запланированного
+    просыпается sleep(interval). Задержка означает, что цикл был занят
+    блокирующим кодом и не обслуживал другие запросы.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        performance_monitor.record_loop_lag(lag)
+        if lag > settings.LOOP_LAG_WARNING_MS / 1000:
+            logger.warning(f"Event loop lag {lag * 1000:.0f} ms")
+
 async def periodic_metrics_update():
     """Периодически обновляет системные метрики"""
     while True:
@@ -0,0 +1,329 @@
+"""
+Шина уведомлений об изменении запросов между процессами.
+
+Запрос может обрабатываться в одном процессе, а ожидание результата
+(long-poll, SSE) - выполняться в другом. Шина передает всем процессам
+короткое сообщение {request_id, status}; процесс, у которого есть подписчики
+на этот запрос, читает состояние из БД и будит их (ResultNotifier.handle_remote).
+
+Транспорты:
+- PostgreSQL LISTEN/NOTIFY, если DATABASE_URL указывает на PostgreSQL;
+- Unix datagram-сокеты в общем каталоге для SQLite и одного узла:
+  каждый процесс слушает свой сокет и отправляет сообщения во все остальные.
+"""
+import asyncio
+import json
+import os
+import queue
+import socket
+import threading
+import uuid
+from typing import Callable, Optional
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+CHANNEL = "validation_results"
+RECONNECT_DELAY_SECONDS = 5.0
+# Очередь отправки PostgreSQL: предел ожидающих сообщений и размер пачки NOTIFY
+SEND_QUEUE_SIZE = 10000
+SEND_BATCH_SIZE = 100
+SENDER_STOP_TIMEOUT_SECONDS = 5.0
+
+# handler(request_id, status), вызывается в цикле событий
+MessageHandler = Callable[[str, str], None]
+
+
+class NotificationBus:
+    """
+    Базовая шина: без транспорта, уведомления остаются внутри процесса.
+    Отправка возможна без start() (процессы, которые только публикуют).
+    """
+
+    name = "local"
+
+    def __init__(self):
+        # Идентификатор процесса: собственные сообщения не обрабатываются повторно
+        self.origin = uuid.uuid4().hex
+        self._handler: Optional[MessageHandler] = None
+
+    async def start(self, handler: MessageHandler) -> None:
+        self._handler = handler
+
+    async def stop(self) -> None:
+        self._handler = None
+
+    def send(self, request_id: str, status: str) -> None:
+        pass
+
+    def _encode(self, request_id: str, status: str) -> str:
+        return json.dumps({"request_id": request_id, "status": status, "origin": self.origin})
+
+    def _dispatch(self, payload) -> None:
+        """Разбирает сообщение другого процесса и передает обработчику"""
+        try:
+            message = json.loads(payload)
+            if message.get("origin") == self.origin:
+                return
+            request_id, status = message["request_id"], message["status"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Ignoring malformed notification: {payload!r:.200}")
+            return
+        if self._handler is not None:
+            self._handler(request_id, status)
+
+
+class PostgresNotificationBus(NotificationBus):
+    """
+    Шина на PostgreSQL LISTEN/NOTIFY.
+    Прослушивание идет на отдельном соединении, читаемом из цикла событий;
+    при разрыве соединение восстанавливается. Отправка только ставит сообщение
+    в очередь: NOTIFY выполняет фоновый поток пачками на своем соединении,
+    так что цикл событий не ждет БД.
+    """
+
+    name = "postgres"
+
+    def __init__(self, database_url: str, channel: str = CHANNEL):
+        super().__init__()
+        from sqlalchemy.engine import make_url
+        self.dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.channel = channel
+        self._listen_conn = None
+        self._send_queue: "queue.Queue[Optional[str]]" = queue.Queue(SEND_QUEUE_SIZE)
+        self._sender: Optional[threading.Thread] = None
+        self._sender_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+
+    def _connect(self):
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+        conn = psycopg2.connect(self.dsn)
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        return conn
+
+    async def start(self, handler: MessageHandler) -> None:
+        await super().start(handler)
+        self._loop = asyncio.get_running_loop()
+        try:
+            await self._listen()
+        except Exception as e:
+            logger.warning(f"Failed to LISTEN on {self.channel}: {type(e).__name__}: {str(e)}")
+            self._schedule_reconnect()
+
+    async def _listen(self) -> None:
+        conn = await self._loop.run_in_executor(None, self._connect)
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        self._listen_conn = conn
+        self._loop.add_reader(conn.fileno(), self._on_readable)
+        logger.info(f"Listening for notifications on PostgreSQL channel {self.channel}")
+
+    def _on_readable(self) -> None:
+        conn = self._listen_conn
+        try:
+            conn.poll()
+        except Exception as e:
+            logger.warning(f"Notification connection lost: {type(e).__name__}: {str(e)}")
+            self._close_listener()
+            self._schedule_reconnect()
+            return
+        while conn.notifies:
+            self._dispatch(conn.notifies.pop(0).payload)
+
+    def _close_listener(self) -> None:
+        conn, self._listen_conn = self._listen_conn, None
+        if conn is None:
+            return
+        try:
+            self._loop.remove_reader(conn.fileno())
+        except Exception:
+            pass
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _schedule_reconnect(self) -> None:
+        if self._handler is None or (self._reconnect_task and not self._reconnect_task.done()):
+            return
+        self._reconnect_task = self._loop.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        while self._handler is not None and self._listen_conn is None:
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+            try:
+                await self._listen()
+            except Exception as e:
+                logger.warning(f"Failed to reconnect notification listener: {type(e).__name__}: {str(e)}")
+
+    async def stop(self) -> None:
+        await super().stop()
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        self._close_listener()
+        await asyncio.get_running_loop().run_in_executor(None, self._stop_sender)
+
+    def send(self, request_id: str, status: str) -> None:
+        """Ставит сообщение в очередь отправки; вызывается из любого потока и не блокируется"""
+        self._start_sender()
+        try:
+            self._send_queue.put_nowait(self._encode(request_id, status))
+        except queue.Full:
+            logger.warning(f"Notification send queue is full, dropping message for {request_id}")
+
+    def _start_sender(self) -> None:
+        if self._sender is not None and self._sender.is_alive():
+            return
+        with self._sender_lock:
+            if self._sender is None or not self._sender.is_alive():
+                self._sender = threading.Thread(target=self._send_loop, name="notification-sender", daemon=True)
+                self._sender.start()
+
+    def _stop_sender(self) -> None:
+        """Отправляет накопленные сообщения и останавливает поток отправки"""
+        with self._sender_lock:
+            sender = self._sender
+            if sender is None or not sender.is_alive():
+                return
+            try:
+                self._send_queue.put(None, timeout=SENDER_STOP_TIMEOUT_SECONDS)
+            except queue.Full:
+                logger.warning("Notification send queue is full, stopping sender without flushing")
+                return
+            sender.join(SENDER_STOP_TIMEOUT_SECONDS)
+
+    def _send_loop(self) -> None:
+        conn = None
+        stopping = False
+        while not stopping:
+            payload = self._send_queue.get()
+            if payload is None:
+                break
+            batch = [payload]
+            while len(batch) < SEND_BATCH_SIZE:
+                try:
+                    payload = self._send_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if payload is None:
+                    stopping = True
+                    break
+                batch.append(payload)
+            conn = self._send_batch(conn, batch)
+        if conn is not None:
+            conn.close()
+
+    def _send_batch(self, conn, batch):
+        """Выполняет NOTIFY для пачки сообщений; возвращает соединение для следующей пачки"""
+        # Одна повторная попытка на случай разорванного соединения
+        for attempt in range(2):
+            try:
+                if conn is None or conn.closed:
+                    conn = self._connect()
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload", (self.channel, batch)
+                    )
+                return conn
+            except Exception as e:
+                conn = None
+                if attempt:
+                    logger.warning(f"Failed to send {len(batch)} notifications: {type(e).__name__}: {str(e)}")
+        return None
+
+
+class SocketNotificationBus(NotificationBus):
+    """
+    Шина на Unix datagram-сокетах для SQLite и одного узла.
+    Сокеты процессов лежат в общем каталоге; сокеты завершившихся процессов удаляются при отправке.
+    """
+
+    name = "socket"
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.directory = directory
+        self.path = os.path.join(directory, f"{self.origin[:16]}.sock")
+        self._sock: Optional[socket.socket] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._send_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._send_sock.setblocking(False)
+
+    async def start(self, handler: MessageHandler) -> None:
+        await super().start(handler)
+        os.makedirs(self.directory, exist_ok=True)
+        self._loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        sock.bind(self.path)
+        self._sock = sock
+        self._loop.add_reader(sock.fileno(), self._on_readable)
+        logger.info(f"Listening for notifications on {self.path}")
+
+    def _on_readable(self) -> None:
+        while True:
+            try:
+                payload = self._sock.recv(4096)
+            except (BlockingIOError, InterruptedError):
+                return
+            self._dispatch(payload)
+
+    async def stop(self) -> None:
+        await super().stop()
+        if self._sock is not None:
+            self._loop.remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def send(self, request_id: str, status: str) -> None:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        payload = self._encode(request_id, status).encode()
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if not name.endswith(".sock") or path == self.path:
+                continue
+            try:
+                self._send_sock.sendto(payload, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Процесс завершился, не удалив сокет
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except BlockingIOError:
+                logger.warning(f"Notification queue of {name} is full, dropping message for {request_id}")
+            except OSError as e:
+                logger.warning(f"Failed to send notification to {name}: {str(e)}")
+
+
+def create_notification_bus(database_url: str, kind: str = "auto", socket_dir: Optional[str] = None) -> NotificationBus:
+    """
+    Создает шину уведомлений.
+
+    Args:
+        database_url: URL базы данных (для выбора транспорта и подключения к PostgreSQL)
+        kind: auto, postgres, socket или none
+        socket_dir: Каталог сокетов для транспорта socket
+    """
+    if kind == "auto":
+        if database_url.startswith("postgresql"):
+            kind = "postgres"
+        elif hasattr(socket, "AF_UNIX") and socket_dir:
+            kind = "socket"
+        else:
+            kind = "none"
+    if kind == "postgres":
+        return PostgresNotificationBus(database_url)
+    if kind == "socket":
+        return SocketNotificationBus(socket_dir)
+    return NotificationBus()
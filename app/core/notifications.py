@@ -0,0 +1,132 @@
+"""
+Уведомления об изменении запросов на валидацию внутри процесса.
+
+Репозиторий публикует состояние запроса после фиксации транзакции,
+а SSE-поток и long-poll GET /results/{id} ждут уведомления вместо
+периодических запросов к БД. Публикация потокобезопасна: запись
+может выполняться в пуле потоков, подписчики живут в цикле событий API.
+Изменения из других процессов приходят через шину уведомлений (notification_bus).
+"""
+import asyncio
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.logging import get_logger
+from app.core.notification_bus import NotificationBus
+
+logger = get_logger(__name__)
+
+TERMINAL_STATUSES = ("COMPLETED", "FAILED", "EXPIRED", "CANCELLED")
+
+Subscription = Tuple[asyncio.AbstractEventLoop, asyncio.Queue]
+
+
+class ResultNotifier:
+    """
+    Подписки на изменения запросов по request_id.
+    Каждый подписчик получает очередь словарей в формате ValidationRequest.to_dict().
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._bus = NotificationBus()
+        self._load_state: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None
+        self._remote_tasks: Set[asyncio.Task] = set()
+
+    def attach_bus(self, bus: NotificationBus, load_state: Callable[[str], Optional[Dict[str, Any]]]) -> None:
+        """
+        Подключает шину уведомлений между процессами.
+
+        Args:
+            bus: Шина для отправки изменений другим процессам
+            load_state: Чтение состояния запроса из БД по request_id (для сообщений шины)
+        """
+        self._bus = bus
+        self._load_state = load_state
+
+    def subscriber_count(self, request_id: Optional[str] = None) -> int:
+        with self._lock:
+            if request_id is not None:
+                return len(self._subscribers.get(request_id, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def subscribe(self, request_id: str) -> asyncio.Queue:
+        """Подписывает текущий цикл событий на изменения запроса"""
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(request_id, []).append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, request_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(request_id)
+            if not subscribers:
+                return
+            subscribers[:] = [item for item in subscribers if item[1] is not queue]
+            if not subscribers:
+                del self._subscribers[request_id]
+
+    def publish(self, request_id: str, state: Dict[str, Any]) -> None:
+        """
+        Передает новое состояние запроса подписчикам этого и других процессов.
+        Вызывается после фиксации изменений в БД, из любого потока.
+        """
+        self._deliver(request_id, state)
+        try:
+            self._bus.send(request_id, state.get("status"))
+        except Exception as e:
+            logger.warning(f"Failed to broadcast update of {request_id}: {type(e).__name__}: {str(e)}")
+
+    def handle_remote(self, request_id: str, status: str) -> None:
+        """
+        Обработчик сообщений шины: если в процессе есть подписчики на запрос,
+        читает его состояние из БД и передает им. Вызывается в цикле событий.
+        """
+        if self._load_state is None or not self.subscriber_count(request_id):
+            return
+        task = asyncio.get_running_loop().create_task(self._deliver_remote(request_id))
+        self._remote_tasks.add(task)
+        task.add_done_callback(self._remote_tasks.discard)
+
+    async def _deliver_remote(self, request_id: str) -> None:
+        try:
+            state = await asyncio.get_running_loop().run_in_executor(None, self._load_state, request_id)
+        except Exception as e:
+            logger.warning(f"Failed to load state of {request_id}: {type(e).__name__}: {str(e)}")
+            return
+        if state is not None:
+            self._deliver(request_id, state)
+
+    def _deliver(self, request_id: str, state: Dict[str, Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(request_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, state)
+            except RuntimeError:
+                # Цикл подписчика уже закрыт
+                self.unsubscribe(request_id, queue)
+
+    async def wait_for_result(self, request_id: str, queue: asyncio.Queue, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Ждет завершения запроса (COMPLETED или FAILED) по подписке queue.
+
+        Returns:
+            Итоговое состояние или None, если запрос не завершился за timeout секунд
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            try:
+                state = await asyncio.wait_for(queue.get(), remaining)
+            except asyncio.TimeoutError:
+                return None
+            if state.get("status") in TERMINAL_STATUSES:
+                return state
+
+
+result_notifier = ResultNotifier()
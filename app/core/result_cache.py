@@ -0,0 +1,264 @@
+"""
+Кэш результатов валидации для повторно загружаемых файлов.
+
+Ключ - SHA-256 содержимого файла и версия (отпечаток) конфигурации проверок.
+Два уровня: LRU в памяти процесса и таблица в БД, общая для всех процессов API.
+Изменение конфигурации меняет версию, поэтому старые результаты перестают
+находиться; при уведомлении ConfigurationManager они также удаляются.
+
+Для почти одинаковых файлов (пересжатие, другой формат, небольшое изменение
+размера) результаты ищутся по перцептивному хэшу в BK-дереве. Дерево версии
+конфигурации загружается из БД при первом поиске и пополняется результатами
+этого процесса; записи других процессов (API и обработчиков) дозагружаются
+из БД не реже раза в NEAR_DUPLICATE_INDEX_REFRESH_SECONDS.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from app.config.manager import get_config_manager
+from app.core.check_config import check_config
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.monitoring import performance_monitor
+from app.cv.perceptual_hash import BKTree, hash_from_hex, hash_to_hex
+from app.db.repositories import ResultCacheRepository
+
+logger = get_logger(__name__)
+
+# Дозагрузка индекса захватывает и записи, зафиксированные позже своего
+# created_at (долгая транзакция, расхождение часов узлов); повторное
+# добавление хэша в BK-дерево ничего не меняет
+INDEX_REFRESH_OVERLAP = timedelta(seconds=60)
+
+
+def get_config_version() -> str:
+    """
+    Возвращает отпечаток конфигурации, влияющей на результат проверок:
+    параметры модулей (check_config) и раздел validation ConfigurationManager.
+    """
+    config = get_config_manager().get_config()
+    payload = {
+        "checks": check_config.config,
+        "validation": config.validation.model_dump(mode="json"),
+        "analysis_target_size": config.system.processing.analysis_target_size,
+    }
+    serialized = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode()).hexdigest()[:32]
+
+
+@dataclass
+class NearDuplicate:
+    """Найденный почти одинаковый файл с известным результатом"""
+    content_hash: str
+    distance: int
+    result: Dict[str, Any]
+
+
+class ResultCache:
+    """
+    Двухуровневый кэш результатов валидации.
+    Ошибки постоянного уровня не прерывают обработку: кэш только ускоряет ответ.
+    """
+
+    def __init__(self, max_entries: int = settings.RESULT_CACHE_SIZE, persistent: bool = True):
+        """
+        Args:
+            max_entries: Размер LRU-уровня в памяти
+            persistent: Использовать уровень в БД
+        """
+        self.max_entries = max_entries
+        self.persistent = persistent
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Перцептивные индексы по версиям конфигурации и время их загрузки из БД:
+        # версия -> (начало последней успешной загрузки, utc; time.monotonic() последней попытки)
+        self._similarity_index: Dict[str, BKTree] = {}
+        self._index_loaded: Dict[str, Tuple[Optional[datetime], float]] = {}
+
+    def _remember(self, key: Tuple[str, str], result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, content_hash: str, config_version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Ищет результат для содержимого файла.
+
+        Returns:
+            Словарь с overall_status, checks, issues или None при промахе
+        """
+        if not content_hash or not settings.RESULT_CACHE_ENABLED:
+            return None
+        result = self._lookup((content_hash, config_version or get_config_version()))
+        if result is None:
+            performance_monitor.record_cache_miss()
+            return None
+        performance_monitor.record_cache_hit()
+        logger.info(f"Result cache hit for content {content_hash[:12]}")
+        return result
+
+    def _lookup(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        """Поиск по ключу на обоих уровнях без учета в метриках"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                return result
+        if not self.persistent:
+            return None
+        try:
+            result = ResultCacheRepository.get(*key)
+        except Exception as e:
+            logger.warning(f"Result cache lookup failed: {type(e).__name__}: {str(e)}")
+            return None
+        if result is not None:
+            self._remember(key, result)
+        return result
+
+    def put(
+        self,
+        content_hash: str,
+        result: Dict[str, Any],
+        config_version: Optional[str] = None,
+        perceptual_hash: Optional[int] = None
+    ) -> None:
+        """
+        Сохраняет результат, вычисленный с версией конфигурации config_version.
+        perceptual_hash добавляет файл в индекс почти одинаковых изображений.
+        """
+        if not content_hash or not settings.RESULT_CACHE_ENABLED:
+            return
+        key = (content_hash, config_version or get_config_version())
+        entry = {
+            "overall_status": result["overall_status"],
+            "checks": result["checks"],
+            "issues": result["issues"],
+        }
+        self._remember(key, entry)
+        if perceptual_hash is not None:
+            with self._lock:
+                index = self._similarity_index.get(key[1])
+                if index is None and not self.persistent:
+                    index = self._similarity_index.setdefault(key[1], BKTree())
+                # Незагруженный индекс получит запись из БД при первом поиске
+                if index is not None:
+                    index.add(perceptual_hash, content_hash)
+        if self.persistent:
+            try:
+                ResultCacheRepository.put(
+                    key[0], key[1], entry,
+                    perceptual_hash=hash_to_hex(perceptual_hash) if perceptual_hash is not None else None
+                )
+            except Exception as e:
+                logger.warning(f"Result cache store failed: {type(e).__name__}: {str(e)}")
+
+    def _get_similarity_index(self, config_version: str) -> BKTree:
+        """
+        Перцептивный индекс версии конфигурации. Загружается из БД при первом
+        поиске, затем дополняется записями, добавленными с прошлой загрузки.
+        """
+        with self._lock:
+            index = self._similarity_index.get(config_version)
+            if index is not None and not self.persistent:
+                return index
+            loaded_at, refreshed = self._index_loaded.get(config_version, (None, 0.0))
+            if index is not None:
+                if time.monotonic() - refreshed < settings.NEAR_DUPLICATE_INDEX_REFRESH_SECONDS:
+                    return index
+                # Параллельные поиски не повторяют дозагрузку и используют текущий индекс
+                self._index_loaded[config_version] = (loaded_at, time.monotonic())
+
+        since = loaded_at - INDEX_REFRESH_OVERLAP if index is not None and loaded_at is not None else None
+        started_at = datetime.utcnow()
+        rows = []
+        if self.persistent:
+            try:
+                rows = ResultCacheRepository.get_perceptual_hashes(config_version, since)
+            except Exception as e:
+                logger.warning(f"Failed to load perceptual index: {type(e).__name__}: {str(e)}")
+                started_at = loaded_at
+
+        fresh = index is None
+        if fresh:
+            index = BKTree()
+            for content_hash, perceptual_hash in rows:
+                index.add(hash_from_hex(perceptual_hash), content_hash)
+        with self._lock:
+            # Другой поток мог загрузить индекс раньше
+            current = self._similarity_index.setdefault(config_version, index)
+            if current is not index or not fresh:
+                for content_hash, perceptual_hash in rows:
+                    current.add(hash_from_hex(perceptual_hash), content_hash)
+            self._index_loaded[config_version] = (started_at, time.monotonic())
+        if fresh:
+            logger.info(f"Loaded perceptual index for config version {config_version[:12]}: {len(current)} entries")
+        return current
+
+    def find_similar(
+        self,
+        perceptual_hash: int,
+        max_distance: int,
+        config_version: Optional[str] = None
+    ) -> Optional[NearDuplicate]:
+        """
+        Ищет ближайший по перцептивному хэшу файл с известным результатом.
+
+        Args:
+            perceptual_hash: dHash загруженного изображения
+            max_distance: Максимальное расстояние Хэмминга
+            config_version: Версия конфигурации (по умолчанию текущая)
+        """
+        if not settings.RESULT_CACHE_ENABLED:
+            return None
+        config_version = config_version or get_config_version()
+        index = self._get_similarity_index(config_version)
+        with self._lock:
+            candidates = index.search(perceptual_hash, max_distance)
+        for distance, _, content_hash in candidates:
+            result = self._lookup((content_hash, config_version))
+            if result is not None:
+                logger.info(f"Near-duplicate of content {content_hash[:12]} found at distance {distance}")
+                return NearDuplicate(content_hash=content_hash, distance=distance, result=result)
+        return None
+
+    def clear(self) -> None:
+        """Очищает оба уровня кэша"""
+        with self._lock:
+            self._entries.clear()
+            self._similarity_index.clear()
+            self._index_loaded.clear()
+        if self.persistent:
+            try:
+                ResultCacheRepository.clear()
+            except Exception as e:
+                logger.warning(f"Result cache clear failed: {type(e).__name__}: {str(e)}")
+
+    def on_config_change(self, old_config, new_config) -> None:
+        """
+        Обработчик изменения конфигурации (ConfigurationManager.add_change_callback):
+        удаляет результаты, вычисленные с прежней конфигурацией.
+        """
+        version = get_config_version()
+        with self._lock:
+            for key in [key for key in self._entries if key[1] != version]:
+                del self._entries[key]
+            for stale_version in [v for v in self._similarity_index if v != version]:
+                del self._similarity_index[stale_version]
+                self._index_loaded.pop(stale_version, None)
+        if self.persistent:
+            try:
+                ResultCacheRepository.delete_stale(version)
+            except Exception as e:
+                logger.warning(f"Result cache invalidation failed: {type(e).__name__}: {str(e)}")
+        logger.info(f"Result cache invalidated, config version: {version}")
+
+
+result_cache = ResultCache()
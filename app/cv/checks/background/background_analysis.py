@@ -64,6 +64,7 @@ class BackgroundCheck(StandardCheckMixin, BaseCheck):
                 )
             ],
             dependencies=["opencv-python"],
+            requires=["face"],
             enabled_by_default=True
         )
     
@@ -73,6 +73,7 @@ class ExtraneousObjectsCheck(StandardCheckMixin, BaseCheck):
                 )
             ],
             dependencies=["opencv-python"],
+            requires=["face"],
             enabled_by_default=True
         )
     
@@ -68,6 +68,7 @@ class AccessoriesCheck(StandardCheckMixin, BaseCheck):
                 )
             ],
             dependencies=["opencv-python"],
+            requires=["face"],
             enabled_by_default=True
         )
     
@@ -56,6 +56,7 @@ class FaceCountCheck(StandardCheckMixin, BaseCheck):
                 )
             ],
             dependencies=["opencv-python"],
+            provides=["face", "faces", "landmarks"],
             enabled_by_default=True
         )
     
@@ -92,10 +93,11 @@ class FaceCountCheck(StandardCheckMixin, BaseCheck):
             min_count = self.parameters["min_count"]
             max_count = self.parameters["max_count"]
             
-            # Формируем детали
+            # Формируем детали (координаты в масштабе исходного изображения)
+            scale = context.get("analysis_scale", 1) if context else 1
             face_details = []
             for i, face in enumerate(faces):
-                bbox = face.get("bbox", [0, 0, 0, 0])
+                bbox = [int(v * scale) for v in face.get("bbox", [0, 0, 0, 0])]
                 confidence = face.get("confidence", 0.0)
                 face_details.append({
                     "id": i + 1,
@@ -57,6 +57,7 @@ class FacePoseCheck(StandardCheckMixin, BaseCheck):
                 )
             ],
             dependencies=["opencv-python"],
+            requires=["landmarks"],
             enabled_by_default=True
         )
     
@@ -91,6 +91,7 @@ class FacePositionCheck(StandardCheckMixin, BaseCheck):
                 )
             ],
             dependencies=["opencv-python"],
+            requires=["face"],
             enabled_by_default=True
         )
     
@@ -1,7 +1,7 @@
 """
 Миксины для устранения дублирования кода в модулях проверки.
 """
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -50,6 +50,18 @@ class StandardCheckMixin:
             "details": None
         }
 
+    def _get_full_resolution(self, image, context: Dict[str, Any]) -> Tuple[Any, float]:
+        """
+        Возвращает изображение в полном разрешении и масштаб относительно рабочего.
+        Рабочее изображение может быть уменьшено при декодировании; координаты
+        из контекста (bbox, landmarks) нужно умножить на масштаб.
+        """
+        loader = context.get("full_resolution") if context else None
+        if loader is None:
+            return image, 1.0
+        full_image = loader()
+        return full_image, full_image.shape[1] / image.shape[1]
+
     def _validate_face_context(self, context: Dict[str, Any], check_name: str) -> Dict[str, Any]:
         """Проверяет наличие контекста лица. Возвращает результат ошибки если контекст неверный."""
         if not context or "face" not in context:
@@ -38,6 +38,7 @@ class BlurrinessCheck(StandardCheckMixin, BaseCheck):
                 )
             ],
             dependencies=["opencv-python"],
+            requires=["face"],
             enabled_by_default=True
         )
     
@@ -59,9 +60,10 @@ class BlurrinessCheck(StandardCheckMixin, BaseCheck):
         if context_error:
             return context_error
 
-        # Get face region from context
-        x, y, width, height = context["face"]["bbox"]
-        face_region = image[y:y+height, x:x+width]
+        # Get face region from context (in full resolution, the threshold is calibrated for it)
+        full_image, scale = self._get_full_resolution(image, context)
+        x, y, width, height = (int(round(v * scale)) for v in context["face"]["bbox"])
+        face_region = full_image[y:y+height, x:x+width]
 
         if face_region.size == 0:
             logger.warning("Область лица пуста, пропускаем проверку размытости")
@@ -102,6 +102,7 @@ class RedEyeCheck(StandardCheckMixin, BaseCheck):
                 )
             ],
             dependencies=["opencv-python"],
+            requires=["landmarks"],
             enabled_by_default=True
         )
     
@@ -144,9 +145,10 @@ class RedEyeCheck(StandardCheckMixin, BaseCheck):
             }
 
         try:
-            # Получаем области глаз из landmarks
-            left_eye = np.array(landmarks[36:42], dtype=np.int32)
-            right_eye = np.array(landmarks[42:48], dtype=np.int32)
+            # Получаем области глаз из landmarks (в полном разрешении)
+            image, scale = self._get_full_resolution(image, context)
+            left_eye = np.round(np.array(landmarks[36:42], dtype=np.float64) * scale).astype(np.int32)
+            right_eye = np.round(np.array(landmarks[42:48], dtype=np.float64) * scale).astype(np.int32)
             
             # Проверка каждого глаза
             left_red, left_metrics = self._check_eye_region(image, left_eye, "left")
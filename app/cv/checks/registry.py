@@ -36,6 +36,8 @@ class CheckMetadata:
     author: str
     parameters: List[CheckParameter] = field(default_factory=list)
     dependencies: List[str] = field(default_factory=list)
+    requires: List[str] = field(default_factory=list)  # Context data the check reads (e.g. "face")
+    provides: List[str] = field(default_factory=list)  # Context data the check writes for others
     enabled_by_default: bool = True
 
 class BaseCheck(ABC):
@@ -250,6 +252,8 @@ class CheckRegistry:
                 "version": metadata.version,
                 "author": metadata.author,
                 "enabled_by_default": metadata.enabled_by_default,
+                "requires": list(metadata.requires),
+                "provides": list(metadata.provides),
                 "parameters": []
             }
             
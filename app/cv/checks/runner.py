@@ -3,11 +3,14 @@
 """
 import time
 import asyncio
-from typing import Dict, Any, List, Optional, Callable
+from typing import Dict, Any, List, Optional, Callable, Set
 import numpy as np
-import hashlib
+from dataclasses import dataclass
 from app.cv.checks.registry import check_registry, BaseCheck
 from app.core.check_config import check_config
+from app.core.config import settings
+from app.core.exceptions import ProcessingCancelled
+from app.core.executors import check_executor
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -45,9 +48,28 @@ class CheckContext:
         return self.metadata.get(key, default)
 
 
+@dataclass(frozen=True)
+class CheckPlan:
+    """
+    Подготовленный набор проверок: экземпляры включенных проверок в порядке
+    check_order, граф зависимостей и системные настройки. План не изменяется
+    после создания, его экземпляры проверок общие для всех запросов.
+    """
+    check_ids: tuple
+    checks: Dict[str, BaseCheck]
+    graph: Dict[str, Set[str]]
+    stop_on_failure: bool
+    max_check_time: float
+    max_parallel_checks: int
+
+
 class CheckRunner:
     """
     Класс для запуска проверок изображений в соответствии с конфигурацией.
+    
+    Экземпляры проверок создаются один раз и переиспользуются между запросами;
+    при изменении конфигурации план пересоздается (rebuild) и заменяется целиком,
+    выполняющиеся запросы дорабатывают со старым планом.
     """
     
     def __init__(self, config=None):
@@ -58,45 +80,97 @@ class CheckRunner:
             config: Конфигурация проверок (если None, используется глобальная конфигурация)
         """
         self.config = config or check_config
-        
-        # Получаем системные настройки
-        self.system_config = self.config.get_system_config()
-        self.stop_on_failure = self.system_config.get("stop_on_failure", False)
-        self.max_check_time = self.system_config.get("max_check_time", 5.0)
-        
-        # Кэш для результатов детекции лиц
-        self._face_detection_cache = {}
+        self._plan: Optional[CheckPlan] = None
     
-    def _get_image_hash(self, image: np.ndarray) -> str:
-        """Вычисляет хэш изображения для кэширования"""
-        # Используем небольшую выборку пикселей для быстрого хэширования
-        sample = image[::50, ::50].flatten()
-        return hashlib.md5(sample.tobytes()).hexdigest()
+    @property
+    def stop_on_failure(self) -> bool:
+        return self.plan.stop_on_failure
     
-    def _cache_face_detection(self, image: np.ndarray, faces: List[Dict[str, Any]]) -> None:
-        """Кэширует результаты детекции лиц"""
-        image_hash = self._get_image_hash(image)
-        self._face_detection_cache[image_hash] = faces
+    @property
+    def max_check_time(self) -> float:
+        return self.plan.max_check_time
+    
+    @property
+    def max_parallel_checks(self) -> int:
+        return self.plan.max_parallel_checks
+    
+    @property
+    def plan(self) -> CheckPlan:
+        """
+        Текущий план проверок. Создается при первом обращении и заново,
+        если изменился список включенных проверок.
+        """
+        plan = self._plan
+        if plan is None or plan.check_ids != tuple(self.config.get_enabled_checks()):
+            plan = self._plan = self._build_plan()
+        return plan
+    
+    def _build_plan(self) -> CheckPlan:
+        """Создает экземпляры включенных проверок и граф зависимостей"""
+        check_ids = tuple(self.config.get_enabled_checks())
+        checks: Dict[str, BaseCheck] = {}
+        for check_id in check_ids:
+            check_class = check_registry.get_check(check_id)
+            if not check_class:
+                logger.warning(f"Check {check_id} not found in registry. Skipping.")
+                continue
+            checks[check_id] = check_class(**self.config.get_check_params(check_id))
         
-        # Ограничиваем размер кэша
-        if len(self._face_detection_cache) > 100:
-            # Удаляем самые старые записи
-            oldest_key = next(iter(self._face_detection_cache))
-            del self._face_detection_cache[oldest_key]
+        system_config = self.config.get_system_config()
+        return CheckPlan(
+            check_ids=check_ids,
+            checks=checks,
+            graph=self._build_graph(list(checks)),
+            stop_on_failure=system_config.get("stop_on_failure", False),
+            max_check_time=system_config.get("max_check_time", 5.0),
+            max_parallel_checks=max(1, system_config.get("max_parallel_checks", settings.MAX_PARALLEL_CHECKS))
+        )
     
-    def _get_cached_face_detection(self, image: np.ndarray) -> Optional[List[Dict[str, Any]]]:
-        """Получает кэшированные результаты детекции лиц"""
-        image_hash = self._get_image_hash(image)
-        return self._face_detection_cache.get(image_hash)
+    def rebuild(self) -> None:
+        """
+        Пересоздает план по текущей конфигурации. При ошибке (например,
+        недопустимые параметры проверки) остается прежний план.
+        """
+        try:
+            plan = self._build_plan()
+        except Exception as e:
+            logger.error(f"Failed to rebuild check plan, keeping the previous one: {e}")
+            return
+        self._plan = plan
+        logger.info(f"Check plan rebuilt: {len(plan.checks)} checks")
     
-    def _can_run_parallel(self, check_id: str) -> bool:
-        """Определяет, можно ли запустить проверку параллельно"""
-        # Проверки, которые можно выполнять параллельно (не зависят от результатов других)
-        parallel_checks = {
-            'fileFormat', 'fileSize', 'dimensions', 'colorMode', 
-            'lighting', 'realPhoto', 'extraneous_objects'
-        }
-        return check_id in parallel_checks
+    def on_config_change(self, old_config, new_config) -> None:
+        """Обработчик изменения конфигурации (ConfigurationManager.add_change_callback)"""
+        self.rebuild()
+    
+    def _build_graph(self, check_ids: List[str]) -> Dict[str, Set[str]]:
+        """
+        Строит граф зависимостей по requires/provides метаданных проверок.
+        Проверка ждет предшествующие в check_order проверки, которые
+        предоставляют нужные ей данные; проверки без общих данных независимы.
+        """
+        metadata = {check_id: check_registry.get_metadata(check_id) for check_id in check_ids}
+        provided = {resource for meta in metadata.values() if meta for resource in meta.provides}
+        providers: Dict[str, str] = {}
+        graph: Dict[str, Set[str]] = {}
+        for check_id in check_ids:
+            meta = metadata[check_id]
+            graph[check_id] = set()
+            for resource in (meta.requires if meta else []):
+                if resource in providers:
+                    graph[check_id].add(providers[resource])
+                elif resource in provided:
+                    logger.warning(f"Check {check_id} requires '{resource}' provided by a later check, reorder check_order")
+            for resource in (meta.provides if meta else []):
+                providers.setdefault(resource, check_id)
+        return graph
+    
+    def _raise_if_cancelled(self, context: Dict[str, Any], next_check: str) -> None:
+        """Прерывает обработку на границе проверок, если установлен флаг отмены context["cancelled"]"""
+        cancelled = context.get("cancelled")
+        if cancelled is not None and cancelled.is_set():
+            logger.info(f"Checks cancelled before {next_check}")
+            raise ProcessingCancelled()
     
     async def run_checks(self, image: np.ndarray, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """
@@ -104,7 +178,8 @@ class CheckRunner:
         
         Args:
             image: Изображение для проверки
-            context: Начальный контекст (может содержать результаты предварительных проверок)
+            context: Начальный контекст (может содержать результаты предварительных проверок
+                и флаг отмены "cancelled" - threading.Event)
             
         Returns:
             Словарь с результатами всех проверок и общим результатом:
@@ -113,97 +188,68 @@ class CheckRunner:
                 "checks": [...],  # Результаты отдельных проверок
                 "issues": [...]   # Список проблем
             }
+        
+        Raises:
+            ProcessingCancelled: Флаг отмены установлен до запуска очередной проверки
         """
         # Инициализируем контекст, если его нет
         context = context or {}
         
-        # Получаем список включенных проверок в порядке выполнения
-        enabled_checks = self.config.get_enabled_checks()
-        
-        # Создаем список для результатов проверок
-        check_results = []
-        
-        # Создаем список для проблем
-        issues = []
-        
-        # Разделяем проверки на параллельные и последовательные
-        parallel_checks = []
-        sequential_checks = []
+        # План читается один раз: замена плана не влияет на выполняющийся запрос
+        plan = self.plan
+        checks = plan.checks
+        graph = plan.graph
         
-        for check_id in enabled_checks:
-            if self._can_run_parallel(check_id):
-                parallel_checks.append(check_id)
-            else:
-                sequential_checks.append(check_id)
-        
-        # Сначала запускаем последовательные проверки (включая face_count, которая устанавливает контекст)
-        for check_id in sequential_checks:
-            check_class = check_registry.get_check(check_id)
-            if not check_class:
-                logger.warning(f"Check {check_id} not found in registry. Skipping.")
-                continue
-            
-            check_params = self.config.get_check_params(check_id)
-            check_instance = check_class(**check_params)
-            
-            try:
-                result = await self._run_check_with_timeout(check_instance, check_id, image, context)
-                check_results.append(result)
-                context[check_id] = result
+        # Проверка запускается, как только готовы нужные ей данные,
+        # не более max_parallel_checks одновременно
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = list(checks)
+        running: Dict[asyncio.Future, str] = {}
+        stopped = False
+        try:
+            while pending or running:
+                if not stopped:
+                    for check_id in [c for c in pending if graph[c].issubset(results)]:
+                        if len(running) >= plan.max_parallel_checks:
+                            break
+                        self._raise_if_cancelled(context, check_id)
+                        pending.remove(check_id)
+                        task = asyncio.ensure_future(
+                            self._run_check_with_timeout(checks[check_id], check_id, image, context, plan.max_check_time)
+                        )
+                        running[task] = check_id
+                if not running:
+                    break
                 
-                if result.get("status") == "FAILED":
-                    reason = result.get("reason")
-                    if reason:
-                        issues.append(reason)
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    check_id = running.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        logger.error(f"Error running check {check_id}: {e}", exc_info=True)
+                        result = {
+                            "check": check_id,
+                            "status": "FAILED",
+                            "reason": f"Check error: {str(e)}",
+                            "details": None
+                        }
+                    results[check_id] = result
+                    context[check_id] = result
                     
-                    if self.stop_on_failure:
+                    if result.get("status") == "FAILED" and plan.stop_on_failure and not stopped:
                         logger.info(f"Stopping checks due to failure in {check_id}")
-                        break
-                        
-            except Exception as e:
-                logger.error(f"Error running check {check_id}: {e}", exc_info=True)
-                check_results.append({
-                    "check": check_id,
-                    "status": "FAILED",
-                    "reason": f"Check error: {str(e)}",
-                    "details": None
-                })
-                issues.append(f"Check {check_id} error: {str(e)}")
-                
-                if self.stop_on_failure:
-                    break
+                        stopped = True
+        finally:
+            for task in running:
+                task.cancel()
         
-        # Затем запускаем параллельные проверки (если не остановились на ошибке)
-        if parallel_checks and not (self.stop_on_failure and issues):
-            parallel_tasks = []
-            for check_id in parallel_checks:
-                check_class = check_registry.get_check(check_id)
-                if check_class:
-                    check_params = self.config.get_check_params(check_id)
-                    check_instance = check_class(**check_params)
-                    # Теперь передаем актуальный контекст, а не копию
-                    task = self._run_check_with_timeout(check_instance, check_id, image, context)
-                    parallel_tasks.append(task)
-            
-            # Ждем завершения всех параллельных проверок
-            parallel_results = await asyncio.gather(*parallel_tasks, return_exceptions=True)
-            
-            for result in parallel_results:
-                if isinstance(result, Exception):
-                    logger.error(f"Parallel check failed: {result}")
-                    continue
-                
-                check_results.append(result)
-                context[result["check"]] = result
-                
-                if result.get("status") == "FAILED":
-                    reason = result.get("reason")
-                    if reason:
-                        issues.append(reason)
-                    
-                    if self.stop_on_failure:
-                        logger.info(f"Stopping checks due to failure in {result['check']}")
-                        break
+        # Результаты и проблемы - в порядке check_order
+        check_results = [results[check_id] for check_id in checks if check_id in results]
+        issues = [
+            result["reason"] for result in check_results
+            if result.get("status") == "FAILED" and result.get("reason")
+        ]
         
         # Определяем общий статус проверки
         overall_status = self._determine_overall_status(check_results)
@@ -217,31 +263,27 @@ class CheckRunner:
         
         return result
     
-    async def _run_check_with_timeout(self, check: BaseCheck, check_id: str, image: np.ndarray, context: Dict[str, Any]) -> Dict[str, Any]:
+    async def _run_check_with_timeout(
+        self,
+        check: BaseCheck,
+        check_id: str,
+        image: np.ndarray,
+        context: Dict[str, Any],
+        max_check_time: Optional[float] = None
+    ) -> Dict[str, Any]:
         """
         Запускает одну проверку с ограничением по времени.
         """
+        max_check_time = max_check_time or self.max_check_time
         logger.info(f"Running check: {check_id}")
         start_time = time.time()
         
         try:
-            # Оптимизация для проверок лиц - используем кэш
-            if check_id in ['faceCount', 'facePosition', 'facePose', 'accessories']:
-                cached_faces = self._get_cached_face_detection(image)
-                if cached_faces is not None:
-                    context['cached_faces'] = cached_faces
-            
             check_result = await asyncio.wait_for(
                 self._run_check(check, image, context),
-                timeout=self.max_check_time
+                timeout=max_check_time
             )
             
-            # Кэшируем результаты детекции лиц
-            if check_id == 'faceCount' and check_result.get("status") == "PASSED":
-                faces = context.get('faces', [])
-                if faces:
-                    self._cache_face_detection(image, faces)
-            
             end_time = time.time()
             check_time = end_time - start_time
             logger.info(f"Check {check_id} completed in {check_time:.3f}s with status: {check_result.get('status')}")
@@ -252,11 +294,11 @@ class CheckRunner:
             return check_result
             
         except asyncio.TimeoutError:
-            logger.error(f"Check {check_id} timed out after {self.max_check_time}s")
+            logger.error(f"Check {check_id} timed out after {max_check_time}s")
             return {
                 "check": check_id,
                 "status": "FAILED",
-                "reason": f"Check timed out after {self.max_check_time}s",
+                "reason": f"Check timed out after {max_check_time}s",
                 "details": None
             }
     
@@ -276,9 +318,9 @@ class CheckRunner:
         if asyncio.iscoroutinefunction(check.run):
             result = await check.run(image, context)
         else:
-            # Запускаем синхронный метод в пуле исполнителей
+            # Запускаем синхронный метод в пуле проверок
             loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(None, check.run, image, context)
+            result = await loop.run_in_executor(check_executor.executor, check.run, image, context)
         
         return result
     
@@ -322,15 +364,6 @@ class CheckRunner:
         # Проверяем кэш в контексте
         if context.cached_faces is not None:
             return context.cached_faces
-            
-        # Проверяем глобальный кэш
-        cached_faces = self._get_cached_face_detection(image)
-        if cached_faces is not None:
-            # Конвертируем в numpy array для совместимости
-            faces_array = np.array([[f['x'], f['y'], f['width'], f['height']] 
-                                   for f in cached_faces])
-            context.set_cached_faces(faces_array)
-            return faces_array
         
         # Фиктивная детекция для тестов - в реальности используется cv2
         try:
@@ -338,11 +371,6 @@ class CheckRunner:
             face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             faces = face_cascade.detectMultiScale(gray, 1.1, 4)
-            
-            # Кэшируем результат
-            faces_list = [{'x': int(x), 'y': int(y), 'width': int(w), 'height': int(h)} 
-                         for x, y, w, h in faces]
-            self._cache_face_detection(image, faces_list)
             context.set_cached_faces(faces)
             
             return faces
@@ -388,4 +416,8 @@ class CheckRunner:
             
         # Если передан обычный Dict, возвращаем ошибку - нужно использовать async версию
         else:
-            raise RuntimeError("For dict context use async version: await run_checks()")
\ No newline at end of file
+            raise RuntimeError("For dict context use async version: await run_checks()")
+
+
+# Общий процессор проверок процесса: экземпляры проверок сохраняются между запросами
+check_runner = CheckRunner()
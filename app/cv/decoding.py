@@ -0,0 +1,87 @@
+"""
+Декодирование изображений для анализа.
+
+JPEG декодируется с уменьшением в 2, 4 или 8 раз прямо в DCT-области
+(cv2.IMREAD_REDUCED_COLOR_*), что сокращает время декодирования и пиковое
+потребление памяти. Полное разрешение декодируется лениво, только когда
+оно действительно нужно (например, для фрагментов лица).
+"""
+import threading
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+BASE_DECODE_FLAGS = cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+
+# Флаги декодирования с уменьшением (поддерживаются JPEG-декодером на уровне DCT)
+REDUCED_DECODE_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2 | cv2.IMREAD_IGNORE_ORIENTATION,
+    4: cv2.IMREAD_REDUCED_COLOR_4 | cv2.IMREAD_IGNORE_ORIENTATION,
+    8: cv2.IMREAD_REDUCED_COLOR_8 | cv2.IMREAD_IGNORE_ORIENTATION,
+}
+
+
+def choose_reduction(image_format: str, width: int, height: int, target_size: int) -> int:
+    """
+    Выбирает коэффициент уменьшения при декодировании.
+
+    Args:
+        image_format: Формат изображения из заголовка
+        width: Ширина исходного изображения
+        height: Высота исходного изображения
+        target_size: Желаемая длинная сторона рабочего изображения (0 - без уменьшения)
+
+    Returns:
+        1, 2, 4 или 8 - наибольший коэффициент, при котором длинная сторона
+        не становится меньше target_size
+    """
+    if image_format != "jpeg" or target_size <= 0:
+        return 1
+    long_side = max(width, height)
+    for factor in (8, 4, 2):
+        if long_side // factor >= target_size:
+            return factor
+    return 1
+
+
+def decode_image(content: bytes, reduction: int = 1) -> Optional[np.ndarray]:
+    """
+    Декодирует изображение в BGR с заданным коэффициентом уменьшения.
+
+    Returns:
+        Декодированное изображение или None, если данные не декодируются
+    """
+    flags = REDUCED_DECODE_FLAGS.get(reduction, BASE_DECODE_FLAGS)
+    return cv2.imdecode(np.frombuffer(content, np.uint8), flags)
+
+
+class FullResolutionLoader:
+    """
+    Ленивый загрузчик изображения в полном разрешении.
+    Декодирует исходные данные один раз при первом обращении; потокобезопасен,
+    так как проверки выполняются в пуле потоков.
+    """
+
+    def __init__(self, load_content: Callable[[], bytes]):
+        self._load_content = load_content
+        self._image: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def __call__(self) -> np.ndarray:
+        with self._lock:
+            if self._image is None:
+                image = decode_image(self._load_content())
+                if image is None:
+                    raise ValueError("Failed to decode full resolution image")
+                logger.debug(f"Full resolution image decoded lazily, shape: {image.shape}")
+                self._image = image
+            return self._image
+
+    @property
+    def loaded(self) -> bool:
+        return self._image is not None
@@ -0,0 +1,102 @@
+"""
+Перцептивный хэш изображений для поиска почти одинаковых фотографий.
+
+dHash строится по уменьшенной полутоновой копии и устойчив к пересжатию,
+смене формата и небольшому изменению размера. Близость хэшей измеряется
+расстоянием Хэмминга; для поиска в пределах радиуса используется BK-дерево.
+"""
+from typing import Any, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+HASH_SIZE = 8
+HASH_BITS = HASH_SIZE * HASH_SIZE
+
+
+def dhash(image: np.ndarray, hash_size: int = HASH_SIZE) -> int:
+    """
+    Вычисляет разностный хэш (dHash) изображения.
+
+    Args:
+        image: Изображение BGR или полутоновое
+        hash_size: Сторона сетки хэша (hash_size^2 бит)
+
+    Returns:
+        Хэш как целое число без знака
+    """
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    thumbnail = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(first: int, second: int) -> int:
+    """Количество различающихся бит двух хэшей"""
+    return (first ^ second).bit_count()
+
+
+def hash_to_hex(value: int) -> str:
+    """Представление 64-битного хэша для хранения в БД"""
+    return f"{value:0{HASH_BITS // 4}x}"
+
+
+def hash_from_hex(value: str) -> int:
+    return int(value, 16)
+
+
+class BKTree:
+    """
+    BK-дерево по метрике Хэмминга.
+    Поиск в радиусе r обходит только поддеревья с расстоянием до родителя
+    в диапазоне [d - r, d + r].
+    """
+
+    def __init__(self):
+        # Узел: [хэш, значение, {расстояние: дочерний узел}]
+        self._root: Optional[list] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, value_hash: int, value: Any) -> None:
+        """Добавляет хэш; для уже существующего хэша значение заменяется"""
+        if self._root is None:
+            self._root = [value_hash, value, {}]
+            self._size = 1
+            return
+        node = self._root
+        while True:
+            distance = hamming_distance(value_hash, node[0])
+            if distance == 0:
+                node[1] = value
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value_hash, value, {}]
+                self._size += 1
+                return
+            node = child
+
+    def search(self, value_hash: int, radius: int) -> List[Tuple[int, int, Any]]:
+        """
+        Находит хэши в пределах радиуса.
+
+        Returns:
+            Список (расстояние, хэш, значение), отсортированный по расстоянию
+        """
+        if self._root is None:
+            return []
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value_hash, node[0])
+            if distance <= radius:
+                found.append((distance, node[0], node[1]))
+            for child_distance, child in node[2].items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        found.sort(key=lambda item: item[0])
+        return found
@@ -29,7 +29,10 @@ class ValidationRequest(Base):
     request_id = Column(String, primary_key=True, index=True)
     filename = Column(String, nullable=True)  # Имя файла
     file_size = Column(Integer, nullable=True)  # Размер файла в байтах
-    status = Column(String, nullable=False)  # PENDING, PROCESSING, COMPLETED, FAILED
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 содержимого файла
+    batch_id = Column(String, nullable=True, index=True)  # ID пакетной загрузки
+    callback_url = Column(String(2048), nullable=True)  # URL для webhook с результатом
+    status = Column(String, nullable=False)  # PENDING, PROCESSING, COMPLETED, FAILED, EXPIRED, CANCELLED
     overall_status = Column(String, nullable=True)  # APPROVED, REJECTED, MANUAL_REVIEW
     checks = Column(get_json_type(), nullable=True)  # Dynamic JSON type
     issues = Column(get_json_type(), nullable=True)  # Dynamic JSON type
@@ -46,6 +49,7 @@ class ValidationRequest(Base):
             "request_id": self.request_id,
             "filename": self.filename,
             "file_size": self.file_size,
+            "batch_id": self.batch_id,
             "status": self.status,
             "created_at": self.created_at.isoformat() if isinstance(self.created_at, datetime) else self.created_at,
             "processed_at": self.processed_at.isoformat() if isinstance(self.processed_at, datetime) else self.processed_at,
@@ -59,11 +63,125 @@ class ValidationRequest(Base):
             if self.overall_status != "APPROVED":
                 result["issues"] = self.issues
         
-        if self.status == "FAILED":
+        if self.status in ("FAILED", "EXPIRED", "CANCELLED"):
             result["error_message"] = self.error_message
             
         return result
 
+class ValidationResultCache(Base):
+    """
+    Persistent tier of the result cache: validation results by file content
+    and check configuration version.
+    """
+    __tablename__ = "validation_result_cache"
+    
+    content_hash = Column(String(64), primary_key=True)  # SHA-256 содержимого файла
+    config_version = Column(String(64), primary_key=True, index=True)  # Отпечаток конфигурации проверок
+    perceptual_hash = Column(String(16), nullable=True)  # dHash изображения (hex)
+    overall_status = Column(String, nullable=False)
+    checks = Column(get_json_type(), nullable=True)
+    issues = Column(get_json_type(), nullable=True)
+    created_at = Column(TIMESTAMP, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_validation_result_cache_version_created", "config_version", "created_at"),
+    )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converts cached result to dictionary.
+        """
+        return {
+            "overall_status": self.overall_status,
+            "checks": self.checks,
+            "issues": self.issues
+        }
+
+class WebhookDelivery(Base):
+    """
+    Outbox of webhook deliveries: a row is added in the same transaction
+    that completes a request with a callback URL.
+    """
+    __tablename__ = "webhook_deliveries"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    request_id = Column(String, nullable=False, index=True)
+    url = Column(String(2048), nullable=False)
+    payload = Column(get_json_type(), nullable=False)  # Тело запроса (результат валидации)
+    status = Column(String, nullable=False, default="PENDING")  # PENDING, DELIVERED, FAILED
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(TIMESTAMP, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP, default=datetime.utcnow, nullable=False)
+    delivered_at = Column(TIMESTAMP, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_webhook_deliveries_status_next_attempt", "status", "next_attempt_at"),
+    )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converts delivery to dictionary.
+        """
+        return {
+            "id": self.id,
+            "request_id": self.request_id,
+            "url": self.url,
+            "payload": self.payload,
+            "status": self.status,
+            "attempts": self.attempts,
+        }
+
+class IdempotencyKey(Base):
+    """
+    Idempotency keys of accepted uploads: a repeated request with the same
+    key returns the original request_id until the key expires.
+    """
+    __tablename__ = "idempotency_keys"
+    
+    key_hash = Column(String(64), primary_key=True)  # SHA-256 арендатора и ключа
+    request_id = Column(String(36), nullable=False)
+    expires_at = Column(TIMESTAMP, nullable=False, index=True)
+
+class ValidationJob(Base):
+    """
+    Durable processing queue: a job is claimed by a worker process for a
+    visibility timeout and deleted when processing finishes.
+    """
+    __tablename__ = "validation_jobs"
+    
+    request_id = Column(String(36), primary_key=True)
+    file_path = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=True)
+    priority = Column(String(16), nullable=False, default="interactive")
+    tenant = Column(String(64), nullable=False, default="default")
+    deadline = Column(Float, nullable=True)  # time.time(), после которого результат не нужен
+    status = Column(String(16), nullable=False, default="QUEUED")  # QUEUED, RUNNING, DEAD
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(TIMESTAMP, nullable=False, default=datetime.utcnow)  # Окончание аренды RUNNING
+    locked_by = Column(String(128), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_validation_jobs_status_available", "status", "priority", "available_at"),
+    )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converts job to dictionary.
+        """
+        return {
+            "request_id": self.request_id,
+            "file_path": self.file_path,
+            "content_hash": self.content_hash,
+            "priority": self.priority,
+            "tenant": self.tenant,
+            "deadline": self.deadline,
+            "status": self.status,
+            "attempts": self.attempts,
+        }
+
 def init_db():
     """Initialize database and create tables."""
     engine = create_engine(
@@ -1,12 +1,14 @@
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime, timedelta
 import json
 from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
 from contextlib import contextmanager
 from app.core.config import settings
-from app.db.models import ValidationRequest
+from app.db.models import IdempotencyKey, ValidationJob, ValidationRequest, ValidationResultCache, WebhookDelivery
 from app.core.logging import get_logger
+from app.core.notifications import TERMINAL_STATUSES, result_notifier
 
 logger = get_logger(__name__)
 
@@ -33,22 +35,58 @@ def get_db_session():
     finally:
         session.close()
 
+def _enqueue_webhook(db, db_request: ValidationRequest, result_dict: Dict[str, Any]) -> None:
+    """
+    Добавляет доставку webhook для завершенного запроса в той же транзакции,
+    что и его результат (outbox): доставка не теряется при сбое после фиксации.
+    """
+    if not db_request.callback_url or db_request.status not in TERMINAL_STATUSES:
+        return
+    db.add(WebhookDelivery(
+        request_id=db_request.request_id,
+        url=db_request.callback_url,
+        payload=result_dict,
+        status="PENDING",
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+        created_at=datetime.utcnow()
+    ))
+
 class ValidationRequestRepository:
     """
     Репозиторий для работы с запросами на валидацию
     """
     @staticmethod
-    def create(request_id: str, filename: str = None, file_size: int = None, status: str = "PENDING") -> ValidationRequest:
+    def create(
+        request_id: str,
+        filename: str = None,
+        file_size: int = None,
+        status: str = "PENDING",
+        content_hash: str = None,
+        overall_status: str = None,
+        checks: List[Dict[str, Any]] = None,
+        issues: List[str] = None,
+        callback_url: str = None
+    ) -> ValidationRequest:
         """
-        Создает новый запрос на валидацию
+        Создает новый запрос на валидацию.
+        Для уже известного результата (кэш) запрос создается сразу завершенным.
         """
         with get_db_session() as db:
+            now = datetime.utcnow()
             db_request = ValidationRequest(
                 request_id=request_id,
                 filename=filename,
                 file_size=file_size,
+                content_hash=content_hash,
+                callback_url=callback_url,
                 status=status,
-                created_at=datetime.utcnow()
+                overall_status=overall_status,
+                checks=checks,
+                issues=issues,
+                created_at=now,
+                processed_at=now if status == "COMPLETED" else None,
+                processing_time=0.0 if status == "COMPLETED" else None
             )
             
             db.add(db_request)
@@ -56,6 +94,7 @@ class ValidationRequestRepository:
             
             # Создаем копию данных, чтобы вернуть их после закрытия сессии
             result_dict = db_request.to_dict()
+            _enqueue_webhook(db, db_request, result_dict)
             
             logger.info(f"Created validation request with ID: {request_id}")
             
@@ -63,8 +102,51 @@ class ValidationRequestRepository:
             result = ValidationRequest()
             for key, value in result_dict.items():
                 setattr(result, key, value)
-                
-            return result
+        
+        if status in TERMINAL_STATUSES:
+            result_notifier.publish(request_id, result_dict)
+        return result
+    
+    @staticmethod
+    def create_many(records: List[Dict[str, Any]]) -> int:
+        """
+        Создает несколько запросов на валидацию одной вставкой
+
+        Args:
+            records: Словари с полями ValidationRequest (request_id, status, ...)
+
+        Returns:
+            Количество созданных записей
+        """
+        if not records:
+            return 0
+        created_at = datetime.utcnow()
+        with get_db_session() as db:
+            db.bulk_insert_mappings(
+                ValidationRequest,
+                [{"created_at": created_at, **record} for record in records]
+            )
+        logger.info(f"Created {len(records)} validation requests in bulk")
+        return len(records)
+    
+    @staticmethod
+    def get_by_batch_id(batch_id: str) -> List[ValidationRequest]:
+        """
+        Получает все запросы пакетной загрузки
+        """
+        with get_db_session() as db:
+            db_requests = db.query(ValidationRequest).filter(
+                ValidationRequest.batch_id == batch_id
+            ).order_by(ValidationRequest.created_at).all()
+            
+            results = []
+            for db_request in db_requests:
+                # Создаем копию данных
+                result = ValidationRequest()
+                for key, value in db_request.to_dict().items():
+                    setattr(result, key, value)
+                results.append(result)
+            return results
     
     @staticmethod
     def get_by_id(request_id: str) -> Optional[ValidationRequest]:
@@ -108,6 +190,7 @@ class ValidationRequestRepository:
             
             # Создаем копию данных
             result_dict = db_request.to_dict()
+            _enqueue_webhook(db, db_request, result_dict)
             
             logger.info(f"Updated status for request {request_id} to {status}")
             
@@ -115,8 +198,10 @@ class ValidationRequestRepository:
             result = ValidationRequest()
             for key, value in result_dict.items():
                 setattr(result, key, value)
-                
-            return result
+        
+        # Подписчики уведомляются после фиксации транзакции
+        result_notifier.publish(request_id, result_dict)
+        return result
     
     @staticmethod
     def update_result(
@@ -151,6 +236,7 @@ class ValidationRequestRepository:
             
             # Создаем копию данных
             result_dict = db_request.to_dict()
+            _enqueue_webhook(db, db_request, result_dict)
             
             logger.info(f"Updated result for request {request_id}, overall status: {overall_status}, processing time: {processing_time:.2f}s" if processing_time else f"Updated result for request {request_id}, overall status: {overall_status}")
             
@@ -158,8 +244,10 @@ class ValidationRequestRepository:
             result = ValidationRequest()
             for key, value in result_dict.items():
                 setattr(result, key, value)
-                
-            return result
+        
+        # Подписчики уведомляются после фиксации транзакции
+        result_notifier.publish(request_id, result_dict)
+        return result
     
     @staticmethod
     def update_error(
@@ -195,6 +283,7 @@ class ValidationRequestRepository:
             
             # Создаем копию данных
             result_dict = db_request.to_dict()
+            _enqueue_webhook(db, db_request, result_dict)
             
             logger.error(f"Updated error for request {request_id}: {error_message}, processing time: {processing_time:.2f}s" if processing_time else f"Updated error for request {request_id}: {error_message}")
             
@@ -202,5 +291,385 @@ class ValidationRequestRepository:
             result = ValidationRequest()
             for key, value in result_dict.items():
                 setattr(result, key, value)
-                
-            return result
+        
+        # Подписчики уведомляются после фиксации транзакции
+        result_notifier.publish(request_id, result_dict)
+        return result
+
+
+class ResultCacheRepository:
+    """
+    Репозиторий для постоянного уровня кэша результатов валидации
+    """
+    @staticmethod
+    def get(content_hash: str, config_version: str) -> Optional[Dict[str, Any]]:
+        """
+        Получает сохраненный результат по хэшу содержимого и версии конфигурации
+        """
+        with get_db_session() as db:
+            db_entry = db.query(ValidationResultCache).filter(
+                ValidationResultCache.content_hash == content_hash,
+                ValidationResultCache.config_version == config_version
+            ).first()
+            return db_entry.to_dict() if db_entry else None
+    
+    @staticmethod
+    def put(
+        content_hash: str,
+        config_version: str,
+        result: Dict[str, Any],
+        perceptual_hash: str = None
+    ) -> None:
+        """
+        Сохраняет результат (повторная запись заменяет существующую)
+        """
+        with get_db_session() as db:
+            db.merge(ValidationResultCache(
+                content_hash=content_hash,
+                config_version=config_version,
+                perceptual_hash=perceptual_hash,
+                overall_status=result["overall_status"],
+                checks=result["checks"],
+                issues=result["issues"],
+                created_at=datetime.utcnow()
+            ))
+    
+    @staticmethod
+    def get_perceptual_hashes(config_version: str, since: Optional[datetime] = None) -> List[tuple]:
+        """
+        Получает пары (хэш содержимого, перцептивный хэш) для версии конфигурации;
+        с since - только записанные начиная с этого момента
+        """
+        with get_db_session() as db:
+            query = db.query(
+                ValidationResultCache.content_hash,
+                ValidationResultCache.perceptual_hash
+            ).filter(
+                ValidationResultCache.config_version == config_version,
+                ValidationResultCache.perceptual_hash.isnot(None)
+            )
+            if since is not None:
+                query = query.filter(ValidationResultCache.created_at >= since)
+            return [(row[0], row[1]) for row in query.all()]
+    
+    @staticmethod
+    def delete_stale(config_version: str) -> int:
+        """
+        Удаляет результаты, вычисленные с другой версией конфигурации
+        """
+        with get_db_session() as db:
+            deleted = db.query(ValidationResultCache).filter(
+                ValidationResultCache.config_version != config_version
+            ).delete(synchronize_session=False)
+        logger.info(f"Deleted {deleted} stale cached results")
+        return deleted
+    
+    @staticmethod
+    def clear() -> int:
+        """
+        Удаляет все сохраненные результаты
+        """
+        with get_db_session() as db:
+            return db.query(ValidationResultCache).delete(synchronize_session=False)
+
+
+class WebhookDeliveryRepository:
+    """
+    Репозиторий для outbox доставок webhook
+    """
+    @staticmethod
+    def claim_due(limit: int, lease_seconds: float) -> List[Dict[str, Any]]:
+        """
+        Забирает доставки, время попытки которых наступило.
+        Следующая попытка сдвигается на lease_seconds, чтобы другие процессы
+        не взяли ту же доставку; строки, заблокированные другими, пропускаются.
+        """
+        now = datetime.utcnow()
+        with get_db_session() as db:
+            deliveries = db.query(WebhookDelivery).filter(
+                WebhookDelivery.status == "PENDING",
+                WebhookDelivery.next_attempt_at <= now
+            ).order_by(WebhookDelivery.next_attempt_at).limit(limit).with_for_update(skip_locked=True).all()
+            
+            lease_until = now + timedelta(seconds=lease_seconds)
+            claimed = []
+            for delivery in deliveries:
+                delivery.next_attempt_at = lease_until
+                claimed.append({**delivery.to_dict(), "leased_until": lease_until})
+            return claimed
+    
+    @staticmethod
+    def renew_lease(delivery_id: int, leased_until: datetime, lease_seconds: float) -> Optional[datetime]:
+        """
+        Продлевает резерв доставки непосредственно перед попыткой.
+
+        Returns:
+            Новый срок резерва или None, если резерв истек и доставку взял другой процесс
+        """
+        lease_until = datetime.utcnow() + timedelta(seconds=lease_seconds)
+        with get_db_session() as db:
+            updated = db.query(WebhookDelivery).filter(
+                WebhookDelivery.id == delivery_id,
+                WebhookDelivery.status == "PENDING",
+                WebhookDelivery.next_attempt_at == leased_until
+            ).update({"next_attempt_at": lease_until}, synchronize_session=False)
+        return lease_until if updated else None
+    
+    @staticmethod
+    def mark_delivered(delivery_id: int, attempts: int) -> None:
+        with get_db_session() as db:
+            db.query(WebhookDelivery).filter(WebhookDelivery.id == delivery_id).update({
+                "status": "DELIVERED",
+                "attempts": attempts,
+                "delivered_at": datetime.utcnow(),
+                "last_error": None
+            }, synchronize_session=False)
+    
+    @staticmethod
+    def schedule_retry(delivery_id: int, attempts: int, next_attempt_at: datetime, error: str) -> None:
+        with get_db_session() as db:
+            db.query(WebhookDelivery).filter(WebhookDelivery.id == delivery_id).update({
+                "attempts": attempts,
+                "next_attempt_at": next_attempt_at,
+                "last_error": error
+            }, synchronize_session=False)
+    
+    @staticmethod
+    def mark_failed(delivery_id: int, attempts: int, error: str) -> None:
+        with get_db_session() as db:
+            db.query(WebhookDelivery).filter(WebhookDelivery.id == delivery_id).update({
+                "status": "FAILED",
+                "attempts": attempts,
+                "last_error": error
+            }, synchronize_session=False)
+
+
+class IdempotencyKeyRepository:
+    """
+    Репозиторий ключей идемпотентности загрузок
+    """
+    @staticmethod
+    def claim(key_hash: str, request_id: str, ttl_seconds: float) -> Optional[str]:
+        """
+        Закрепляет ключ за request_id на ttl_seconds.
+
+        Returns:
+            request_id исходного запроса, если ключ уже действует, иначе None
+        """
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=ttl_seconds)
+        try:
+            with get_db_session() as db:
+                existing = db.query(IdempotencyKey).filter(IdempotencyKey.key_hash == key_hash).first()
+                if existing is not None and existing.expires_at > now:
+                    return existing.request_id
+                if existing is not None:
+                    # Просроченный ключ, еще не удаленный очисткой
+                    existing.request_id = request_id
+                    existing.expires_at = expires_at
+                else:
+                    db.add(IdempotencyKey(key_hash=key_hash, request_id=request_id, expires_at=expires_at))
+                return None
+        except IntegrityError:
+            # Тот же ключ одновременно закреплен другим запросом
+            with get_db_session() as db:
+                existing = db.query(IdempotencyKey).filter(IdempotencyKey.key_hash == key_hash).first()
+                return existing.request_id if existing is not None else None
+    
+    @staticmethod
+    def release(key_hash: str, request_id: str) -> None:
+        """Освобождает ключ отклоненного запроса, чтобы клиент мог повторить его"""
+        with get_db_session() as db:
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.key_hash == key_hash,
+                IdempotencyKey.request_id == request_id
+            ).delete(synchronize_session=False)
+    
+    @staticmethod
+    def delete_expired(limit: int) -> int:
+        """
+        Удаляет не больше limit просроченных ключей.
+
+        Returns:
+            Количество удаленных ключей
+        """
+        now = datetime.utcnow()
+        with get_db_session() as db:
+            expired = db.query(IdempotencyKey.key_hash).filter(
+                IdempotencyKey.expires_at <= now
+            ).limit(limit).all()
+            if not expired:
+                return 0
+            return db.query(IdempotencyKey).filter(
+                IdempotencyKey.key_hash.in_([row.key_hash for row in expired])
+            ).delete(synchronize_session=False)
+
+
+class ValidationJobRepository:
+    """
+    Репозиторий очереди обработки validation_jobs.
+
+    Задача арендуется обработчиком (locked_by) до available_at; аренда
+    идентифицируется номером попытки attempts, поэтому обработчик, потерявший
+    аренду, не может продлить или удалить задачу, взятую другим.
+    """
+    @staticmethod
+    def enqueue(
+        request_id: str,
+        file_path: str,
+        content_hash: Optional[str],
+        priority: str,
+        tenant: str,
+        deadline: Optional[float]
+    ) -> None:
+        with get_db_session() as db:
+            db.add(ValidationJob(
+                request_id=request_id,
+                file_path=file_path,
+                content_hash=content_hash,
+                priority=priority,
+                tenant=tenant,
+                deadline=deadline,
+                status="QUEUED",
+                attempts=0,
+                available_at=datetime.utcnow()
+            ))
+    
+    @staticmethod
+    def claim(
+        worker_id: str,
+        priority: str,
+        limit: int,
+        visibility_timeout: float,
+        max_attempts: int
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Арендует до limit доступных задач приоритета priority на visibility_timeout.
+        Доступны ожидающие задачи и задачи с истекшей арендой (обработчик
+        остановился); задача, арендованная max_attempts раз, переводится в DEAD.
+        Строки, заблокированные другими (PostgreSQL), пропускаются.
+
+        Returns:
+            (арендованные задачи, задачи, переведенные в DEAD)
+        """
+        now = datetime.utcnow()
+        lease_until = now + timedelta(seconds=visibility_timeout)
+        with get_db_session() as db:
+            jobs = db.query(ValidationJob).filter(
+                ValidationJob.status.in_(("QUEUED", "RUNNING")),
+                ValidationJob.priority == priority,
+                ValidationJob.available_at <= now
+            ).order_by(ValidationJob.available_at).limit(limit).with_for_update(skip_locked=True).all()
+            
+            claimed, dead = [], []
+            for job in jobs:
+                job_dict = job.to_dict()
+                if job.attempts >= max_attempts:
+                    values = {
+                        "status": "DEAD",
+                        "locked_by": None,
+                        "last_error": f"Lease expired after {job.attempts} attempts (last worker: {job.locked_by})"
+                    }
+                else:
+                    values = {
+                        "status": "RUNNING",
+                        "attempts": job.attempts + 1,
+                        "locked_by": worker_id,
+                        "available_at": lease_until
+                    }
+                    if job.status == "RUNNING":
+                        values["last_error"] = f"Lease expired (worker: {job.locked_by})"
+                # Условие на прежние status и attempts: на SQLite строки не блокируются,
+                # и ту же задачу мог одновременно арендовать другой процесс
+                updated = db.query(ValidationJob).filter(
+                    ValidationJob.request_id == job.request_id,
+                    ValidationJob.status == job.status,
+                    ValidationJob.attempts == job.attempts
+                ).update(values, synchronize_session=False)
+                if not updated:
+                    continue
+                job_dict.update(status=values["status"], attempts=values.get("attempts", job.attempts))
+                (dead if values["status"] == "DEAD" else claimed).append(job_dict)
+            return claimed, dead
+    
+    @staticmethod
+    def _leased(db, worker_id: str, request_id: str, attempts: int):
+        return db.query(ValidationJob).filter(
+            ValidationJob.request_id == request_id,
+            ValidationJob.status == "RUNNING",
+            ValidationJob.locked_by == worker_id,
+            ValidationJob.attempts == attempts
+        )
+    
+    @staticmethod
+    def extend(worker_id: str, leases: Dict[str, int], visibility_timeout: float) -> List[str]:
+        """
+        Продлевает аренду задач {request_id: attempts} на visibility_timeout.
+
+        Returns:
+            request_id задач, аренда которых потеряна
+        """
+        lease_until = datetime.utcnow() + timedelta(seconds=visibility_timeout)
+        lost = []
+        with get_db_session() as db:
+            for request_id, attempts in leases.items():
+                updated = ValidationJobRepository._leased(db, worker_id, request_id, attempts).update(
+                    {"available_at": lease_until}, synchronize_session=False
+                )
+                if not updated:
+                    lost.append(request_id)
+        return lost
+    
+    @staticmethod
+    def complete(worker_id: str, leases: Dict[str, int]) -> None:
+        """Удаляет обработанные задачи, аренда которых принадлежит worker_id"""
+        with get_db_session() as db:
+            for request_id, attempts in leases.items():
+                ValidationJobRepository._leased(db, worker_id, request_id, attempts).delete(synchronize_session=False)
+    
+    @staticmethod
+    def release(worker_id: str, leases: Dict[str, int]) -> None:
+        """Возвращает не начатые задачи в очередь; попытка не засчитывается"""
+        now = datetime.utcnow()
+        with get_db_session() as db:
+            for request_id, attempts in leases.items():
+                ValidationJobRepository._leased(db, worker_id, request_id, attempts).update({
+                    "status": "QUEUED",
+                    "attempts": attempts - 1,
+                    "locked_by": None,
+                    "available_at": now
+                }, synchronize_session=False)
+    
+    @staticmethod
+    def cancel(request_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Удаляет ожидающую (не арендованную) задачу.
+
+        Returns:
+            Удаленная задача или None, если задачи нет или она арендована
+        """
+        with get_db_session() as db:
+            job = db.query(ValidationJob).filter(
+                ValidationJob.request_id == request_id,
+                ValidationJob.status == "QUEUED"
+            ).first()
+            if job is None:
+                return None
+            job_dict = job.to_dict()
+            deleted = db.query(ValidationJob).filter(
+                ValidationJob.request_id == request_id,
+                ValidationJob.status == "QUEUED",
+                ValidationJob.attempts == job.attempts
+            ).delete(synchronize_session=False)
+            return job_dict if deleted else None
+    
+    @staticmethod
+    def get_states(request_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Статус и обработчик задач по request_id; завершенных задач в результате нет"""
+        if not request_ids:
+            return {}
+        with get_db_session() as db:
+            rows = db.query(ValidationJob.request_id, ValidationJob.status, ValidationJob.locked_by).filter(
+                ValidationJob.request_id.in_(request_ids)
+            ).all()
+            return {row.request_id: {"status": row.status, "locked_by": row.locked_by} for row in rows}
@@ -0,0 +1,71 @@
+"""
+Отдельный процесс обработки: python -m app.worker
+
+Разбирает очередь в БД (JOB_QUEUE=database) без приема загрузок, чтобы
+добавлять мощность проверок без процессов API. Результаты сохраняются в БД,
+процессы API узнают о них через шину уведомлений.
+"""
+import asyncio
+import signal
+
+from app.config.manager import get_config_manager
+from app.core.config import settings
+from app.core.executors import check_executor
+from app.core.logging import get_logger
+from app.core.notification_bus import create_notification_bus
+from app.core.notifications import result_notifier
+from app.core.result_cache import result_cache
+from app.cv.checks.runner import check_runner
+from app.db.models import init_db
+from app.db.repositories import ValidationRequestRepository
+from app.worker.job_queue import durable_queue_enabled
+from app.worker.process_engine import process_check_engine, process_engine_enabled
+from app.worker.tasks import job_queue, start_worker
+
+logger = get_logger(__name__)
+
+
+def _load_request_state(request_id: str):
+    db_request = ValidationRequestRepository.get_by_id(request_id)
+    return db_request.to_dict() if db_request else None
+
+
+async def run_worker() -> None:
+    """Обрабатывает задачи очереди до SIGINT или SIGTERM"""
+    init_db()
+    # Процесс только публикует изменения запросов, слушать шину ему не нужно
+    notification_bus = create_notification_bus(
+        settings.DATABASE_URL, settings.NOTIFICATION_BUS, settings.NOTIFICATION_SOCKET_DIR
+    )
+    result_notifier.attach_bus(notification_bus, _load_request_state)
+
+    get_config_manager().add_change_callback(result_cache.on_config_change)
+    if process_engine_enabled():
+        get_config_manager().add_change_callback(process_check_engine.on_config_change)
+        await process_check_engine.start()
+    else:
+        check_executor.configure()
+        check_runner.rebuild()
+        get_config_manager().add_change_callback(check_runner.on_config_change)
+
+    worker = asyncio.create_task(start_worker())
+    await job_queue.start()
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+    await stopping.wait()
+
+    logger.info("Stopping worker, waiting for running jobs...")
+    await job_queue.stop(timeout=settings.JOB_QUEUE_VISIBILITY_TIMEOUT_SECONDS)
+    worker.cancel()
+    check_executor.shutdown()
+    process_check_engine.shutdown()
+    await notification_bus.stop()
+
+
+if __name__ == "__main__":
+    if not durable_queue_enabled():
+        raise SystemExit("python -m app.worker requires JOB_QUEUE=database")
+    asyncio.run(run_worker())
@@ -0,0 +1,54 @@
+"""
+Отмена выполняющихся обработок.
+
+Обработка регистрирует флаг отмены на время выполнения; CheckRunner проверяет
+его перед каждой следующей проверкой и прерывает оставшиеся проверки.
+Флаг - threading.Event, чтобы его могли проверять и проверки в пуле потоков.
+"""
+import threading
+from typing import Dict, Optional
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class CancellationRegistry:
+    """
+    Флаги отмены выполняющихся обработок по request_id.
+    Используется только из цикла событий API (без блокировок).
+    """
+
+    def __init__(self):
+        self._flags: Dict[str, threading.Event] = {}
+
+    def __len__(self) -> int:
+        return len(self._flags)
+
+    def __contains__(self, request_id: str) -> bool:
+        return request_id in self._flags
+
+    def register(self, request_id: str) -> threading.Event:
+        """Регистрирует обработку и возвращает ее флаг отмены"""
+        flag = self._flags.get(request_id)
+        if flag is None:
+            flag = self._flags[request_id] = threading.Event()
+        return flag
+
+    def cancel(self, request_id: str) -> bool:
+        """Запрашивает отмену; False, если обработка не выполняется"""
+        flag = self._flags.get(request_id)
+        if flag is None:
+            return False
+        flag.set()
+        logger.info(f"Cancellation requested for running request {request_id}")
+        return True
+
+    def unregister(self, request_id: str) -> Optional[threading.Event]:
+        return self._flags.pop(request_id, None)
+
+    def clear(self) -> None:
+        self._flags.clear()
+
+
+running_jobs = CancellationRegistry()
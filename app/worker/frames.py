@@ -0,0 +1,108 @@
+"""
+Передача декодированных кадров от API к обработчику задач.
+
+Изображение декодируется один раз при валидации загрузки, а обработчик
+получает готовый массив через дескриптор кадра вместо повторного чтения
+файла из хранилища и повторного декодирования.
+"""
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class FrameHandle:
+    """
+    Дескриптор кадра внутри одного процесса.
+    Хранит ссылку на уже декодированный массив без копирования.
+    scale - во сколько раз кадр уменьшен относительно исходного изображения.
+    """
+
+    def __init__(self, image: np.ndarray, scale: int = 1):
+        self._image: Optional[np.ndarray] = image
+        self.scale = scale
+
+    def get(self) -> np.ndarray:
+        """Возвращает декодированный кадр"""
+        if self._image is None:
+            raise RuntimeError("Frame has already been released")
+        return self._image
+
+    def release(self) -> None:
+        """Освобождает ссылку на кадр"""
+        self._image = None
+
+
+class SharedFrameHandle:
+    """
+    Дескриптор кадра в разделяемой памяти.
+    Используется, когда обработчик работает в другом процессе:
+    сериализуется только имя сегмента, форма и тип данных.
+    """
+
+    def __init__(self, name: str, shape: Tuple[int, ...], dtype: str, scale: int = 1):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.scale = scale
+        self._segment: Optional[shared_memory.SharedMemory] = None
+
+    @classmethod
+    def from_array(cls, image: np.ndarray, scale: int = 1) -> "SharedFrameHandle":
+        """Копирует кадр в новый сегмент разделяемой памяти"""
+        segment = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
+        buffer = np.ndarray(image.shape, dtype=image.dtype, buffer=segment.buf)
+        buffer[...] = image
+        handle = cls(segment.name, image.shape, image.dtype.str, scale)
+        handle._segment = segment
+        return handle
+
+    def get(self) -> np.ndarray:
+        """Подключается к сегменту и возвращает кадр без копирования"""
+        if self._segment is None:
+            self._segment = shared_memory.SharedMemory(name=self.name)
+        return np.ndarray(self.shape, dtype=np.dtype(self.dtype), buffer=self._segment.buf)
+
+    def close(self) -> None:
+        """Отключается от сегмента, не удаляя его"""
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    def release(self) -> None:
+        """Отключается от сегмента и удаляет его"""
+        segment = self._segment or shared_memory.SharedMemory(name=self.name)
+        self._segment = None
+        try:
+            segment.close()
+        except BufferError:
+            # На кадр еще ссылаются массивы; сегмент закроется вместе с ними
+            logger.debug(f"Shared frame {self.name} is still referenced, deferring close")
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            logger.debug(f"Shared frame {self.name} already unlinked")
+
+    def __getstate__(self):
+        return {"name": self.name, "shape": self.shape, "dtype": self.dtype, "scale": self.scale}
+
+    def __setstate__(self, state):
+        self.__init__(state["name"], state["shape"], state["dtype"], state.get("scale", 1))
+
+
+def create_frame_handle(image: np.ndarray, scale: int = 1, shared: bool = False):
+    """
+    Создает дескриптор кадра для передачи обработчику.
+
+    Args:
+        image: Декодированное изображение
+        scale: Коэффициент уменьшения кадра относительно исходного изображения
+        shared: Разместить кадр в разделяемой памяти (для обработчика в другом процессе)
+    """
+    if shared:
+        return SharedFrameHandle.from_array(image, scale)
+    return FrameHandle(image, scale)
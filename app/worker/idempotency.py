@@ -0,0 +1,45 @@
+"""
+Очистка просроченных ключей идемпотентности.
+
+Ключ действует IDEMPOTENCY_TTL_SECONDS; просроченные строки удаляются
+пачками по IDEMPOTENCY_SWEEP_BATCH_SIZE, чтобы не держать длинные транзакции.
+Просроченный, но еще не удаленный ключ не мешает новой загрузке: он
+закрепляется заново.
+"""
+import asyncio
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.db.repositories import IdempotencyKeyRepository
+
+logger = get_logger(__name__)
+
+
+async def sweep_expired_keys() -> int:
+    """
+    Удаляет все просроченные ключи.
+
+    Returns:
+        Количество удаленных ключей
+    """
+    loop = asyncio.get_running_loop()
+    total = 0
+    while True:
+        deleted = await loop.run_in_executor(
+            None, IdempotencyKeyRepository.delete_expired, settings.IDEMPOTENCY_SWEEP_BATCH_SIZE
+        )
+        total += deleted
+        if deleted < settings.IDEMPOTENCY_SWEEP_BATCH_SIZE:
+            return total
+
+
+async def periodic_idempotency_sweep() -> None:
+    """Периодически удаляет просроченные ключи идемпотентности"""
+    while True:
+        try:
+            deleted = await sweep_expired_keys()
+            if deleted:
+                logger.info(f"Removed {deleted} expired idempotency keys")
+        except Exception as e:
+            logger.error(f"Idempotency key sweep failed: {type(e).__name__}: {str(e)}")
+        await asyncio.sleep(settings.IDEMPOTENCY_SWEEP_INTERVAL_SECONDS)
@@ -0,0 +1,334 @@
+"""
+Очередь обработки в БД (JOB_QUEUE=database).
+
+Принятая задача записывается в таблицу validation_jobs и переживает
+перезапуск процесса. Каждый процесс с JOB_QUEUE_CONSUME арендует задачи по
+числу свободных слотов своего планировщика (PriorityScheduler) и выполняет
+их как обычные задачи очереди; interactive и bulk арендуются в пропорции
+INTERACTIVE_WEIGHT к одной. На PostgreSQL задачи выбираются
+SELECT ... FOR UPDATE SKIP LOCKED, на SQLite - условным обновлением по номеру
+попытки, так что одну задачу арендует только один процесс.
+
+Аренда (JOB_QUEUE_VISIBILITY_TIMEOUT_SECONDS) продлевается, пока задача у
+процесса; задачу остановившегося процесса после окончания аренды получает
+другой. Задача, арендованная JOB_QUEUE_MAX_ATTEMPTS раз без завершения,
+переводится в DEAD, а запрос - в FAILED; строка остается для разбора.
+
+Процесс, принявший загрузку, хранит ее кадр, место в admission control и
+ожидающие повторные загрузки того же содержимого. Если задачу арендует он
+сам, используется готовый кадр; если другой процесс - кадр освобождается,
+а место и ожидающие загрузки завершаются по записи запроса в БД. Файл
+задачи, отмененной или просроченной в другом процессе, остается принявшему:
+он передает его ожидающей загрузке (см. app.worker.single_flight) или удаляет.
+"""
+import asyncio
+import os
+import socket
+import time
+import uuid
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from app.core.admission import admission_controller
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.db.repositories import ValidationJobRepository, ValidationRequestRepository
+from app.storage.client import storage_client
+from app.worker.scheduler import BULK, DEFAULT_TENANT, INTERACTIVE, PriorityScheduler
+from app.worker.single_flight import inflight_jobs
+
+logger = get_logger(__name__)
+
+QUEUE_DATABASE = "database"
+
+
+def durable_queue_enabled() -> bool:
+    return settings.JOB_QUEUE == QUEUE_DATABASE
+
+
+class JobQueueConsumer:
+    """
+    Аренда задач из validation_jobs в планировщик процесса.
+    Используется только из цикла событий (без блокировок).
+    """
+
+    def __init__(self, scheduler: PriorityScheduler, worker_id: Optional[str] = None):
+        """
+        Args:
+            scheduler: Планировщик, в который ставятся арендованные задачи
+            worker_id: Идентификатор процесса в столбце locked_by
+        """
+        self.scheduler = scheduler
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Арендованные задачи и завершенные, ожидающие удаления: request_id -> номер попытки
+        self._leases: Dict[str, int] = {}
+        self._done: Dict[str, int] = {}
+        # Задачи, принятые этим процессом: request_id -> {"frame", "content_hash", "file_path"}
+        self._local: Dict[str, Dict[str, Any]] = {}
+        self._bulk_credit = 0.0
+        self._extended_at = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._claimed = 0
+        self._completed = 0
+        self._dead = 0
+        self._lost = 0
+
+    def wake(self) -> None:
+        """Прерывает ожидание опроса: появилась задача или освободился слот"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def enqueue(
+        self,
+        request_id: str,
+        file_path: str,
+        frame=None,
+        content_hash: Optional[str] = None,
+        priority: str = INTERACTIVE,
+        tenant: str = DEFAULT_TENANT,
+        deadline: Optional[float] = None
+    ) -> None:
+        """Записывает задачу в очередь; кадр остается в процессе до аренды задачи"""
+        loop = asyncio.get_running_loop()
+        self._local[request_id] = {"frame": frame, "content_hash": content_hash, "file_path": file_path}
+        try:
+            await loop.run_in_executor(
+                None, ValidationJobRepository.enqueue, request_id, file_path, content_hash, priority, tenant, deadline
+            )
+        except Exception:
+            self._local.pop(request_id, None)
+            if frame is not None:
+                frame.release()
+            raise
+        self.wake()
+
+    def complete(self, request_id: str) -> None:
+        """Отмечает задачу обработанной; строка удаляется при следующем опросе"""
+        attempts = self._leases.pop(request_id, None)
+        if attempts is not None:
+            self._done[request_id] = attempts
+        self.wake()
+
+    async def cancel(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Удаляет задачу, еще не арендованную ни одним процессом.
+
+        Returns:
+            Задача (с кадром "frame", если она принята этим процессом) или None
+        """
+        loop = asyncio.get_running_loop()
+        job = await loop.run_in_executor(None, ValidationJobRepository.cancel, request_id)
+        if job is None:
+            return None
+        local = self._local.pop(request_id, None)
+        job["frame"] = (local or {}).get("frame")
+        job["accepted_elsewhere"] = local is None
+        return job
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Started job queue consumer {self.worker_id} (consume: {settings.JOB_QUEUE_CONSUME})")
+
+    async def stop(self, timeout: float = 0.0) -> None:
+        """
+        Прекращает аренду и возвращает в очередь арендованные, но не начатые задачи.
+
+        Args:
+            timeout: Время ожидания выполняющихся задач, секунды; задачи,
+                не завершившиеся за это время, получит другой процесс после окончания аренды
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        waiting = {}
+        for request_id in list(self._leases):
+            job = self.scheduler.remove(request_id)
+            if job is None:
+                continue
+            waiting[request_id] = self._leases.pop(request_id)
+            if job.get("frame") is not None:
+                job["frame"].release()
+        loop = asyncio.get_running_loop()
+        if waiting:
+            await loop.run_in_executor(None, ValidationJobRepository.release, self.worker_id, waiting)
+            logger.info(f"Returned {len(waiting)} jobs to the queue")
+        deadline = time.monotonic() + timeout
+        while self._leases and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        await self._flush_done()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Job queue poll failed: {type(e).__name__}: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.JOB_QUEUE_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_once(self) -> int:
+        """
+        Один опрос: удаляет обработанные задачи, продлевает аренду, завершает
+        принятые здесь задачи, обработанные другими процессами, и арендует новые.
+
+        Returns:
+            Количество арендованных задач
+        """
+        await self._flush_done()
+        await self._extend_leases()
+        if self._local:
+            await self._reconcile_local()
+        if not settings.JOB_QUEUE_CONSUME:
+            return 0
+        return await self._claim()
+
+    async def _flush_done(self) -> None:
+        if not self._done:
+            return
+        done, self._done = self._done, {}
+        await asyncio.get_running_loop().run_in_executor(None, ValidationJobRepository.complete, self.worker_id, done)
+        self._completed += len(done)
+
+    async def _extend_leases(self) -> None:
+        timeout = settings.JOB_QUEUE_VISIBILITY_TIMEOUT_SECONDS
+        if not self._leases or time.monotonic() - self._extended_at < timeout / 3:
+            return
+        self._extended_at = time.monotonic()
+        lost = await asyncio.get_running_loop().run_in_executor(
+            None, ValidationJobRepository.extend, self.worker_id, dict(self._leases), timeout
+        )
+        for request_id in lost:
+            # Аренда истекла и задача досталась другому процессу: ее строку он удалит сам
+            if self._leases.pop(request_id, None) is not None:
+                self._lost += 1
+                logger.warning(f"Lost lease of job {request_id}")
+                job = self.scheduler.remove(request_id)
+                if job is not None and job.get("frame") is not None:
+                    job["frame"].release()
+
+    async def _reconcile_local(self) -> None:
+        """Завершает учет принятых здесь задач, которые арендовал или завершил другой процесс"""
+        loop = asyncio.get_running_loop()
+        request_ids = list(self._local)
+        states = await loop.run_in_executor(None, ValidationJobRepository.get_states, request_ids)
+        for request_id in request_ids:
+            local = self._local.get(request_id)
+            if local is None:
+                continue
+            state = states.get(request_id)
+            if state is not None and state["status"] != "DEAD":
+                if state["locked_by"] not in (None, self.worker_id) and local["frame"] is not None:
+                    # Задачу выполняет другой процесс: кадр больше не нужен
+                    local["frame"].release()
+                    local["frame"] = None
+                continue
+            del self._local[request_id]
+            if local["frame"] is not None:
+                local["frame"].release()
+            record = await loop.run_in_executor(None, ValidationRequestRepository.get_by_id, request_id)
+            result = record.to_dict() if record is not None else {
+                "request_id": request_id,
+                "status": "FAILED",
+                "overall_status": None,
+                "checks": [],
+                "issues": [],
+                "error_message": "Request record not found",
+            }
+            if result["status"] in ("CANCELLED", "EXPIRED"):
+                # Другой процесс оставил файл: он нужен ожидающим загрузкам
+                if not inflight_jobs.abandon(local["content_hash"], result, local["file_path"]) and local["content_hash"]:
+                    await loop.run_in_executor(None, storage_client.delete_file, local["file_path"])
+            else:
+                inflight_jobs.resolve(local["content_hash"], result)
+            admission_controller.release(request_id)
+
+    def _free_slots(self, priority: Optional[str] = None) -> int:
+        scheduler = self.scheduler
+        if priority == BULK:
+            return scheduler.capacity - scheduler.reserved_interactive - scheduler.running(BULK) - scheduler.qsize(BULK)
+        return scheduler.capacity - scheduler.running() - scheduler.qsize()
+
+    async def _claim(self) -> int:
+        free = self._free_slots()
+        if free <= 0:
+            return 0
+        # Доля bulk - одна задача на INTERACTIVE_WEIGHT interactive; неизрасходованные
+        # места одной очереди достаются другой
+        self._bulk_credit += free / (settings.INTERACTIVE_WEIGHT + 1)
+        bulk_share = min(free, int(self._bulk_credit))
+        interactive = await self._claim_lane(INTERACTIVE, free - bulk_share)
+        bulk_limit = min(self._free_slots(BULK), free - len(interactive))
+        bulk = await self._claim_lane(BULK, bulk_limit)
+        self._bulk_credit = 0.0 if len(bulk) < bulk_limit else max(0.0, self._bulk_credit - len(bulk))
+        if len(interactive) == free - bulk_share and len(interactive) + len(bulk) < free:
+            interactive += await self._claim_lane(INTERACTIVE, free - len(interactive) - len(bulk))
+        return len(interactive) + len(bulk)
+
+    async def _claim_lane(self, priority: str, limit: int) -> List[Dict[str, Any]]:
+        if limit <= 0:
+            return []
+        loop = asyncio.get_running_loop()
+        claimed, dead = await loop.run_in_executor(
+            None,
+            ValidationJobRepository.claim,
+            self.worker_id,
+            priority,
+            limit,
+            settings.JOB_QUEUE_VISIBILITY_TIMEOUT_SECONDS,
+            settings.JOB_QUEUE_MAX_ATTEMPTS
+        )
+        for job in dead:
+            await self._dead_letter(job)
+        for job in claimed:
+            self._dispatch(job)
+        return claimed
+
+    def _dispatch(self, job: Dict[str, Any]) -> None:
+        """Ставит арендованную задачу в планировщик процесса"""
+        request_id = job["request_id"]
+        self._leases[request_id] = job["attempts"]
+        self._claimed += 1
+        local = self._local.pop(request_id, None) or {}
+        if job["attempts"] > 1:
+            logger.warning(f"Retrying job {request_id} (attempt {job['attempts']})")
+        self.scheduler.put({
+            "request_id": request_id,
+            "file_path": job["file_path"],
+            "frame": local.get("frame"),
+            "content_hash": job["content_hash"],
+            "durable": True,
+            "accepted_elsewhere": not local,
+        }, job["priority"], job["tenant"], job["deadline"])
+
+    async def _dead_letter(self, job: Dict[str, Any]) -> None:
+        self._dead += 1
+        error_message = f"Processing abandoned after {job['attempts']} attempts"
+        logger.error(f"Job {job['request_id']} moved to dead letters: {error_message}")
+        await asyncio.get_running_loop().run_in_executor(None, partial(
+            ValidationRequestRepository.update_error,
+            request_id=job["request_id"],
+            error_message=error_message,
+            status="FAILED"
+        ))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "queue": QUEUE_DATABASE,
+            "worker_id": self.worker_id,
+            "consume": settings.JOB_QUEUE_CONSUME,
+            "leased": len(self._leases),
+            "accepted_pending": len(self._local),
+            "claimed": self._claimed,
+            "completed": self._completed,
+            "dead_lettered": self._dead,
+            "lost_leases": self._lost,
+        }
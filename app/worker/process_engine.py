@@ -0,0 +1,212 @@
+"""
+Выполнение проверок в пуле процессов.
+
+Проверки содержат много кода Python и NumPy, удерживающего GIL, поэтому
+пул потоков не масштабируется по ядрам. При CHECK_ENGINE=process конвейер
+проверок запроса целиком выполняется в одном из процессов пула:
+
+- процесс при запуске один раз загружает модели (YuNet, LBF, HOG и каскады
+  загружаются при импорте app.cv.checks.face.detector), а его пул проверок
+  и потоки OpenCV рассчитываются на долю ядер процесса - параллелизм дают процессы;
+- кадр передается через разделяемую память (SharedFrameHandle), в задачу
+  сериализуются только имя сегмента, форма и путь к файлу;
+- обратно возвращается итог проверок в нативных типах Python.
+
+Флаг отмены между процессами не передается: отмена проверяется до отправки
+конвейера, а результат отмененной во время проверок обработки отбрасывается.
+При изменении конфигурации пул пересоздается, чтобы процессы прочитали ее заново.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.exceptions import ProcessingCancelled
+from app.core.executors import BLAS_THREAD_VARIABLES, available_cpus, check_executor, plan_check_threads
+from app.core.logging import get_logger
+from app.worker.frames import SharedFrameHandle
+
+logger = get_logger(__name__)
+
+PROCESS_ENGINE = "process"
+
+# Цикл событий процесса пула (CheckRunner асинхронный)
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _init_worker(cpus: int) -> None:
+    """
+    Инициализация процесса пула: модели, реестр и экземпляры проверок создаются один раз,
+    пул проверок процесса рассчитывается на его долю ядер (cpus).
+    """
+    global _worker_loop
+    check_executor.configure(cpus=cpus)
+    import app.cv.checks.face.detector  # noqa: F401
+    import app.worker.tasks  # noqa: F401
+    from app.cv.checks.runner import check_runner
+    check_runner.rebuild()
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    logger.info(f"Check worker process {os.getpid()} ready")
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _run_pipeline(
+    request_id: str,
+    frame: SharedFrameHandle,
+    file_path: Optional[str],
+    content: Optional[bytes]
+) -> Dict[str, Any]:
+    """Выполняет все проверки запроса в процессе пула"""
+    from app.cv.decoding import FullResolutionLoader
+    from app.storage.client import storage_client
+    from app.worker.tasks import analyze_image_local
+
+    if content is not None:
+        load_content = lambda: content
+    else:
+        load_content = lambda: storage_client.get_file(file_path)
+    image = frame.get()
+    try:
+        return _worker_loop.run_until_complete(analyze_image_local(
+            request_id, image, frame.scale, FullResolutionLoader(load_content), file_path
+        ))
+    finally:
+        del image
+        try:
+            frame.close()
+        except BufferError:
+            # На кадр еще ссылаются массивы проверок; сегмент закроется вместе с ними
+            logger.debug(f"[{request_id}] Shared frame is still referenced in the worker")
+
+
+class ProcessCheckEngine:
+    """
+    Пул процессов для конвейеров проверок.
+    Используется из цикла событий API; пул создается при первом обращении.
+    """
+
+    def __init__(self, max_workers: int = settings.CHECK_PROCESS_WORKERS):
+        """
+        Args:
+            max_workers: Число процессов (0 - по числу доступных ядер)
+        """
+        self.max_workers = max_workers or available_cpus()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._restarts = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                cpus = max(1, available_cpus() // self.max_workers)
+                # Процессы читают число потоков BLAS из окружения при загрузке NumPy
+                blas_threads = plan_check_threads(
+                    cpus, check_executor.workers, check_executor.cv_threads
+                )["blas_threads"]
+                for variable in BLAS_THREAD_VARIABLES:
+                    os.environ[variable] = str(blas_threads)
+                # spawn: процессы не наследуют потоки и соединения процесса API
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(cpus,)
+                )
+            return self._pool
+
+    def _discard_pool(self, pool: Optional[ProcessPoolExecutor]) -> None:
+        """Снимает пул с использования; выполняющиеся конвейеры завершаются"""
+        with self._lock:
+            if pool is None or self._pool is not pool:
+                return
+            self._pool = None
+            self._restarts += 1
+        pool.shutdown(wait=False)
+
+    async def start(self) -> None:
+        """Запускает все процессы заранее, чтобы модели загрузились до первых запросов"""
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        await asyncio.gather(*(loop.run_in_executor(pool, _ping) for _ in range(self.max_workers)))
+        logger.info(f"Started {self.max_workers} check worker processes")
+
+    async def run(
+        self,
+        request_id: str,
+        image: np.ndarray,
+        scale: int = 1,
+        file_path: Optional[str] = None,
+        content: Optional[bytes] = None,
+        cancelled: Optional[threading.Event] = None
+    ) -> Dict[str, Any]:
+        """
+        Выполняет конвейер проверок в процессе пула.
+
+        Полное разрешение процесс читает сам: из content или из хранилища по file_path.
+
+        Returns:
+            Результат в формате analyze_image
+
+        Raises:
+            ProcessingCancelled: Обработка отменена до отправки или во время проверок
+        """
+        if cancelled is not None and cancelled.is_set():
+            raise ProcessingCancelled()
+        loop = asyncio.get_running_loop()
+        frame = SharedFrameHandle.from_array(image, scale)
+        pool = self._get_pool()
+        self._in_flight += 1
+        try:
+            analysis = await loop.run_in_executor(pool, _run_pipeline, request_id, frame, file_path, content)
+        except BrokenProcessPool:
+            logger.error(f"[{request_id}] Check worker process died, restarting the pool")
+            self._discard_pool(pool)
+            raise
+        finally:
+            self._in_flight -= 1
+            frame.release()
+        self._completed += 1
+        if cancelled is not None and cancelled.is_set():
+            raise ProcessingCancelled()
+        return analysis
+
+    def on_config_change(self, old_config, new_config) -> None:
+        """
+        Обработчик изменения конфигурации (ConfigurationManager.add_change_callback):
+        новые конвейеры выполняются в процессах, прочитавших новую конфигурацию.
+        """
+        self._discard_pool(self._pool)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "engine": PROCESS_ENGINE,
+            "workers": self.max_workers,
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+            "restarts": self._restarts,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+process_check_engine = ProcessCheckEngine()
+
+
+def process_engine_enabled() -> bool:
+    return settings.CHECK_ENGINE == PROCESS_ENGINE
@@ -0,0 +1,403 @@
+"""
+Планировщик очереди обработки с приоритетами и справедливым разделением
+между арендаторами.
+
+Задачи ждут в отдельных очередях interactive и bulk. Обработчик получает
+следующую задачу только при свободном слоте, поэтому порядок запуска
+определяет планировщик, а не очередь семафора. Последние
+INTERACTIVE_RESERVED_SLOTS слотов доступны только interactive: массовая
+загрузка не занимает все слоты. При ожидании в обеих очередях задачи
+выбираются взвешенным циклическим обходом (INTERACTIVE_WEIGHT interactive на
+одну bulk), так что bulk не голодает при постоянном интерактивном потоке.
+
+Внутри приоритета у каждого арендатора своя очередь; очереди обслуживаются
+deficit round-robin с весами TENANT_WEIGHTS, а число выполняемых задач
+арендатора ограничено TENANT_MAX_IN_FLIGHT. Арендатор с большим потоком
+задач замедляет только себя.
+
+Очередь арендатора упорядочена по дедлайну (earliest deadline first, задачи
+без дедлайна - в порядке поступления после задач с дедлайном). Задачи с
+истекшим дедлайном выдаются обработчику с признаком expired без занятия
+слота: проверки для них не выполняются.
+
+Обработка вне очереди (inline-валидация) получает слот через acquire: ее
+заявка ждет в очереди на общих правилах, слот освобождается task_done.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)
+
+DEFAULT_TENANT = "default"
+
+
+def _percentile_ms(values: Deque[float], percent: int) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))] * 1000, 2)
+
+
+_HeapItem = Tuple[float, int, Dict[str, Any]]
+
+
+class _TenantQueues:
+    """Очереди арендаторов одного приоритета, обслуживаемые deficit round-robin"""
+
+    def __init__(self):
+        # Порядок ключей - порядок обхода активных арендаторов;
+        # очередь арендатора - куча по (дедлайн, порядок поступления)
+        self.queues: "OrderedDict[str, List[_HeapItem]]" = OrderedDict()
+        self.deficits: Dict[str, int] = {}
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def append(self, job: Dict[str, Any]) -> None:
+        tenant = job["tenant"]
+        if tenant not in self.queues:
+            self.queues[tenant] = []
+            self.deficits[tenant] = 0
+        deadline = job["deadline"] if job.get("deadline") is not None else math.inf
+        heapq.heappush(self.queues[tenant], (deadline, next(self._sequence), job))
+
+    def _take(self, tenant: str) -> Dict[str, Any]:
+        queue = self.queues[tenant]
+        job = heapq.heappop(queue)[2]
+        if not queue:
+            # Неактивный арендатор не копит дефицит
+            del self.queues[tenant]
+            del self.deficits[tenant]
+        return job
+
+    def has_ready(self, can_run: Callable[[str], bool]) -> bool:
+        return any(can_run(tenant) for tenant in self.queues)
+
+    def next_deadline(self) -> float:
+        return min((queue[0][0] for queue in self.queues.values()), default=math.inf)
+
+    def pop_expired(self, now: float) -> Optional[Dict[str, Any]]:
+        """Задача с истекшим дедлайном (проверяется начало очереди каждого арендатора)"""
+        for tenant, queue in self.queues.items():
+            if queue[0][0] <= now:
+                return self._take(tenant)
+        return None
+
+    def remove(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Удаляет задачу из очереди арендатора"""
+        for tenant, queue in self.queues.items():
+            for index, item in enumerate(queue):
+                if item[2].get("request_id") == request_id:
+                    queue[index] = queue[-1]
+                    queue.pop()
+                    if queue:
+                        heapq.heapify(queue)
+                    else:
+                        del self.queues[tenant]
+                        del self.deficits[tenant]
+                    return item[2]
+        return None
+
+    def pop(self, can_run: Callable[[str], bool], quantum: Callable[[str], int]) -> Optional[Dict[str, Any]]:
+        """
+        Следующая задача: арендатор в начале обхода тратит накопленный дефицит,
+        новый квант (вес арендатора) он получает, когда дефицит исчерпан.
+        Арендаторы на пределе выполняемых задач пропускаются без начисления кванта.
+        """
+        for _ in range(len(self.queues)):
+            tenant = next(iter(self.queues))
+            if not can_run(tenant):
+                self.queues.move_to_end(tenant)
+                continue
+            if self.deficits[tenant] < 1:
+                self.deficits[tenant] += quantum(tenant)
+            self.deficits[tenant] -= 1
+            job = self._take(tenant)
+            if tenant in self.queues and self.deficits[tenant] < 1:
+                self.queues.move_to_end(tenant)
+            return job
+        return None
+
+
+class PriorityScheduler:
+    """
+    Очереди задач по приоритетам и арендаторам с учетом занятых слотов обработки.
+    Используется только из цикла событий (без блокировок).
+    """
+
+    def __init__(
+        self,
+        capacity: int = settings.MAX_CONCURRENT_PROCESSING,
+        reserved_interactive: int = settings.INTERACTIVE_RESERVED_SLOTS,
+        interactive_weight: int = settings.INTERACTIVE_WEIGHT,
+        tenant_weights: Optional[Dict[str, int]] = None,
+        tenant_max_in_flight: Optional[Dict[str, int]] = None,
+        default_tenant_max_in_flight: int = settings.TENANT_DEFAULT_MAX_IN_FLIGHT,
+        wait_window: int = 1000
+    ):
+        """
+        Args:
+            capacity: Число слотов обработки
+            reserved_interactive: Слоты, недоступные bulk (bulk остается хотя бы один)
+            interactive_weight: Число задач interactive на одну bulk при конкуренции
+            tenant_weights: Веса арендаторов (по умолчанию TENANT_WEIGHTS, остальные - 1)
+            tenant_max_in_flight: Пределы выполняемых задач арендаторов (по умолчанию TENANT_MAX_IN_FLIGHT)
+            default_tenant_max_in_flight: Предел для остальных арендаторов (0 - без предела)
+            wait_window: Число последних ожиданий для статистики
+        """
+        self.capacity = capacity
+        self.reserved_interactive = max(0, min(reserved_interactive, capacity - 1))
+        self.weights = {INTERACTIVE: interactive_weight, BULK: 1}
+        self.tenant_weights = dict(settings.TENANT_WEIGHTS if tenant_weights is None else tenant_weights)
+        self.tenant_max_in_flight = dict(
+            settings.TENANT_MAX_IN_FLIGHT if tenant_max_in_flight is None else tenant_max_in_flight
+        )
+        self.default_tenant_max_in_flight = default_tenant_max_in_flight
+        self.wait_window = wait_window
+        self._lanes: Dict[str, _TenantQueues] = {priority: _TenantQueues() for priority in PRIORITIES}
+        self._running = {priority: 0 for priority in PRIORITIES}
+        self._credits = {priority: 0 for priority in PRIORITIES}
+        self._waits = {priority: deque(maxlen=wait_window) for priority in PRIORITIES}
+        self._dispatched = {priority: 0 for priority in PRIORITIES}
+        self._expired = {priority: 0 for priority in PRIORITIES}
+        self._tenant_running: Dict[str, int] = {}
+        self._tenant_waits: Dict[str, Deque[float]] = {}
+        # Выданные задачи очереди, еще не полученные обработчиком из get
+        self._ready: Deque[Dict[str, Any]] = deque()
+        self._changed: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_changed(self) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        if self._changed is None or self._loop is not loop:
+            self._changed = asyncio.Event()
+            self._loop = loop
+        return self._changed
+
+    def _notify(self) -> None:
+        if self._changed is not None:
+            self._changed.set()
+
+    def qsize(self, priority: Optional[str] = None) -> int:
+        """Число ожидающих задач (всего или в очереди priority)"""
+        if priority is not None:
+            return len(self._lanes[priority])
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def running(self, priority: Optional[str] = None) -> int:
+        """Число выданных и не завершенных задач"""
+        if priority is not None:
+            return self._running[priority]
+        return sum(self._running.values())
+
+    def put(
+        self,
+        job: Dict[str, Any],
+        priority: str = INTERACTIVE,
+        tenant: str = DEFAULT_TENANT,
+        deadline: Optional[float] = None
+    ) -> None:
+        """
+        Ставит задачу арендатора tenant в очередь priority.
+        deadline - время (time.time()), после которого результат не нужен.
+        """
+        if priority not in self._lanes:
+            raise ValueError(f"Unknown priority: {priority}")
+        job["priority"] = priority
+        job["tenant"] = tenant
+        job["deadline"] = deadline
+        job["enqueued_at"] = time.monotonic()
+        self._lanes[priority].append(job)
+        self._notify()
+
+    def remove(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Удаляет ожидающую задачу request_id из очереди; None, если ее нет.
+        Ожидающий acquire получает None.
+        """
+        for lane in self._lanes.values():
+            job = lane.remove(request_id)
+            if job is not None:
+                if "slot" in job:
+                    self._grant(job, False)
+                return job
+        return None
+
+    async def acquire(
+        self,
+        request_id: str,
+        priority: str = INTERACTIVE,
+        tenant: str = DEFAULT_TENANT,
+        deadline: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Занимает слот для обработки вне очереди задач. Слот выдается в
+        порядке планировщика: задачи очереди, выданные раньше заявки,
+        передаются обработчику через get.
+
+        Returns:
+            Заявка, слот которой освобождается task_done, или None, если
+            слот не выдан (истек дедлайн или заявка удалена из очереди)
+        """
+        job = {"request_id": request_id, "slot": asyncio.get_running_loop().create_future()}
+        self.put(job, priority, tenant, deadline)
+        changed = self._get_changed()
+        try:
+            # Выдачу выполняет тот, кто ждет: обработчик очереди в get или сама заявка
+            while not job["slot"].done():
+                now = time.time()
+                while not job["slot"].done() and self._dispatch(now):
+                    pass
+                if not job["slot"].done():
+                    await self._wait_changed(changed, now)
+            granted = job["slot"].result()
+        except asyncio.CancelledError:
+            if not job["slot"].done():
+                job["slot"].cancel()
+                self.remove(request_id)
+            elif not job["slot"].cancelled() and job["slot"].result():
+                self.task_done(job)
+            raise
+        return job if granted else None
+
+    def _grant(self, job: Dict[str, Any], granted: bool) -> None:
+        """Выдает слот заявке acquire; слот ушедшей заявки сразу освобождается"""
+        if job["slot"].done():
+            if granted:
+                self.task_done(job)
+            return
+        job["slot"].set_result(granted)
+        self._notify()
+
+    def _tenant_weight(self, tenant: str) -> int:
+        return self.tenant_weights.get(tenant, 1)
+
+    def _tenant_can_run(self, tenant: str) -> bool:
+        limit = self.tenant_max_in_flight.get(tenant, self.default_tenant_max_in_flight)
+        return not limit or self._tenant_running.get(tenant, 0) < limit
+
+    def _can_start(self, priority: str) -> bool:
+        if self.running() >= self.capacity:
+            return False
+        if priority == BULK and self._running[BULK] >= self.capacity - self.reserved_interactive:
+            return False
+        return self._lanes[priority].has_ready(self._tenant_can_run)
+
+    def _select(self) -> Optional[str]:
+        """Выбирает очередь взвешенным циклическим обходом (smooth weighted round-robin)"""
+        ready = [priority for priority in PRIORITIES if self._can_start(priority)]
+        if len(ready) < 2:
+            return ready[0] if ready else None
+        total = sum(self.weights[priority] for priority in ready)
+        for priority in ready:
+            self._credits[priority] += self.weights[priority]
+        selected = max(ready, key=lambda priority: self._credits[priority])
+        self._credits[selected] -= total
+        return selected
+
+    def _pop_expired(self, now: float) -> Optional[Dict[str, Any]]:
+        for priority, lane in self._lanes.items():
+            job = lane.pop_expired(now)
+            if job is not None:
+                self._expired[priority] += 1
+                job["expired"] = True
+                return job
+        return None
+
+    def _dispatch(self, now: float) -> bool:
+        """
+        Выдает следующую задачу: заявке acquire - ее слот, задачу очереди -
+        в _ready для get. Returns: False, если выдавать нечего.
+        """
+        job = self._pop_expired(now)
+        if job is None:
+            priority = self._select()
+            if priority is None:
+                return False
+            job = self._lanes[priority].pop(self._tenant_can_run, self._tenant_weight)
+            tenant = job["tenant"]
+            wait = time.monotonic() - job["enqueued_at"]
+            self._running[priority] += 1
+            self._dispatched[priority] += 1
+            self._waits[priority].append(wait)
+            self._tenant_running[tenant] = self._tenant_running.get(tenant, 0) + 1
+            self._tenant_waits.setdefault(tenant, deque(maxlen=self.wait_window)).append(wait)
+        if "slot" in job:
+            self._grant(job, not job.get("expired"))
+        else:
+            self._ready.append(job)
+            self._notify()
+        return True
+
+    async def _wait_changed(self, changed: asyncio.Event, now: float) -> None:
+        changed.clear()
+        # Ожидание прерывается к ближайшему дедлайну в очередях
+        next_deadline = min(lane.next_deadline() for lane in self._lanes.values())
+        timeout = None if next_deadline == math.inf else max(0.0, next_deadline - now)
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def get(self) -> Dict[str, Any]:
+        """
+        Ожидает свободный слот и задачу, которой он доступен.
+        Слот считается занятым до вызова task_done. Задача с истекшим
+        дедлайном возвращается сразу, с признаком expired и без слота.
+        """
+        changed = self._get_changed()
+        while True:
+            now = time.time()
+            while not self._ready and self._dispatch(now):
+                pass
+            if self._ready:
+                return self._ready.popleft()
+            await self._wait_changed(changed, now)
+
+    def task_done(self, job: Dict[str, Any]) -> None:
+        """Освобождает слот задачи, полученной из get"""
+        priority = job["priority"]
+        tenant = job["tenant"]
+        self._running[priority] = max(0, self._running[priority] - 1)
+        self._tenant_running[tenant] = max(0, self._tenant_running.get(tenant, 0) - 1)
+        self._notify()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Глубина очередей, занятые слоты и время ожидания по приоритетам и арендаторам"""
+        stats: Dict[str, Any] = {
+            "capacity": self.capacity,
+            "reserved_interactive": self.reserved_interactive,
+        }
+        for priority in PRIORITIES:
+            stats[priority] = {
+                "queued": len(self._lanes[priority]),
+                "running": self._running[priority],
+                "dispatched": self._dispatched[priority],
+                "expired": self._expired[priority],
+                "wait_p50_ms": _percentile_ms(self._waits[priority], 50),
+                "wait_p99_ms": _percentile_ms(self._waits[priority], 99),
+            }
+        tenants = set(self._tenant_running) | set(self._tenant_waits)
+        for lane in self._lanes.values():
+            tenants.update(lane.queues)
+        stats["tenants"] = {
+            tenant: {
+                "queued": sum(len(lane.queues.get(tenant, ())) for lane in self._lanes.values()),
+                "running": self._tenant_running.get(tenant, 0),
+                "weight": self._tenant_weight(tenant),
+                "wait_p50_ms": _percentile_ms(self._tenant_waits.get(tenant, deque()), 50),
+                "wait_p99_ms": _percentile_ms(self._tenant_waits.get(tenant, deque()), 99),
+            }
+            for tenant in sorted(tenants)
+        }
+        return stats
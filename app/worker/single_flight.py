@@ -0,0 +1,135 @@
+"""
+Объединение одновременных обработок одинаковых файлов.
+
+Первая загрузка содержимого (ведущая) обрабатывается как обычно и регистрирует
+обработку по хэшу содержимого. Повторные загрузки тех же байтов, пришедшие до ее
+завершения, не занимают слот обработки: они ждут ее и получают тот же результат.
+
+Ожидающие получают только результат проверок. Если ведущая обработка отменена
+или ее дедлайн истек, первая ожидающая загрузка получает ее файл
+(LeaderAbandoned) и сама ставится в очередь, остальные ждут уже ее.
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class LeaderAbandoned(Exception):
+    """Ведущая обработка завершилась без проверок; ожидающая загрузка становится ведущей"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        super().__init__(f"In-flight job abandoned, file {file_path} handed over")
+
+
+class InFlightRegistry:
+    """
+    Реестр выполняющихся обработок по хэшу содержимого.
+    Используется только из цикла событий API (без блокировок).
+    """
+
+    def __init__(self):
+        # content_hash -> ожидающие загрузки: (request_id, future)
+        self._jobs: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __contains__(self, content_hash: Optional[str]) -> bool:
+        return bool(content_hash) and content_hash in self._jobs
+
+    def follow(self, content_hash: Optional[str], request_id: str) -> Optional[asyncio.Future]:
+        """
+        Подписывает загрузку request_id на выполняющуюся обработку того же содержимого.
+
+        Returns:
+            Future результата или None, если такое содержимое не обрабатывается
+        """
+        if content_hash not in self:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self._jobs[content_hash].append((request_id, future))
+        logger.info(f"Coalescing upload {request_id} of content {content_hash[:12]} with in-flight job")
+        return future
+
+    def waiting(self, content_hash: Optional[str]) -> int:
+        """Количество загрузок, ожидающих обработку содержимого"""
+        if content_hash not in self:
+            return 0
+        return sum(1 for _, future in self._jobs[content_hash] if not future.done())
+
+    def register(self, content_hash: Optional[str]) -> None:
+        """Регистрирует ведущую обработку содержимого"""
+        if content_hash:
+            self._jobs.setdefault(content_hash, [])
+
+    def resolve(self, content_hash: Optional[str], result: Dict[str, Any]) -> None:
+        """
+        Завершает обработку: ожидающие повторные загрузки получают result
+        (словарь в формате ValidationRequest.to_dict()).
+        """
+        if not content_hash:
+            return
+        for _, future in self._jobs.pop(content_hash, []):
+            if not future.done():
+                future.set_result(result)
+
+    def abandon(self, content_hash: Optional[str], result: Dict[str, Any], file_path: Optional[str] = None) -> bool:
+        """
+        Ведущая обработка завершилась без проверок (CANCELLED или EXPIRED).
+
+        Ожидание самой загрузки result["request_id"] (если она стала ведущей
+        из ожидающих) завершается с result. Первая из остальных ожидающих
+        загрузок получает LeaderAbandoned с файлом file_path, обработка
+        остается зарегистрированной. Без файла ожидающие получают result.
+
+        Returns:
+            True, если файл передан ожидающей загрузке и удалять его нельзя
+        """
+        if content_hash not in self:
+            return False
+        pending = []
+        for follower_id, future in self._jobs[content_hash]:
+            if future.done():
+                continue
+            if follower_id == result.get("request_id"):
+                future.set_result(result)
+            else:
+                pending.append((follower_id, future))
+        if not pending or file_path is None:
+            self._jobs.pop(content_hash)
+            for _, future in pending:
+                future.set_result(result)
+            return False
+        (request_id, future), self._jobs[content_hash] = pending[0], pending[1:]
+        logger.info(f"In-flight job for content {content_hash[:12]} abandoned, handing it over to {request_id}")
+        future.set_exception(LeaderAbandoned(file_path))
+        return True
+
+    def leave(self, content_hash: Optional[str], request_id: str, future: asyncio.Future) -> Optional[str]:
+        """
+        Загрузка больше не ждет обработку (ее прием не удался). Если ей уже
+        передан файл отмененной ведущей, он передается следующей ожидающей.
+
+        Returns:
+            Путь файла, который больше никому не нужен и должен быть удален
+        """
+        if not future.done():
+            future.cancel()
+            return None
+        if future.cancelled() or not isinstance(future.exception(), LeaderAbandoned):
+            return None
+        file_path = future.exception().file_path
+        if self.abandon(content_hash, {"request_id": request_id}, file_path):
+            return None
+        return file_path
+
+    def clear(self) -> None:
+        """Забывает все зарегистрированные обработки"""
+        self._jobs.clear()
+
+
+inflight_jobs = InFlightRegistry()
@@ -6,26 +6,44 @@ from datetime import datetime
 import cv2
 import numpy as np
 import os
-from typing import Dict, Any, List, Tuple, Union, Optional, Set
+from typing import Dict, Any, Callable, List, Tuple, Union, Optional, Set
 import traceback
 import json
 import math
+import threading
 import weakref
 
 from app.core.logging import get_logger
-from app.core.concurrency import acquire_processing_slot, release_processing_slot
+from app.core.admission import admission_controller
+from app.core.exceptions import ProcessingCancelled
 from app.db.repositories import ValidationRequestRepository
 from app.storage.client import storage_client
 from app.core.config import settings
 # Импортируем новую систему проверок
-from app.cv.checks.runner import CheckRunner
+from app.cv.checks.runner import CheckRunner, check_runner
 from app.cv.checks.registry import check_registry
 from app.core.check_config import check_config
+from app.core.image_header import probe_image_header
+from app.config.manager import get_config_manager
+from app.core.result_cache import get_config_version, result_cache
+from app.cv.decoding import FullResolutionLoader, choose_reduction, decode_image
+from app.cv.perceptual_hash import dhash
+from app.worker.cancellation import running_jobs
+from app.worker.job_queue import JobQueueConsumer, durable_queue_enabled
+from app.worker.process_engine import process_check_engine, process_engine_enabled
+from app.worker.scheduler import DEFAULT_TENANT, INTERACTIVE, PriorityScheduler
+from app.worker.single_flight import LeaderAbandoned, inflight_jobs
 
 logger = get_logger(__name__)
 
-# Очередь задач для обработки изображений
-processing_queue = asyncio.Queue()
+# Очередь задач для обработки изображений с приоритетами interactive/bulk
+# и справедливым разделением слотов между арендаторами.
+# Число принятых задач ограничивает admission_controller при приеме загрузок.
+processing_queue = PriorityScheduler()
+
+# Очередь в БД (JOB_QUEUE=database): задачи, арендованные этим процессом,
+# ставятся в processing_queue (см. app.worker.job_queue)
+job_queue = JobQueueConsumer(processing_queue)
 
 # Множество для отслеживания активных задач
 active_tasks: Set[asyncio.Task] = set()
@@ -124,13 +142,180 @@ def convert_numpy_types(data: Union[Dict, List, Any]) -> Union[Dict, List, Any]:
     # возвращаем как есть (int, float, str, list, dict, bool, None)
     return data
 
+# --- Анализ изображения ---
+async def analyze_image(
+    request_id: str,
+    image: np.ndarray,
+    scale: int = 1,
+    full_resolution=None,
+    file_path: Optional[str] = None,
+    cancelled: Optional[threading.Event] = None,
+    content: Optional[bytes] = None
+) -> Dict[str, Any]:
+    """
+    Запускает проверки для уже декодированного изображения в процессе API
+    или, при CHECK_ENGINE=process, в пуле процессов (см. app.worker.process_engine).
+
+    Args:
+        request_id: ID запроса
+        image: Рабочее изображение
+        scale: Коэффициент уменьшения рабочего изображения
+        full_resolution: Ленивый загрузчик полного разрешения (при scale > 1)
+        file_path: Путь к файлу в хранилище (для контекста проверок)
+        cancelled: Флаг отмены, проверяемый перед каждой проверкой
+        content: Исходные байты файла, если его нет в хранилище (для пула процессов)
+
+    Returns:
+        Словарь с overall_status, checks, issues (в нативных типах Python)
+        и признаком completed - все ли включенные проверки вернули статус
+
+    Raises:
+        ProcessingCancelled: Обработка отменена до завершения проверок
+    """
+    if process_engine_enabled():
+        return await process_check_engine.run(request_id, image, scale, file_path, content, cancelled)
+    return await analyze_image_local(request_id, image, scale, full_resolution, file_path, cancelled)
+
+
+async def analyze_image_local(
+    request_id: str,
+    image: np.ndarray,
+    scale: int = 1,
+    full_resolution=None,
+    file_path: Optional[str] = None,
+    cancelled: Optional[threading.Event] = None
+) -> Dict[str, Any]:
+    """
+    Запускает проверки в текущем процессе (параметры - как у analyze_image).
+
+    Returns:
+        Словарь с overall_status, checks, issues (в нативных типах Python)
+        и признаком completed - все ли включенные проверки вернули статус
+
+    Raises:
+        ProcessingCancelled: Обработка отменена до завершения проверок
+    """
+    # Полное разрешение декодируется лениво - только для проверок фрагментов лица
+    context = {
+        "request_id": request_id,
+        "file_path": file_path,
+        "image_shape": image.shape,
+        "analysis_scale": scale,
+        "full_resolution": full_resolution if scale > 1 else None,
+        "cancelled": cancelled,
+    }
+
+    logger.debug(f"[{request_id}] Running checks...")
+    validation_result = await check_runner.run_checks(image, context)
+
+    checks = validation_result["checks"]
+    required_checks = set(check_config.get_enabled_checks())
+    found_checks = {c.get("check"): c for c in checks}
+    logger.warning(f"[{request_id}] check_order: {list(required_checks)}")
+    logger.warning(f"[{request_id}] checks: {[ (c.get('check'), c.get('status')) for c in checks ]}")
+    completed = True
+    for check_id in required_checks:
+        c = found_checks.get(check_id)
+        if not c or c.get("status") is None:
+            completed = False
+            logger.warning(f"[{request_id}] Check '{check_id}' not completed (status: {c.get('status') if c else 'MISSING'}), not marking as COMPLETED.")
+            break
+
+    # Конвертируем типы NumPy для сохранения в БД и ответа API
+    logger.debug(f"[{request_id}] Converting check results...")
+    return {
+        "overall_status": validation_result["overall_status"],
+        "checks": convert_numpy_types(checks),
+        "issues": convert_numpy_types(validation_result["issues"]),
+        "completed": completed,
+    }
+
+
+# --- Завершение задачи без обработки ---
+ABANDON_MESSAGES = {
+    "EXPIRED": "Deadline exceeded before processing",
+    "CANCELLED": "Cancelled by client",
+}
+
+
+async def abandon_image_task(
+    request_id: str,
+    file_path: str,
+    frame=None,
+    content_hash: Optional[str] = None,
+    status: str = "EXPIRED",
+    accepted_elsewhere: bool = False
+) -> None:
+    """
+    Завершает задачу без проверок со статусом EXPIRED (истек дедлайн) или
+    CANCELLED (отменена клиентом). Освобождает кадр, файл в хранилище и
+    место в очереди. Файл передается повторной загрузке того же содержимого,
+    если она ожидает эту обработку (см. app.worker.single_flight), а файл
+    задачи очереди в БД, принятой другим процессом (accepted_elsewhere),
+    остается этому процессу: ожидающие загрузки у него.
+    """
+    error_message = ABANDON_MESSAGES[status]
+    logger.warning(f"Request {request_id} finished without processing: {status}")
+    try:
+        ValidationRequestRepository.update_error(
+            request_id=request_id,
+            error_message=error_message,
+            status=status
+        )
+    except Exception as e:
+        logger.error(f"Failed to record {status} status for request {request_id}: {type(e).__name__}: {str(e)}")
+    finally:
+        if frame is not None:
+            frame.release()
+        handed_over = inflight_jobs.abandon(content_hash, {
+            "request_id": request_id,
+            "status": status,
+            "overall_status": None,
+            "checks": [],
+            "issues": [],
+            "error_message": error_message,
+            "processed_at": datetime.utcnow(),
+            "processing_time": 0.0,
+        }, file_path)
+        if not handed_over and not (accepted_elsewhere and content_hash):
+            try:
+                storage_client.delete_file(file_path)
+            except Exception as del_e:
+                logger.error(f"Failed to delete file {file_path} from storage: {type(del_e).__name__}: {str(del_e)}")
+        admission_controller.release(request_id, completed=False)
+
+
 # --- Основная функция обработки изображения ---
-async def process_image_task(request_id: str, file_path: str) -> None:
+async def process_image_task(
+    request_id: str,
+    file_path: str,
+    frame=None,
+    content_hash: Optional[str] = None,
+    deadline: Optional[float] = None,
+    accepted_elsewhere: bool = False
+) -> None:
     """
     Асинхронная задача для обработки и валидации изображения.
     Использует новую модульную систему проверок.
+
+    Если передан дескриптор кадра (frame), используется изображение,
+    декодированное при приеме загрузки, без чтения файла и повторного декодирования.
+    Результат сохраняется в кэш результатов по content_hash и передается
+    повторным загрузкам того же содержимого, ожидающим эту обработку.
+    Слот обработки уже выдан планировщиком (processing_queue): задача
+    запускается start_worker после processing_queue.get() и освобождает слот
+    через task_done. Если дедлайн (time.time()) истек к получению слота или обработка отменена
+    (см. app.worker.cancellation), проверки не выполняются или прерываются,
+    а файл передается ожидающей повторной загрузке (см. abandon_image_task).
     """
-    await acquire_processing_slot() # Получаем слот для обработки
+    cancelled = running_jobs.register(request_id)
+    if cancelled.is_set() or (deadline is not None and time.time() >= deadline):
+        running_jobs.unregister(request_id)
+        await abandon_image_task(
+            request_id, file_path, frame, content_hash,
+            "CANCELLED" if cancelled.is_set() else "EXPIRED", accepted_elsewhere
+        )
+        return
     logger.info(f"Starting image processing for request: {request_id} from file: {file_path}")
     start_time = time.time()
 
@@ -140,73 +325,77 @@ async def process_image_task(request_id: str, file_path: str) -> None:
     issues: List[str] = []
     final_processing_time: float = 0.0
     error_message_short: Optional[str] = None # Краткое сообщение об ошибке для БД
+    job_status: str = "FAILED"
 
     try:
         # Шаг 1: Обновляем статус на PROCESSING
         ValidationRequestRepository.update_status(request_id, "PROCESSING")
 
-        # Шаг 2: Получаем и декодируем изображение
-        logger.debug(f"[{request_id}] Getting image from storage...")
-        image_bytes = storage_client.get_file(file_path)
-        logger.debug(f"[{request_id}] Decoding image...")
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
-        if image is None:
-            raise ValueError("Failed to decode image (cv2.imdecode returned None)")
-        logger.debug(f"[{request_id}] Image decoded successfully, shape: {image.shape}")
-        
-        # Шаг 3: Подготовка контекста для проверок
-        context = {
-            "request_id": request_id,
-            "file_path": file_path,
-            "image_shape": image.shape,
-        }
-        
-        # Шаг 4: Запуск проверок с использованием CheckRunner
-        logger.debug(f"[{request_id}] Running checks...")
-        check_runner = CheckRunner()
-        validation_result = await check_runner.run_checks(image, context)
-        
-        # Шаг 5: Обработка результатов проверок
-        overall_status = validation_result["overall_status"]
-        checks = validation_result["checks"]
-        issues = validation_result["issues"]
-
-        required_checks = set(check_config.get_enabled_checks())
-        found_checks = {c.get("check"): c for c in checks}
-        logger.warning(f"[{request_id}] check_order: {list(required_checks)}")
-        logger.warning(f"[{request_id}] checks: {[ (c.get('check'), c.get('status')) for c in checks ]}")
-        all_checks_completed = True
-        for check_id in required_checks:
-            c = found_checks.get(check_id)
-            if not c or c.get("status") is None:
-                all_checks_completed = False
-                logger.warning(f"[{request_id}] Check '{check_id}' not completed (status: {c.get('status') if c else 'MISSING'}), not marking as COMPLETED.")
-                break
-
-        # Шаг 6: Конвертируем типы NumPy для сохранения в БД
-        logger.debug(f"[{request_id}] Converting check results...")
-        checks_final = convert_numpy_types(checks)
-        issues_final = convert_numpy_types(issues)
-
-        # Шаг 7: Сохранение успешного результата в БД
+        # Шаг 2: Получаем рабочее изображение (готовый кадр или чтение и декодирование файла)
+        analysis_target_size = get_config_manager().get_config().system.processing.analysis_target_size
+        if frame is not None:
+            logger.debug(f"[{request_id}] Using frame decoded at ingest (scale 1/{frame.scale})")
+            image = frame.get()
+            scale = frame.scale
+            full_resolution = FullResolutionLoader(lambda: storage_client.get_file(file_path))
+        else:
+            logger.debug(f"[{request_id}] Getting image from storage...")
+            image_bytes = storage_client.get_file(file_path)
+            image_info = probe_image_header(image_bytes)
+            scale = 1
+            if image_info is not None:
+                scale = choose_reduction(image_info.format, image_info.width, image_info.height, analysis_target_size)
+            logger.debug(f"[{request_id}] Decoding image (scale 1/{scale})...")
+            image = decode_image(image_bytes, scale)
+            if image is None:
+                raise ValueError("Failed to decode image (cv2.imdecode returned None)")
+            full_resolution = FullResolutionLoader(lambda: image_bytes)
+            logger.debug(f"[{request_id}] Image decoded successfully, shape: {image.shape}")
+
+        # Шаг 3: Запуск проверок (версия конфигурации фиксируется до их начала)
+        config_version = get_config_version() if content_hash else None
+        analysis = await analyze_image(request_id, image, scale, full_resolution, file_path, cancelled)
+        overall_status = analysis["overall_status"]
+        checks = analysis["checks"]
+        issues = analysis["issues"]
+
+        # Шаг 4: Сохранение успешного результата в БД
         final_processing_time = time.time() - start_time
         logger.debug(f"[{request_id}] Updating result in database...")
-        if all_checks_completed:
+        if analysis["completed"]:
+            job_status = "COMPLETED"
             ValidationRequestRepository.update_result(
                 request_id=request_id,
                 status="COMPLETED",
                 overall_status=overall_status,
-                checks=checks_final,
-                issues=issues_final,
+                checks=checks,
+                issues=issues,
                 processed_at=datetime.utcnow(),
                 processing_time=final_processing_time
             )
             logger.info(f"Completed processing for request: {request_id}, overall status: {overall_status}, time: {final_processing_time:.3f}s")
+            result_cache.put(content_hash, analysis, config_version, perceptual_hash=dhash(image))
         else:
+            job_status = "PROCESSING"
             ValidationRequestRepository.update_status(request_id, "PROCESSING")
             logger.info(f"[{request_id}] Not all checks completed, status left as PROCESSING.")
 
+    except ProcessingCancelled as e:
+        final_processing_time = time.time() - start_time
+        job_status = "CANCELLED"
+        error_message_short = e.message
+        checks, issues = [], []
+        logger.info(f"Processing cancelled for request: {request_id} after {final_processing_time:.3f}s")
+        try:
+            ValidationRequestRepository.update_error(
+                request_id=request_id,
+                error_message=error_message_short,
+                processing_time=final_processing_time,
+                status="CANCELLED"
+            )
+        except Exception as db_e:
+            logger.error(f"Failed to record CANCELLED status for request {request_id}: {db_e}")
+
     except Exception as e:
         final_processing_time = time.time() - start_time
         tb_str = traceback.format_exc()
@@ -240,16 +429,313 @@ async def process_image_task(request_id: str, file_path: str) -> None:
                 logger.critical(f"Failed to update minimal error status for request {request_id}: {final_db_e}")
 
     finally:
+        running_jobs.unregister(request_id)
+        if frame is not None:
+            frame.release()
+
+        job_result = {
+            "request_id": request_id,
+            "status": job_status,
+            "overall_status": overall_status,
+            "checks": convert_numpy_types(checks),
+            "issues": convert_numpy_types(issues),
+            "error_message": error_message_short,
+            "processed_at": datetime.utcnow(),
+            "processing_time": final_processing_time,
+        }
+        keep_file = False
+        if job_status == "CANCELLED":
+            # Ожидающие загрузки получают файл, а не статус отмененного запроса
+            keep_file = inflight_jobs.abandon(content_hash, job_result, file_path) or bool(accepted_elsewhere and content_hash)
+        else:
+            inflight_jobs.resolve(content_hash, job_result)
+
+        if not keep_file:
+            try:
+                logger.debug(f"[{request_id}] Deleting file from storage: {file_path}")
+                storage_client.delete_file(file_path)
+                logger.debug(f"[{request_id}] File deleted from storage: {file_path}")
+            except Exception as del_e:
+                logger.error(f"Failed to delete file {file_path} from storage: {type(del_e).__name__}: {str(del_e)}")
+
+        admission_controller.release(request_id)
+
+
+# --- Синхронная (inline) валидация ---
+def _persist_inline_result(request_id: str, result: Dict[str, Any]) -> None:
+    """Сохраняет результат inline-валидации в БД"""
+    if result["status"] == "COMPLETED":
+        ValidationRequestRepository.update_result(
+            request_id=request_id,
+            status="COMPLETED",
+            overall_status=result["overall_status"],
+            checks=result["checks"],
+            issues=result["issues"],
+            processed_at=result["processed_at"],
+            processing_time=result["processing_time"]
+        )
+    elif result["status"] in ("FAILED", "EXPIRED", "CANCELLED"):
+        ValidationRequestRepository.update_error(
+            request_id=request_id,
+            error_message=result["error_message"],
+            processing_time=result["processing_time"],
+            status=result["status"],
+            checks=result["checks"],
+            issues=result["issues"],
+            overall_status=result["overall_status"]
+        )
+    else:
+        ValidationRequestRepository.update_status(request_id, result["status"])
+
+
+async def _persist_inline_validation(
+    request_id: str,
+    record_created: Optional[asyncio.Future],
+    result: Dict[str, Any]
+) -> None:
+    """Дожидается создания записи и сохраняет результат в фоне"""
+    loop = asyncio.get_running_loop()
+    try:
+        if record_created is not None:
+            await record_created
+        await loop.run_in_executor(None, _persist_inline_result, request_id, result)
+    except Exception as e:
+        logger.error(f"Failed to persist inline result for request {request_id}: {type(e).__name__}: {str(e)}")
+
+
+async def _abandon_inline_validation(
+    request_id: str,
+    content: bytes,
+    content_hash: Optional[str],
+    result: Dict[str, Any]
+) -> None:
+    """
+    Отмененная inline-валидация не имеет файла в хранилище: он сохраняется,
+    только если ее ждут повторные загрузки, и передается первой из них.
+    """
+    file_path = None
+    if inflight_jobs.waiting(content_hash):
+        file_path = f"{request_id}.jpg"
         try:
-            logger.debug(f"[{request_id}] Deleting file from storage: {file_path}")
-            storage_client.delete_file(file_path)
-            logger.debug(f"[{request_id}] File deleted from storage: {file_path}")
-        except Exception as del_e:
-            logger.error(f"Failed to delete file {file_path} from storage: {type(del_e).__name__}: {str(del_e)}")
+            await asyncio.get_running_loop().run_in_executor(None, storage_client.save_file, file_path, content)
+        except Exception as e:
+            logger.error(f"Failed to hand over cancelled inline request {request_id}: {type(e).__name__}: {str(e)}")
+            file_path = None
+    inflight_jobs.abandon(content_hash, result, file_path)
+
+
+async def run_inline_validation(
+    request_id: str,
+    frame,
+    content: bytes,
+    create_record: Callable[[], Any],
+    content_hash: Optional[str] = None,
+    tenant: str = DEFAULT_TENANT
+) -> Dict[str, Any]:
+    """
+    Выполняет валидацию в контексте запроса, минуя очередь задач.
 
-        logger.debug(f"[{request_id}] Releasing processing slot...")
-        release_processing_slot()
-        logger.debug(f"[{request_id}] Processing slot released for request {request_id}.")
+    Слот обработки выдает планировщик processing_queue в очереди interactive
+    арендатора tenant, наравне с задачами фонового обработчика. Запись
+    в БД создается и обновляется в пуле потоков параллельно с проверками,
+    поэтому результат возвращается, не дожидаясь записи.
+
+    Args:
+        request_id: ID запроса
+        frame: Дескриптор кадра, декодированного при приеме загрузки
+        content: Исходные байты файла (для полного разрешения)
+        create_record: Функция создания записи запроса в БД
+        content_hash: SHA-256 содержимого для кэша результатов
+        tenant: Арендатор запроса
+
+    Returns:
+        Результат в формате ValidationRequest.to_dict()
+    """
+    loop = asyncio.get_running_loop()
+    record_created = loop.run_in_executor(None, create_record)
+
+    cancelled = running_jobs.register(request_id)
+    start_time = time.time()
+    slot = await processing_queue.acquire(request_id, INTERACTIVE, tenant)
+    logger.info(f"Starting inline processing for request: {request_id}")
+    result: Dict[str, Any] = {
+        "request_id": request_id,
+        "status": "FAILED",
+        "overall_status": "FAILED",
+        "checks": [],
+        "issues": [],
+        "error_message": None,
+    }
+    try:
+        if slot is None:
+            # Заявка снята с очереди отменой запроса
+            raise ProcessingCancelled()
+        config_version = get_config_version() if content_hash else None
+        image = frame.get()
+        analysis = await analyze_image(
+            request_id, image, frame.scale, FullResolutionLoader(lambda: content), cancelled=cancelled, content=content
+        )
+        result.update(
+            status="COMPLETED" if analysis["completed"] else "PROCESSING",
+            overall_status=analysis["overall_status"],
+            checks=analysis["checks"],
+            issues=analysis["issues"],
+        )
+        if analysis["completed"]:
+            result_cache.put(content_hash, analysis, config_version, perceptual_hash=dhash(image))
+    except ProcessingCancelled as e:
+        result.update(status="CANCELLED", overall_status=None, error_message=e.message)
+        logger.info(f"Inline processing cancelled for request: {request_id}")
+    except Exception as e:
+        result["error_message"] = f"Processing error: {type(e).__name__}: {str(e)}"
+        logger.error(f"Error in inline processing for request: {request_id}. Error: {result['error_message']}\n{traceback.format_exc()}", extra={"request_id": request_id})
+    finally:
+        running_jobs.unregister(request_id)
+        frame.release()
+        if slot is not None:
+            processing_queue.task_done(slot)
+        admission_controller.release(request_id)
+
+    result["processing_time"] = time.time() - start_time
+    result["processed_at"] = datetime.utcnow()
+    if result["status"] == "CANCELLED":
+        await _abandon_inline_validation(request_id, content, content_hash, dict(result))
+    else:
+        inflight_jobs.resolve(content_hash, dict(result))
+    logger.info(f"Completed inline processing for request: {request_id}, status: {result['status']}, time: {result['processing_time']:.3f}s")
+
+    # Запись результата - вне критического пути ответа
+    task = asyncio.create_task(_persist_inline_validation(request_id, record_created, dict(result)))
+    active_tasks.add(task)
+    return result
+
+
+async def _take_over_inflight_job(
+    request_id: str,
+    file_path: str,
+    content_hash: str,
+    record_created: Optional[asyncio.Future],
+    priority: str,
+    tenant: str,
+    deadline: Optional[float]
+) -> Dict[str, Any]:
+    """
+    Ставит в очередь повторную загрузку вместо отмененной или просроченной
+    ведущей обработки, с файлом ведущей, и ждет собственного результата.
+    """
+    logger.info(f"Request {request_id} takes over processing of content {content_hash[:12]}")
+    own = inflight_jobs.follow(content_hash, request_id)
+    try:
+        if record_created is not None:
+            await record_created
+        await add_processing_task(
+            request_id, file_path, content_hash=content_hash, priority=priority, tenant=tenant, deadline=deadline
+        )
+    except Exception as e:
+        logger.error(f"Failed to take over processing for request {request_id}: {type(e).__name__}: {str(e)}")
+        result = {
+            "request_id": request_id,
+            "status": "FAILED",
+            "overall_status": "FAILED",
+            "checks": [],
+            "issues": [],
+            "error_message": f"Unexpected error: {str(e)}",
+            "processed_at": datetime.utcnow(),
+            "processing_time": 0.0,
+        }
+        await _persist_inline_validation(request_id, None, result)
+        if not inflight_jobs.abandon(content_hash, result, file_path):
+            await asyncio.get_running_loop().run_in_executor(None, storage_client.delete_file, file_path)
+        return result
+    return dict(await asyncio.shield(own))
+
+
+async def follow_inflight_job(
+    request_id: str,
+    follower: asyncio.Future,
+    content_hash: Optional[str] = None,
+    create_record: Optional[Callable[[], Any]] = None,
+    priority: str = INTERACTIVE,
+    tenant: str = DEFAULT_TENANT,
+    deadline: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Ожидает результат выполняющейся обработки того же содержимого вместо
+    собственной обработки и сохраняет его в запись request_id.
+
+    Если ведущая обработка отменена или ее дедлайн истек, запрос сам
+    ставится в очередь с файлом ведущей (priority, tenant, deadline) и
+    возвращает собственный результат.
+
+    Args:
+        request_id: ID запроса повторной загрузки
+        follower: Future из inflight_jobs.follow (см. app.worker.single_flight)
+        content_hash: SHA-256 содержимого
+        create_record: Функция создания записи запроса, если она еще не создана
+        priority: Очередь обработки на случай отмены ведущей
+        tenant: Арендатор запроса
+        deadline: Время (time.time()), после которого результат не нужен
+
+    Returns:
+        Результат в формате ValidationRequest.to_dict()
+    """
+    loop = asyncio.get_running_loop()
+    record_created = loop.run_in_executor(None, create_record) if create_record else None
+
+    try:
+        result = dict(await asyncio.shield(follower))
+    except LeaderAbandoned as e:
+        result = await _take_over_inflight_job(
+            request_id, e.file_path, content_hash, record_created, priority, tenant, deadline
+        )
+        if result.get("request_id") == request_id:
+            # Результат собственной обработки уже записан ею
+            return result
+    result["request_id"] = request_id
+    logger.info(f"Request {request_id} received coalesced result, status: {result['status']}")
+
+    task = asyncio.create_task(_persist_inline_validation(request_id, record_created, dict(result)))
+    active_tasks.add(task)
+    return result
+
+
+# --- Отмена обработки ---
+async def cancel_processing_task(request_id: str) -> Optional[str]:
+    """
+    Отменяет обработку запроса в этом процессе.
+
+    Ожидающая задача удаляется из очереди и сразу завершается со статусом
+    CANCELLED; выполняющейся задаче устанавливается флаг отмены, и она
+    прерывается перед следующей проверкой.
+
+    Returns:
+        "CANCELLED" - задача снята с очереди, "CANCELLING" - отмена запрошена,
+        None - задача не ожидает и не выполняется в этом процессе
+    """
+    job = processing_queue.remove(request_id)
+    if job is not None and "slot" in job:
+        # Inline-валидация, ожидающая слот: завершится без проверок
+        running_jobs.cancel(request_id)
+        return "CANCELLING"
+    if job is not None:
+        await abandon_image_task(
+            request_id, job["file_path"], job.get("frame"), job.get("content_hash"), "CANCELLED",
+            job.get("accepted_elsewhere", False)
+        )
+        if job.get("durable"):
+            job_queue.complete(request_id)
+        return "CANCELLED"
+    if running_jobs.cancel(request_id):
+        return "CANCELLING"
+    if durable_queue_enabled():
+        # Задача в БД, еще не арендованная ни одним процессом
+        job = await job_queue.cancel(request_id)
+        if job is not None:
+            await abandon_image_task(
+                request_id, job["file_path"], job["frame"], job["content_hash"], "CANCELLED", job["accepted_elsewhere"]
+            )
+            return "CANCELLED"
+    return None
 
 
 # --- Функции start_worker и add_processing_task ---
@@ -260,22 +746,38 @@ async def start_worker():
     logger.info("Starting image processing worker...")
     while True:
         try:
-            # Ожидаем и получаем задачу из очереди
+            # Ожидаем задачу: планировщик выдает ее только при свободном слоте
             task_data = await processing_queue.get()
             request_id = task_data.get("request_id")
             file_path = task_data.get("file_path")
+            frame = task_data.get("frame")
+            content_hash = task_data.get("content_hash")
+            deadline = task_data.get("deadline")
+            accepted_elsewhere = task_data.get("accepted_elsewhere", False)
 
+            task = None
+            if task_data.get("expired"):
+                # Дедлайн истек в очереди: задача завершается без слота и проверок
+                task = asyncio.create_task(abandon_image_task(
+                    request_id, file_path, frame, content_hash, "EXPIRED", accepted_elsewhere
+                ))
+                active_tasks.add(task)
             # Проверяем, что получили валидные данные
-            if request_id and file_path:
-                logger.info(f"Dequeued task for request: {request_id} (file: {file_path})")
+            elif request_id and file_path:
+                logger.info(f"Dequeued {task_data['priority']} task for request: {request_id} (tenant: {task_data['tenant']}, file: {file_path})")
                 # Запускаем обработку задачи в фоне (не блокируем цикл воркера)
-                task = asyncio.create_task(process_image_task(request_id, file_path))
+                task = asyncio.create_task(process_image_task(
+                    request_id, file_path, frame, content_hash, deadline, accepted_elsewhere
+                ))
+                # Слот планировщика освобождается по завершении обработки
+                task.add_done_callback(lambda _, job=task_data: processing_queue.task_done(job))
                 active_tasks.add(task)
             else:
                 logger.warning(f"Invalid task data received from queue: {task_data}")
-
-            # Отмечаем задачу как выполненную в очереди asyncio
-            processing_queue.task_done()
+                processing_queue.task_done(task_data)
+            if task is not None and task_data.get("durable"):
+                # Задача очереди в БД удаляется после завершения обработки
+                task.add_done_callback(lambda _, request_id=request_id: job_queue.complete(request_id))
 
             # Очищаем завершенные задачи
             cleanup_completed_tasks()
@@ -293,11 +795,38 @@ async def start_worker():
              await asyncio.sleep(1)
 
 
-async def add_processing_task(request_id: str, file_path: str):
+async def add_processing_task(
+    request_id: str,
+    file_path: str,
+    frame=None,
+    content_hash: Optional[str] = None,
+    priority: str = INTERACTIVE,
+    tenant: str = DEFAULT_TENANT,
+    deadline: Optional[float] = None
+):
     """
-    Добавляет задачу обработки изображения в очередь asyncio.
+    Добавляет задачу обработки изображения в очередь
+    (при JOB_QUEUE=database - в таблицу validation_jobs).
+
+    Args:
+        request_id: ID запроса
+        file_path: Путь к файлу в хранилище
+        frame: Дескриптор уже декодированного кадра (см. app.worker.frames)
+        content_hash: SHA-256 содержимого файла (для кэша результатов)
+        priority: Очередь обработки (interactive или bulk)
+        tenant: Арендатор, от имени которого поставлена задача
+        deadline: Время (time.time()), после которого результат не нужен
     """
-    # Кладем словарь с данными задачи в очередь
-    await processing_queue.put({"request_id": request_id, "file_path": file_path})
+    if durable_queue_enabled():
+        await job_queue.enqueue(request_id, file_path, frame, content_hash, priority, tenant, deadline)
+        logger.info(f"Added {priority} processing task for request: {request_id} (tenant: {tenant}) to the database queue")
+        return
+    # Кладем словарь с данными задачи в очередь приоритета и арендатора
+    processing_queue.put({
+        "request_id": request_id,
+        "file_path": file_path,
+        "frame": frame,
+        "content_hash": content_hash,
+    }, priority, tenant, deadline)
     # Логируем добавление и текущий размер очереди для мониторинга
-    logger.info(f"Added processing task for request: {request_id}, queue size now: {processing_queue.qsize()}")
\ No newline at end of file
+    logger.info(f"Added {priority} processing task for request: {request_id} (tenant: {tenant}), queue size now: {processing_queue.qsize()}")
\ No newline at end of file
@@ -0,0 +1,276 @@
+"""
+Доставка webhook с результатами валидации.
+
+Доставки берутся пачками из outbox-таблицы webhook_deliveries (строка
+добавляется в транзакции, завершающей запрос с callback_url) и отправляются
+общим httpx.AsyncClient с пулом соединений. Одновременные запросы к одному
+хосту ограничены семафором; резерв доставки берется заново после получения
+места у семафора, так что ожидание не приводит к повторной отправке другим
+процессом. Неудачные попытки повторяются с экспоненциальной
+задержкой, после WEBHOOK_MAX_ATTEMPTS доставка помечается FAILED.
+
+Хосты не из WEBHOOK_ALLOWED_HOSTS перед каждой попыткой разрешаются в DNS;
+если среди адресов есть loopback, частные, link-local или зарезервированные,
+доставка помечается FAILED, иначе соединение устанавливается с проверенным
+адресом (повторное разрешение имени не подменит его внутренним).
+"""
+import asyncio
+import ipaddress
+import random
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.api.models.validation import ValidationResult, to_result_response
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.db.repositories import WebhookDeliveryRepository
+
+logger = get_logger(__name__)
+
+# Ответы 4xx, после которых имеет смысл повторить попытку
+RETRYABLE_CLIENT_ERRORS = {408, 425, 429}
+
+
+def _lease_seconds() -> float:
+    """Резерв доставки на одну попытку (соединение, отправка и ответ) с запасом"""
+    return settings.WEBHOOK_TIMEOUT_SECONDS * 2 + 30
+
+
+class UnsafeCallbackHost(Exception):
+    """Хост callback_url указывает на внутренний адрес"""
+
+
+def is_public_address(address: str) -> bool:
+    """Адрес доступен из интернета: не loopback, частный, link-local, зарезервированный или multicast"""
+    try:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+    except ValueError:
+        return False
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def is_allowed_host(hostname: str) -> bool:
+    """Хост из WEBHOOK_ALLOWED_HOSTS: доставка без проверки адресов"""
+    return hostname.lower().rstrip(".") in settings.WEBHOOK_ALLOWED_HOSTS
+
+
+def check_callback_host(hostname: str) -> None:
+    """
+    Проверка хоста при приеме callback_url (без обращения к DNS).
+
+    Raises:
+        UnsafeCallbackHost: Хост не из списка разрешенных или заведомо внутренний
+    """
+    if settings.WEBHOOK_ALLOWED_HOSTS:
+        if not is_allowed_host(hostname):
+            raise UnsafeCallbackHost(f"Host {hostname} is not allowed")
+        return
+    host = hostname.lower().rstrip(".")
+    if host == "localhost" or host.endswith(".localhost"):
+        raise UnsafeCallbackHost(f"Host {hostname} is internal")
+    try:
+        ipaddress.ip_address(host.split("%", 1)[0])
+    except ValueError:
+        return
+    if not is_public_address(host):
+        raise UnsafeCallbackHost(f"Address {hostname} is internal")
+
+
+async def resolve_callback_host(hostname: str, port: int) -> Optional[str]:
+    """
+    Разрешает хост callback_url перед отправкой.
+
+    Returns:
+        Проверенный адрес для соединения или None для разрешенных хостов
+
+    Raises:
+        UnsafeCallbackHost: Хост разрешается во внутренний адрес
+        socket.gaierror: Имя не разрешается
+    """
+    if is_allowed_host(hostname):
+        return None
+    infos = await asyncio.get_running_loop().getaddrinfo(hostname, port, type=socket.SOCK_STREAM)
+    addresses = [info[4][0] for info in infos]
+    internal = [address for address in addresses if not is_public_address(address)]
+    if internal or not addresses:
+        raise UnsafeCallbackHost(f"Host {hostname} resolves to internal address {internal[0] if internal else None}")
+    return addresses[0]
+
+
+def build_webhook_payload(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Тело webhook: результат в формате GET /results/{id}"""
+    return ValidationResult(**to_result_response(state)).model_dump(mode="json")
+
+
+def retry_delay(attempts: int, retry_after: Optional[float] = None) -> float:
+    """
+    Задержка перед следующей попыткой: экспоненциальная с джиттером,
+    не меньше Retry-After получателя.
+    """
+    delay = min(settings.WEBHOOK_RETRY_MAX_SECONDS, settings.WEBHOOK_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    delay *= random.uniform(0.5, 1.0)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, settings.WEBHOOK_RETRY_MAX_SECONDS))
+    return delay
+
+
+def _parse_retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    if value and value.strip().isdigit():
+        return float(value)
+    return None
+
+
+class WebhookDispatcher:
+    """
+    Фоновая доставка webhook из outbox.
+    Несколько процессов могут работать одновременно: выбранные доставки
+    резервируются в БД на время попытки.
+    """
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        """
+        Args:
+            client: HTTP-клиент (по умолчанию создается при запуске)
+        """
+        self._client = client
+        self._owns_client = client is None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.WEBHOOK_MAX_CONNECTIONS
+                ),
+                follow_redirects=False
+            )
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(settings.WEBHOOK_PER_HOST_CONCURRENCY)
+        return limit
+
+    async def start(self) -> None:
+        self._get_client()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Started webhook dispatcher")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Webhook dispatch failed: {type(e).__name__}: {str(e)}")
+                claimed = 0
+            # Полная пачка - вероятно, есть еще готовые доставки
+            if claimed < settings.WEBHOOK_BATCH_SIZE:
+                await asyncio.sleep(settings.WEBHOOK_POLL_INTERVAL_SECONDS)
+
+    async def run_once(self) -> int:
+        """
+        Отправляет одну пачку готовых доставок.
+
+        Returns:
+            Количество взятых доставок
+        """
+        loop = asyncio.get_running_loop()
+        deliveries = await loop.run_in_executor(
+            None, WebhookDeliveryRepository.claim_due, settings.WEBHOOK_BATCH_SIZE, _lease_seconds()
+        )
+        results = await asyncio.gather(
+            *(self._deliver(delivery) for delivery in deliveries), return_exceptions=True
+        )
+        for delivery, result in zip(deliveries, results):
+            if isinstance(result, Exception):
+                # Доставка вернется в работу после истечения резерва
+                logger.error(f"Webhook for {delivery['request_id']} not processed: {type(result).__name__}: {str(result)}")
+        return len(deliveries)
+
+    async def _deliver(self, delivery: Dict[str, Any]) -> None:
+        loop = asyncio.get_running_loop()
+        attempts = delivery["attempts"] + 1
+        retry_after = None
+        try:
+            async with self._host_limit(delivery["url"]):
+                # Ожидание семафора хоста может превысить резерв пачки: резерв
+                # берется заново, и доставку, уже взятую другим процессом, не отправляем
+                renewed = await loop.run_in_executor(
+                    None, WebhookDeliveryRepository.renew_lease, delivery["id"], delivery["leased_until"], _lease_seconds()
+                )
+                if renewed is None:
+                    logger.warning(f"Webhook lease for {delivery['request_id']} expired while waiting, skipped")
+                    return
+                url = httpx.URL(delivery["url"])
+                headers = {
+                    "X-Request-ID": delivery["request_id"],
+                    "X-Webhook-Attempt": str(attempts),
+                }
+                extensions = {}
+                address = await resolve_callback_host(url.host, url.port or (443 if url.scheme == "https" else 80))
+                if address is not None:
+                    # Соединение с проверенным адресом; имя хоста - в Host и SNI
+                    headers["Host"] = url.netloc.decode("ascii")
+                    if url.scheme == "https":
+                        extensions["sni_hostname"] = url.host
+                    url = url.copy_with(host=address)
+                response = await self._get_client().post(
+                    url,
+                    json=build_webhook_payload(delivery["payload"]),
+                    headers=headers,
+                    extensions=extensions
+                )
+            if response.is_success:
+                await loop.run_in_executor(None, WebhookDeliveryRepository.mark_delivered, delivery["id"], attempts)
+                logger.info(f"Delivered webhook for {delivery['request_id']} (attempt {attempts})")
+                return
+            error = f"HTTP {response.status_code}"
+            retry_after = _parse_retry_after(response)
+            permanent = response.is_client_error and response.status_code not in RETRYABLE_CLIENT_ERRORS
+        except (httpx.HTTPError, socket.gaierror) as e:
+            error = f"{type(e).__name__}: {str(e)}"
+            permanent = False
+        except UnsafeCallbackHost as e:
+            error = str(e)
+            permanent = True
+        except ValueError as e:
+            # Сохраненный результат не приводится к модели ответа
+            error = f"Invalid payload: {str(e)}"
+            permanent = True
+
+        if permanent or attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+            await loop.run_in_executor(None, WebhookDeliveryRepository.mark_failed, delivery["id"], attempts, error)
+            logger.error(f"Webhook for {delivery['request_id']} failed after {attempts} attempts: {error}")
+            return
+        next_attempt_at = datetime.utcnow() + timedelta(seconds=retry_delay(attempts, retry_after))
+        await loop.run_in_executor(
+            None, WebhookDeliveryRepository.schedule_retry, delivery["id"], attempts, next_attempt_at, error
+        )
+        logger.warning(f"Webhook for {delivery['request_id']} failed ({error}), retry at {next_attempt_at.isoformat()}")
+
+
+webhook_dispatcher = WebhookDispatcher()
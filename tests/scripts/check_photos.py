@@ -26,6 +26,7 @@ DEFAULT_MAX_ATTEMPTS = 20
 DEFAULT_DELAY_SECONDS = 3
 MIN_REQUEST_DELAY = 0.1  # Минимальная задержка между запросами в секундах
 MAX_REQUEST_DELAY = 0.8  # Максимальная задержка между запросами в секундах
+RESULT_WAIT_SECONDS = 25  # Ожидание результата на сервере (GET /results/{id}?wait=)
 
 # HTML шаблоны
 HTML_HEADER = """<!DOCTYPE html>
@@ -336,7 +337,8 @@ def get_validation_result(api_url: str, request_id: str, max_attempts: int = 30,
     last_result = None
     for attempt in range(max_attempts):
         try:
-            response = requests.get(result_url, timeout=10)  # Increased timeout
+            # Long-poll: сервер отвечает сразу после завершения обработки
+            response = requests.get(result_url, params={"wait": f"{RESULT_WAIT_SECONDS}s"}, timeout=RESULT_WAIT_SECONDS + 10)
             if response.status_code == 200:
                 try:
                     result = response.json()
@@ -39,6 +39,42 @@ def mock_database():
         mock.update_error.return_value = None
         yield mock
 
+@pytest.fixture(autouse=True)
+def isolated_result_cache():
+    """Изолирует кэш результатов между тестами"""
+    from app.core.result_cache import result_cache
+    with patch('app.core.result_cache.ResultCacheRepository') as mock:
+        mock.get.return_value = None
+        result_cache.clear()
+        yield mock
+        result_cache.clear()
+
+@pytest.fixture(autouse=True)
+def isolated_inflight_jobs():
+    """Очищает реестр выполняющихся обработок между тестами"""
+    from app.worker.single_flight import inflight_jobs
+    inflight_jobs.clear()
+    yield inflight_jobs
+    inflight_jobs.clear()
+
+@pytest.fixture(autouse=True)
+def isolated_admission():
+    """Сбрасывает учет принятых обработок между тестами"""
+    from app.core.admission import admission_controller
+    admission_controller.reset()
+    yield admission_controller
+    admission_controller.reset()
+
+@pytest.fixture(autouse=True)
+def isolated_processing_queue():
+    """Пустая очередь обработки и реестр отмены для каждого теста"""
+    from app.worker.cancellation import running_jobs
+    from app.worker.scheduler import PriorityScheduler
+    running_jobs.clear()
+    with patch('app.worker.tasks.processing_queue', PriorityScheduler()) as queue:
+        yield queue
+    running_jobs.clear()
+
 @pytest.fixture
 def temp_dir():
     """Создает временную директорию для тестов"""
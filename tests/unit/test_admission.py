@@ -0,0 +1,73 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.core.admission import AdmissionController, AdmissionRejected
+
+
+class TestAdmissionController:
+    """Тесты контроля приема задач обработки"""
+
+    def test_depth_limit(self):
+        controller = AdmissionController(max_depth=2, max_megapixels=100)
+        controller.admit("a", 1)
+        controller.admit("b", 1)
+        with pytest.raises(AdmissionRejected) as error:
+            controller.admit("c", 1)
+        assert error.value.reason == "depth"
+        assert error.value.code == "QUEUE_FULL"
+
+        controller.release("a")
+        controller.admit("c", 1)
+        assert controller.depth == 2
+
+    def test_megapixel_budget(self):
+        controller = AdmissionController(max_depth=10, max_megapixels=10)
+        controller.admit("a", 6)
+        with pytest.raises(AdmissionRejected) as error:
+            controller.admit("b", 6)
+        assert error.value.reason == "megapixels"
+        controller.admit("c", 4)
+        assert controller.get_stats()["megapixels"] == 10
+
+    def test_oversized_frame_admitted_into_empty_queue(self):
+        controller = AdmissionController(max_depth=10, max_megapixels=10)
+        controller.admit("huge", 50)
+        with pytest.raises(AdmissionRejected):
+            controller.admit("small", 1)
+
+    def test_release_of_unknown_request_is_ignored(self):
+        controller = AdmissionController(max_depth=1, max_megapixels=10)
+        controller.release("unknown")
+        controller.admit("a", 1)
+        controller.release("a")
+        controller.release("a")
+        assert controller.depth == 0
+        assert controller.get_stats()["megapixels"] == 0
+
+    def test_retry_after_follows_service_rate(self):
+        controller = AdmissionController(max_depth=100, max_megapixels=1000)
+        with patch("app.core.admission.settings") as settings:
+            settings.ADMISSION_DEFAULT_RETRY_AFTER = 7
+            settings.ADMISSION_MAX_RETRY_AFTER = 120
+            assert controller.retry_after() == 7
+
+            clock = iter([0.0, 1.0, 2.0, 3.0, 4.0])
+            with patch("app.core.admission.time.monotonic", side_effect=lambda: next(clock)):
+                for name in ("a", "b", "c", "d"):
+                    controller.admit(name, 1)
+                    controller.release(name)
+                # 4 завершения за 4 с - 1 задача/с; 20 задач в очереди - 20 с
+                for index in range(20):
+                    controller.admit(f"queued-{index}", 1)
+                assert controller.retry_after() == 20
+
+    def test_stats(self):
+        controller = AdmissionController(max_depth=1, max_megapixels=10)
+        controller.admit("a", 2.5)
+        with pytest.raises(AdmissionRejected):
+            controller.admit("b", 1)
+        stats = controller.get_stats()
+        assert stats["depth"] == 1
+        assert stats["rejected"] == {"depth": 1}
+        assert stats["rejected_total"] == 1
@@ -1,9 +1,11 @@
 import pytest
 import asyncio
+import time
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
 import tempfile
 import os
+import zipfile
 from io import BytesIO
 from PIL import Image
 import cv2
@@ -11,7 +13,11 @@ import numpy as np
 
 from app.api.main import app
 from app.db.repositories import ValidationRequestRepository
+from app.core.config import settings
 from app.storage.client import storage_client
+from app.core.notifications import result_notifier
+from app.core.result_cache import NearDuplicate
+from app.worker.idempotency import sweep_expired_keys
 
 client = TestClient(app)
 
@@ -69,6 +75,20 @@ class TestHealthEndpoints:
         assert "status" in data
         assert "metrics" in data
 
+    def test_cors_preflight(self):
+        """Браузерный клиент может отменять обработку и передавать заголовки API"""
+        response = client.options(
+            "/api/v1/results/req-1",
+            headers={
+                "Origin": settings.ALLOWED_ORIGINS[0],
+                "Access-Control-Request-Method": "DELETE",
+                "Access-Control-Request-Headers": "Idempotency-Key, X-Filename, X-Tenant-ID, X-Deadline-Ms",
+            }
+        )
+        assert response.status_code == 200
+        assert "DELETE" in response.headers["access-control-allow-methods"]
+        assert "Idempotency-Key" in response.headers["access-control-allow-headers"]
+
 class TestValidationEndpoints:
     """Тесты для валидации изображений"""
     
@@ -126,6 +146,259 @@ class TestValidationEndpoints:
         assert response.status_code == 400
         assert "format" in response.json()["detail"].lower()
     
+    @patch('app.api.endpoints.validation.settings')
+    def test_validate_too_large_file(self, mock_settings, sample_jpeg_image):
+        """Тест отклонения слишком большого файла с кодом 413"""
+        mock_settings.MAX_FILE_SIZE_BYTES = 1024
+        response = client.post(
+            "/api/v1/validate",
+            files={"file": ("test.jpg", sample_jpeg_image, "image/jpeg")}
+        )
+        
+        assert response.status_code == 413
+    
+    @patch.object(ValidationRequestRepository, 'create')
+    @patch.object(storage_client, 'save_file')
+    def test_validate_raw_success(self, mock_save, mock_create, sample_jpeg_image):
+        """Тест загрузки изображения телом запроса без multipart"""
+        response = client.post(
+            "/api/v1/validate/raw",
+            content=sample_jpeg_image,
+            headers={"Content-Type": "image/jpeg", "X-Filename": "%D1%84%D0%BE%D1%82%D0%BE.jpg"}
+        )
+        
+        assert response.status_code == 202
+        assert "requestId" in response.json()
+        assert mock_create.call_args.kwargs["filename"] == "фото.jpg"
+        assert mock_create.call_args.kwargs["file_size"] == len(sample_jpeg_image)
+    
+    def test_validate_raw_requires_filename(self, sample_jpeg_image):
+        """Тест загрузки телом запроса без имени файла"""
+        response = client.post(
+            "/api/v1/validate/raw",
+            content=sample_jpeg_image,
+            headers={"Content-Type": "application/octet-stream"}
+        )
+        
+        assert response.status_code == 400
+    
+    def test_validate_raw_unsupported_media_type(self, sample_jpeg_image):
+        """Тест отклонения тела с неподходящим Content-Type"""
+        response = client.post(
+            "/api/v1/validate/raw",
+            content=sample_jpeg_image,
+            headers={"Content-Type": "text/plain", "X-Filename": "test.jpg"}
+        )
+        
+        assert response.status_code == 415
+    
+    @patch('app.api.endpoints.validation.add_processing_task')
+    @patch.object(ValidationRequestRepository, 'create')
+    @patch.object(storage_client, 'save_file')
+    def test_validate_cached_result(self, mock_save, mock_create, mock_add, sample_jpeg_image):
+        """Тест повторной загрузки файла с уже известным результатом"""
+        cached = {"overall_status": "APPROVED", "checks": [], "issues": []}
+        with patch('app.api.endpoints.validation.result_cache.get', return_value=cached):
+            response = client.post(
+                "/api/v1/validate",
+                files={"file": ("test.jpg", sample_jpeg_image, "image/jpeg")}
+            )
+        
+        assert response.status_code == 202
+        assert mock_create.call_args.kwargs["status"] == "COMPLETED"
+        assert mock_create.call_args.kwargs["overall_status"] == "APPROVED"
+        mock_save.assert_not_called()
+        mock_add.assert_not_called()
+    
+    @patch('app.api.endpoints.validation.add_processing_task')
+    @patch.object(ValidationRequestRepository, 'create')
+    @patch.object(storage_client, 'save_file')
+    def test_validate_near_duplicate_reuse(self, mock_save, mock_create, mock_add, sample_jpeg_image):
+        """Тест повторного использования результата пересжатой копии"""
+        near = NearDuplicate(
+            content_hash="a" * 64,
+            distance=2,
+            result={"overall_status": "REJECTED", "checks": [], "issues": ["blurry"]}
+        )
+        with patch('app.api.endpoints.validation.result_cache.find_similar', return_value=near):
+            response = client.post(
+                "/api/v1/validate?near_duplicates=reuse",
+                files={"file": ("test.jpg", sample_jpeg_image, "image/jpeg")}
+            )
+        
+        assert response.status_code == 202
+        assert response.json()["nearDuplicate"] == {"contentHash": "a" * 64, "distance": 2, "reused": True}
+        assert mock_create.call_args.kwargs["overall_status"] == "REJECTED"
+        mock_add.assert_not_called()
+    
+    @patch('app.api.endpoints.validation.add_processing_task')
+    @patch.object(ValidationRequestRepository, 'create')
+    @patch.object(storage_client, 'save_file')
+    def test_validate_near_duplicate_flag(self, mock_save, mock_create, mock_add, sample_jpeg_image):
+        """Тест отметки пересжатой копии с обычной обработкой"""
+        near = NearDuplicate(content_hash="a" * 64, distance=2, result={"overall_status": "APPROVED", "checks": [], "issues": []})
+        with patch('app.api.endpoints.validation.result_cache.find_similar', return_value=near):
+            response = client.post(
+                "/api/v1/validate?near_duplicates=flag",
+                files={"file": ("test.jpg", sample_jpeg_image, "image/jpeg")}
+            )
+        
+        assert response.status_code == 202
+        assert response.json()["nearDuplicate"]["reused"] is False
+        mock_add.assert_called_once()
+    
+    @patch('app.api.endpoints.validation.follow_inflight_job')
+    @patch('app.api.endpoints.validation.add_processing_task')
+    @patch.object(ValidationRequestRepository, 'create')
+    @patch.object(storage_client, 'save_file')
+    def test_validate_concurrent_duplicate(self, mock_save, mock_create, mock_add, mock_follow, sample_jpeg_image):
+        """Тест повторной загрузки, пока первая еще обрабатывается"""
+        first = client.post("/api/v1/validate", files={"file": ("test.jpg", sample_jpeg_image, "image/jpeg")})
+        second = client.post("/api/v1/validate", files={"file": ("again.jpg", sample_jpeg_image, "image/jpeg")})
+        
+        assert first.status_code == 202 and second.status_code == 202
+        assert mock_add.call_count == 1
+        assert mock_save.call_count == 1
+        assert mock_follow.call_args[0][0] == second.json()["requestId"]
+    
+    @patch('app.api.endpoints.validation.add_processing_task')
+    @patch.object(ValidationRequestRepository, 'create')
+    @patch.object(storage_client, 'save_file')
+    def test_validate_with_callback_url(self, mock_save, mock_create, mock_add, sample_jpeg_image):
+        """Тест загрузки с URL для webhook"""
+        response = client.post(
+            "/api/v1/validate",
+            files={"file": ("test.jpg", sample_jpeg_image, "image/jpeg")},
+            data={"callback_url": "https://client.example.com/hooks/photo"}
+        )
+        
+        assert response.status_code == 202
+        assert mock_create.call_args.kwargs["callback_url"] == "https://client.example.com/hooks/photo"
+        
+        response = client.post(
+            "/api/v1/validate",
+            files={"file": ("test.jpg", sample_jpeg_image, "image/jpeg")},
+            data={"callback_url": "ftp://client.example.com/hooks"}
+        )
+        assert response.status_code == 400
+        
+        for internal in ("http://127.0.0.1:8080/hook", "http://169.254.169.254/latest", "http://[::1]/hook", "http://localhost/hook"):
+            response = client.post(
+                "/api/v1/validate",
+                files={"file": ("test.jpg", sample_jpeg_image, "image/jpeg")},
+                data={"callback_url": internal}
+            )
+            assert response.status_code == 400
+    
+    @patch('app.api.endpoints.validation.add_processing_task')
+    @patch.object(ValidationRequestRepository, 'create')
+    @patch.object(storage_client, 'save_file')
+    def test_validate_priority(self, mock_save, mock_create, mock_add, sample_jpeg_image, sample_png_image):
+        """Тест выбора очереди обработки полем запроса и ключом API"""
+        response = client.post("/api/v1/validate", files={"file": ("a.jpg", sample_jpeg_image, "image/jpeg")})
+        assert response.status_code == 202
+        assert mock_add.call_args.kwargs["priority"] == "interactive"
+        
+        with patch.dict(settings.PRIORITY_API_KEYS, {"import-key": "bulk"}):
+            response = client.post(
+                "/api/v1/validate",
+                files={"file": ("b.png", sample_png_image, "image/png")},
+                headers={"X-API-Key": "import-key"}
+            )
+        assert response.status_code == 202
+        assert mock_add.call_args.kwargs["priority"] == "bulk"
+        
+        response = client.post(
+            "/api/v1/validate",
+            files={"file": ("a.jpg", sample_jpeg_image, "image/jpeg")},
+            data={"priority": "urgent"}
+        )
+        assert response.status_code == 422
+    
+    @patch('app.api.endpoints.validation.add_processing_task')
+    @patch.object(ValidationRequestRepository, 'create')
+    @patch.object(storage_client, 'save_file')
+    def test_validate_tenant(self, mock_save, mock_create, mock_add, sample_jpeg_image, sample_png_image):
+        """Тест выбора арендатора заголовком и ключом API"""
+        response = client.post(
+            "/api/v1/validate",
+            files={"file": ("a.jpg", sample_jpeg_image, "image/jpeg")},
+            headers={"X-Tenant-ID": "acme"}
+        )
+        assert response.status_code == 202
+        assert mock_add.call_args.kwargs["tenant"] == "acme"
+        
+        with patch.dict(settings.TENANT_API_KEYS, {"globex-key": "globex"}):
+            response = client.post(
+                "/api/v1/validate",
+                files={"file": ("b.png", sample_png_image, "image/png")},
+                headers={"X-API-Key": "globex-key"}
+            )
+        assert response.status_code == 202
+        assert mock_add.call_args.kwargs["tenant"] == "globex"
+        
+        response = client.post(
+            "/api/v1/validate",
+            files={"file": ("a.jpg", sample_jpeg_image, "image/jpeg")},
+            headers={"X-Tenant-ID": "bad tenant/../"}
+        )
+        assert response.status_code == 400
+    
+    @patch('app.api.endpoints.validation.add_processing_task')
+    @patch.object(ValidationRequestRepository, 'create')
+    @patch.object(storage_client, 'save_file')
+    def test_validate_deadline(self, mock_save, mock_create, mock_add, sample_jpeg_image):
+        """Тест передачи дедлайна обработки из заголовка X-Deadline-Ms"""
+        before = time.time()
+        response = client.post(
+            "/api/v1/validate",
+            files={"file": ("a.jpg", sample_jpeg_image, "image/jpeg")},
+            headers={"X-Deadline-Ms": "30000"}
+        )
+        
+        assert response.status_code == 202
+        deadline = mock_add.call_args.kwargs["deadline"]
+        assert before + 30 <= deadline <= time.time() + 30
+        
+        response = client.post(
+            "/api/v1/validate",
+            files={"file": ("a.jpg", sample_jpeg_image, "image/jpeg")},
+            headers={"X-Deadline-Ms": "0"}
+        )
+        assert response.status_code == 422
+    
+    @patch('app.api.endpoints.validation.add_processing_task')
+    @patch.object(ValidationRequestRepository, 'create')
+    @patch.object(storage_client, 'save_file')
+    def test_validate_queue_full(self, mock_save, mock_create, mock_add, isolated_admission, sample_jpeg_image, sample_png_image):
+        """Тест отказа при заполненной очереди обработки"""
+        with patch.object(isolated_admission, 'max_depth', 1):
+            first = client.post("/api/v1/validate", files={"file": ("a.jpg", sample_jpeg_image, "image/jpeg")})
+            second = client.post("/api/v1/validate", files={"file": ("b.png", sample_png_image, "image/png")})
+        
+        assert first.status_code == 202
+        assert second.status_code == 503
+        assert second.json()["code"] == "QUEUE_FULL"
+        assert int(second.headers["Retry-After"]) >= 1
+        assert mock_create.call_count == 1 and mock_save.call_count == 1
+        assert isolated_admission.get_stats()["rejected"] == {"depth": 1}
+    
+    @patch('app.api.endpoints.validation.add_processing_task', side_effect=RuntimeError("queue down"))
+    @patch.object(ValidationRequestRepository, 'update_error')
+    @patch.object(ValidationRequestRepository, 'create')
+    @patch.object(storage_client, 'delete_file')
+    @patch.object(storage_client, 'save_file')
+    def test_validate_enqueue_failure_deletes_file(
+        self, mock_save, mock_delete, mock_create, mock_update_error, mock_add, isolated_admission, sample_jpeg_image
+    ):
+        """Тест удаления сохраненного файла, если задачу не удалось поставить в очередь"""
+        response = client.post("/api/v1/validate", files={"file": ("a.jpg", sample_jpeg_image, "image/jpeg")})
+        
+        assert response.status_code == 500
+        mock_delete.assert_called_once_with(mock_save.call_args.args[0])
+        assert mock_update_error.call_args.args[0] == mock_create.call_args.args[0]
+        assert isolated_admission.depth == 0
+    
     def test_validate_no_file(self):
         """Тест запроса без файла"""
         response = client.post("/api/v1/validate")
@@ -140,6 +413,152 @@ class TestValidationEndpoints:
         
         assert response.status_code == 422  # FastAPI validation error for empty filename
 
+class TestSyncValidationEndpoint:
+    """Тесты для синхронной валидации"""
+    
+    @patch.object(ValidationRequestRepository, 'update_result')
+    @patch.object(ValidationRequestRepository, 'create')
+    @patch('app.worker.tasks.check_config.get_enabled_checks', return_value=[])
+    @patch('app.worker.tasks.CheckRunner.run_checks')
+    def test_validate_sync_returns_result(self, mock_run, mock_enabled, mock_create, mock_update, sample_jpeg_image):
+        """Тест получения результата в ответе на загрузку"""
+        mock_run.return_value = {"overall_status": "APPROVED", "checks": [], "issues": []}
+        
+        response = client.post(
+            "/api/v1/validate/sync",
+            files={"file": ("test.jpg", sample_jpeg_image, "image/jpeg")}
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "COMPLETED"
+        assert data["overallStatus"] == "APPROVED"
+        assert "requestId" in data
+    
+    @patch.object(ValidationRequestRepository, 'update_result')
+    @patch.object(ValidationRequestRepository, 'create')
+    @patch('app.worker.tasks.check_config.get_enabled_checks', return_value=[])
+    @patch('app.worker.tasks.CheckRunner.run_checks')
+    def test_validate_sync_deadline_fallback(self, mock_run, mock_enabled, mock_create, mock_update, sample_jpeg_image):
+        """Тест возврата requestId при превышении дедлайна"""
+        async def slow_checks(*args, **kwargs):
+            await asyncio.sleep(0.2)
+            return {"overall_status": "APPROVED", "checks": [], "issues": []}
+        mock_run.side_effect = slow_checks
+        
+        response = client.post(
+            "/api/v1/validate/sync?timeout_ms=10",
+            files={"file": ("test.jpg", sample_jpeg_image, "image/jpeg")}
+        )
+        
+        assert response.status_code == 202
+        assert "requestId" in response.json()
+    
+    @patch('app.api.endpoints.validation.decode_upload', side_effect=RuntimeError("decoder crashed"))
+    def test_validate_sync_error_releases_admission(self, mock_decode, isolated_admission, sample_jpeg_image):
+        """Тест освобождения места в очереди при неожиданной ошибке"""
+        response = client.post(
+            "/api/v1/validate/sync",
+            files={"file": ("test.jpg", sample_jpeg_image, "image/jpeg")}
+        )
+        
+        assert response.status_code == 500
+        mock_decode.assert_called_once()
+        assert isolated_admission.depth == 0
+
+class TestBatchEndpoints:
+    """Тесты для пакетной загрузки"""
+    
+    @patch('app.api.endpoints.validation.add_processing_task')
+    @patch.object(ValidationRequestRepository, 'create_many')
+    @patch.object(storage_client, 'save_file')
+    def test_validate_batch_files_and_archive(self, mock_save, mock_create_many, mock_add, sample_jpeg_image, sample_png_image):
+        """Тест пакетной загрузки файлов и ZIP-архива"""
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("photos/inner.jpg", sample_jpeg_image)
+            zf.writestr("photos/readme.txt", b"not an image")
+            zf.writestr("__MACOSX/photos/._inner.jpg", b"metadata")
+        
+        response = client.post(
+            "/api/v1/validate/batch",
+            files=[
+                ("files", ("a.jpg", sample_jpeg_image, "image/jpeg")),
+                ("files", ("b.png", sample_png_image, "image/png")),
+                ("files", ("photos.zip", archive.getvalue(), "application/zip")),
+            ]
+        )
+        
+        assert response.status_code == 202
+        data = response.json()
+        assert "batchId" in data
+        assert [item["filename"] for item in data["items"]] == ["a.jpg", "b.png", "photos/inner.jpg", "photos/readme.txt"]
+        assert data["items"][3]["code"] == "INVALID_FILE_FORMAT"
+        
+        mock_create_many.assert_called_once()
+        records = mock_create_many.call_args[0][0]
+        assert [record["status"] for record in records] == ["PENDING", "PENDING", "PENDING", "FAILED"]
+        assert {record["batch_id"] for record in records} == {data["batchId"]}
+        # photos/inner.jpg duplicates a.jpg and waits for its processing
+        assert mock_add.call_count == 2
+        assert mock_save.call_count == 2
+        assert mock_add.call_args.kwargs["priority"] == "bulk"
+    
+    @patch('app.api.endpoints.validation.add_processing_task')
+    @patch.object(ValidationRequestRepository, 'create_many')
+    @patch.object(storage_client, 'save_file')
+    def test_validate_batch_larger_than_queue_depth(self, mock_save, mock_create_many, mock_add, isolated_admission, sample_jpeg_image):
+        """Пакет больше глубины очереди принимается целиком и не занимает мест admission control"""
+        images = []
+        for color in ('red', 'green', 'blue', 'white', 'black'):
+            img_bytes = BytesIO()
+            Image.new('RGB', (800, 600), color=color).save(img_bytes, format='JPEG')
+            images.append(img_bytes.getvalue())
+        with patch.object(isolated_admission, 'max_depth', 2):
+            response = client.post(
+                "/api/v1/validate/batch",
+                files=[("files", (f"{i}.jpg", image, "image/jpeg")) for i, image in enumerate(images)]
+            )
+            assert response.status_code == 202
+            assert mock_add.call_count == 5
+            assert isolated_admission.depth == 0
+            
+            # Заполненная очередь отклоняет пакет целиком, до чтения файлов
+            isolated_admission.admit("req-1", 1.0)
+            isolated_admission.admit("req-2", 1.0)
+            response = client.post("/api/v1/validate/batch", files=[("files", ("a.jpg", sample_jpeg_image, "image/jpeg"))])
+            assert response.status_code == 503
+            assert mock_save.call_count == 5
+    
+    @patch.object(ValidationRequestRepository, 'get_by_batch_id')
+    def test_get_batch_result(self, mock_get):
+        """Тест сводного результата пакета"""
+        items = []
+        for request_id, status_value, overall in [("r1", "COMPLETED", "APPROVED"), ("r2", "COMPLETED", "REJECTED"), ("r3", "PENDING", None)]:
+            item = MagicMock()
+            item.request_id = request_id
+            item.filename = f"{request_id}.jpg"
+            item.status = status_value
+            item.overall_status = overall
+            item.error_message = None
+            items.append(item)
+        mock_get.return_value = items
+        
+        response = client.get("/api/v1/results/batch/batch-1")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 3
+        assert data["completed"] is False
+        assert data["statusCounts"] == {"COMPLETED": 2, "PENDING": 1}
+        assert data["overallStatusCounts"] == {"APPROVED": 1, "REJECTED": 1}
+    
+    @patch.object(ValidationRequestRepository, 'get_by_batch_id', return_value=[])
+    def test_get_batch_result_not_found(self, mock_get):
+        """Тест запроса несуществующего пакета"""
+        response = client.get("/api/v1/results/batch/unknown")
+        assert response.status_code == 404
+
 class TestResultsEndpoints:
     """Тесты для получения результатов валидации"""
     
@@ -195,4 +614,204 @@ class TestResultsEndpoints:
         mock_get.return_value = None
         
         response = client.get("/api/v1/results/nonexistent-id")
-        assert response.status_code == 404 
\ No newline at end of file
+        assert response.status_code == 404 
+    
+    @staticmethod
+    def _state(status, **fields):
+        return {
+            "request_id": "test-id",
+            "status": status,
+            "processed_at": None,
+            "processing_time": None,
+            "created_at": "2023-01-01T00:00:00",
+            **fields
+        }
+    
+    def _pending_then_completed(self, mock_get):
+        """Запись в БД еще обрабатывается, результат публикуется сразу после чтения"""
+        completed = self._state("COMPLETED", overall_status="APPROVED", checks=[], processing_time=0.5)
+        
+        def get_by_id(request_id):
+            result_notifier.publish(request_id, self._state("PROCESSING"))
+            result_notifier.publish(request_id, completed)
+            mock_record = MagicMock()
+            mock_record.to_dict.return_value = self._state("PENDING")
+            return mock_record
+        mock_get.side_effect = get_by_id
+    
+    @patch.object(ValidationRequestRepository, 'get_by_id')
+    def test_get_results_long_poll(self, mock_get):
+        """Тест ожидания результата (?wait=)"""
+        self._pending_then_completed(mock_get)
+        
+        response = client.get("/api/v1/results/test-id?wait=5s")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "COMPLETED"
+        assert data["overallStatus"] == "APPROVED"
+        assert result_notifier.subscriber_count() == 0
+    
+    @patch.object(ValidationRequestRepository, 'get_by_id')
+    def test_get_results_long_poll_timeout(self, mock_get):
+        """Тест истечения ожидания результата"""
+        mock_record = MagicMock()
+        mock_record.to_dict.return_value = self._state("PENDING")
+        mock_get.return_value = mock_record
+        
+        response = client.get("/api/v1/results/test-id?wait=50ms")
+        assert response.status_code == 200
+        assert response.json()["status"] == "PENDING"
+        
+        response = client.get("/api/v1/results/test-id?wait=soon")
+        assert response.status_code == 400
+    
+    @patch.object(ValidationRequestRepository, 'get_by_id')
+    def test_result_events(self, mock_get):
+        """Тест получения результата через server-sent events"""
+        self._pending_then_completed(mock_get)
+        
+        response = client.get("/api/v1/results/test-id/events")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+        assert [lines[0] for lines in events] == ["event: status", "event: status", "event: result"]
+        assert '"status":"COMPLETED"' in events[-1][1]
+        assert result_notifier.subscriber_count() == 0
+    
+    @patch.object(ValidationRequestRepository, 'get_by_id')
+    def test_result_events_not_found(self, mock_get):
+        """Тест потока событий для несуществующего запроса"""
+        mock_get.return_value = None
+        
+        response = client.get("/api/v1/results/nonexistent-id/events")
+        assert response.status_code == 404
+        assert result_notifier.subscriber_count() == 0
+
+
+class FakeIdempotencyKeys:
+    """Ключи идемпотентности в памяти вместо таблицы idempotency_keys"""
+    
+    def __init__(self):
+        self.keys = {}
+    
+    def claim(self, key_hash, request_id, ttl_seconds):
+        if key_hash in self.keys:
+            return self.keys[key_hash]
+        self.keys[key_hash] = request_id
+        return None
+    
+    def release(self, key_hash, request_id):
+        if self.keys.get(key_hash) == request_id:
+            del self.keys[key_hash]
+
+
+class TestIdempotencyKeys:
+    """Тесты повторных загрузок с заголовком Idempotency-Key"""
+    
+    @pytest.fixture(autouse=True)
+    def idempotency_keys(self):
+        keys = FakeIdempotencyKeys()
+        with patch('app.api.endpoints.validation.IdempotencyKeyRepository', keys):
+            yield keys
+    
+    @patch('app.api.endpoints.validation.add_processing_task')
+    @patch.object(ValidationRequestRepository, 'create')
+    @patch.object(storage_client, 'save_file')
+    def test_repeated_key_returns_original(self, mock_save, mock_create, mock_add, sample_jpeg_image, sample_png_image):
+        headers = {"Idempotency-Key": "order-1842"}
+        files = {"file": ("a.jpg", sample_jpeg_image, "image/jpeg")}
+        
+        first = client.post("/api/v1/validate", files=files, headers=headers)
+        second = client.post("/api/v1/validate", files=files, headers=headers)
+        
+        assert first.status_code == second.status_code == 202
+        assert second.json()["requestId"] == first.json()["requestId"]
+        assert second.headers["Idempotent-Replayed"] == "true"
+        assert mock_save.call_count == mock_create.call_count == mock_add.call_count == 1
+        
+        # Ключ действует только в пределах арендатора
+        other = client.post(
+            "/api/v1/validate",
+            files={"file": ("b.png", sample_png_image, "image/png")},
+            headers={**headers, "X-Tenant-ID": "other"}
+        )
+        assert other.json()["requestId"] != first.json()["requestId"]
+        assert mock_add.call_count == 2
+    
+    @patch('app.api.endpoints.validation.add_processing_task')
+    @patch.object(ValidationRequestRepository, 'create')
+    @patch.object(storage_client, 'save_file')
+    def test_rejected_upload_releases_key(self, mock_save, mock_create, mock_add, idempotency_keys, small_image, sample_jpeg_image):
+        headers = {"Idempotency-Key": "order-1842"}
+        
+        rejected = client.post(
+            "/api/v1/validate", files={"file": ("a.jpg", small_image, "image/jpeg")}, headers=headers
+        )
+        assert rejected.status_code == 400
+        assert idempotency_keys.keys == {}
+        
+        retried = client.post(
+            "/api/v1/validate", files={"file": ("a.jpg", sample_jpeg_image, "image/jpeg")}, headers=headers
+        )
+        assert retried.status_code == 202
+        assert "Idempotent-Replayed" not in retried.headers
+        mock_add.assert_called_once()
+    
+    def test_invalid_key(self, sample_jpeg_image):
+        response = client.post(
+            "/api/v1/validate",
+            files={"file": ("a.jpg", sample_jpeg_image, "image/jpeg")},
+            headers={"Idempotency-Key": "k" * 256}
+        )
+        assert response.status_code == 400
+    
+    @patch('app.worker.idempotency.IdempotencyKeyRepository')
+    def test_sweep_deletes_in_batches(self, mock_repository):
+        mock_repository.delete_expired.side_effect = [settings.IDEMPOTENCY_SWEEP_BATCH_SIZE, 3]
+        
+        assert asyncio.run(sweep_expired_keys()) == settings.IDEMPOTENCY_SWEEP_BATCH_SIZE + 3
+        assert mock_repository.delete_expired.call_count == 2
+
+
+class TestCancelEndpoint:
+    """Тесты отмены обработки"""
+    
+    def _request(self, status_value):
+        db_request = MagicMock()
+        db_request.status = status_value
+        return db_request
+    
+    @patch('app.api.endpoints.validation.cancel_processing_task', return_value="CANCELLED")
+    @patch.object(ValidationRequestRepository, 'get_by_id')
+    def test_cancel_queued(self, mock_get, mock_cancel):
+        mock_get.return_value = self._request("PENDING")
+        
+        response = client.delete("/api/v1/results/req-1")
+        
+        assert response.status_code == 200
+        assert response.json() == {"requestId": "req-1", "status": "CANCELLED"}
+        mock_cancel.assert_called_once_with("req-1")
+    
+    @patch('app.api.endpoints.validation.cancel_processing_task', return_value="CANCELLING")
+    @patch.object(ValidationRequestRepository, 'get_by_id')
+    def test_cancel_running(self, mock_get, mock_cancel):
+        mock_get.return_value = self._request("PROCESSING")
+        
+        response = client.delete("/api/v1/results/req-1")
+        
+        assert response.status_code == 202
+        assert response.json()["status"] == "CANCELLING"
+    
+    @patch('app.api.endpoints.validation.cancel_processing_task')
+    @patch.object(ValidationRequestRepository, 'get_by_id')
+    def test_cancel_finished_or_unknown(self, mock_get, mock_cancel):
+        mock_get.return_value = self._request("COMPLETED")
+        assert client.delete("/api/v1/results/req-1").status_code == 409
+        mock_cancel.assert_not_called()
+        
+        mock_get.return_value = self._request("PENDING")
+        mock_cancel.return_value = None
+        assert client.delete("/api/v1/results/req-1").status_code == 409
+        
+        mock_get.return_value = None
+        assert client.delete("/api/v1/results/req-1").status_code == 404
@@ -1,3 +1,7 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 import numpy as np
 import cv2
@@ -76,6 +80,21 @@ class TestBlurrinessCheck:
         assert result["status"] == "FAILED"
         assert "размыто" in result["reason"].lower()
     
+    def test_uses_full_resolution_face_region(self, sharp_image):
+        """Test face region is taken from full resolution when working image is reduced."""
+        check = BlurrinessCheck()
+        reduced = cv2.resize(sharp_image, (150, 100), interpolation=cv2.INTER_AREA)
+        context = {
+            "face": {"bbox": [25, 25, 50, 50]},
+            "analysis_scale": 4,
+            "full_resolution": lambda: sharp_image
+        }
+        result = check.run(reduced, context)
+        assert result["status"] == "PASSED"
+        assert result["details"]["laplacian_variance"] == BlurrinessCheck().run(
+            sharp_image, {"face": {"bbox": [100, 100, 200, 200]}}
+        )["details"]["laplacian_variance"]
+    
     def test_no_face_context_skipped(self, sharp_image):
         """Test check skipped without face context."""
         check = BlurrinessCheck()
@@ -181,4 +200,133 @@ class TestCheckRunner:
             result = await runner.run_checks(color_image, context)
             
             # System should handle error correctly
-            assert "overall_status" in result 
\ No newline at end of file
+            assert "overall_status" in result 
+
+class TestCheckGraph:
+    """Tests for dependency-driven check scheduling."""
+    
+    def _runner(self, checks, max_parallel=4):
+        """Runner over fake checks: {check_id: (requires, provides, duration)}."""
+        events = []
+        
+        def make_check(check_id, duration):
+            class FakeCheck:
+                def __init__(self, **params):
+                    pass
+                
+                def run(self, image, context):
+                    events.append(("start", check_id))
+                    time.sleep(duration)
+                    events.append(("end", check_id))
+                    return {"status": "PASSED", "reason": None, "details": None}
+            return FakeCheck
+        
+        config = MagicMock()
+        config.get_system_config.return_value = {"max_parallel_checks": max_parallel}
+        config.get_enabled_checks.return_value = list(checks)
+        config.get_check_params.return_value = {}
+        classes = {check_id: make_check(check_id, spec[2]) for check_id, spec in checks.items()}
+        metadata = {
+            check_id: MagicMock(requires=spec[0], provides=spec[1]) for check_id, spec in checks.items()
+        }
+        patches = (
+            patch('app.cv.checks.runner.check_registry.get_check', side_effect=classes.get),
+            patch('app.cv.checks.runner.check_registry.get_metadata', side_effect=metadata.get),
+            # The check pool is sized by CPU count; give the test enough threads
+            patch('app.cv.checks.runner.check_executor', MagicMock(executor=ThreadPoolExecutor(max_workers=8))),
+        )
+        return CheckRunner(config), events, patches
+    
+    def test_registry_graph(self):
+        """Face checks wait for face_count, image-global checks do not."""
+        runner = CheckRunner()
+        graph = runner._build_graph(["face_count", "face_pose", "blurriness", "lighting", "color_mode", "real_photo"])
+        
+        assert graph["face_pose"] == {"face_count"}
+        assert graph["blurriness"] == {"face_count"}
+        assert graph["lighting"] == graph["color_mode"] == graph["real_photo"] == set()
+    
+    def test_global_checks_overlap_face_detection(self, color_image):
+        runner, events, patches = self._runner({
+            "face_count": ([], ["face"], 0.1),
+            "face_pose": (["face"], [], 0.0),
+            "lighting": ([], [], 0.0),
+        })
+        with patches[0], patches[1], patches[2]:
+            result = asyncio.run(runner.run_checks(color_image, {}))
+        
+        assert events.index(("end", "lighting")) < events.index(("end", "face_count"))
+        assert events.index(("start", "face_pose")) > events.index(("end", "face_count"))
+        # Results keep check_order regardless of completion order
+        assert [check["check"] for check in result["checks"]] == ["face_count", "face_pose", "lighting"]
+    
+    def test_parallelism_limit(self, color_image):
+        runner, events, patches = self._runner(
+            {f"check_{i}": ([], [], 0.02) for i in range(4)}, max_parallel=2
+        )
+        with patches[0], patches[1], patches[2]:
+            asyncio.run(runner.run_checks(color_image, {}))
+        
+        active = max_active = 0
+        for kind, _ in events:
+            active += 1 if kind == "start" else -1
+            max_active = max(max_active, active)
+        assert max_active == 2
+
+class TestCheckPlan:
+    """Tests for check instances reused across requests."""
+    
+    def _runner(self, check_ids):
+        created = []
+        
+        class FakeCheck:
+            def __init__(self, **params):
+                created.append(params)
+                if params.get("invalid"):
+                    raise ValueError("invalid parameters")
+            
+            def run(self, image, context):
+                return {"status": "PASSED", "reason": None, "details": None}
+        
+        config = MagicMock()
+        config.get_system_config.return_value = {}
+        config.get_enabled_checks.return_value = list(check_ids)
+        config.get_check_params.return_value = {}
+        patches = (
+            patch('app.cv.checks.runner.check_registry.get_check', return_value=FakeCheck),
+            patch('app.cv.checks.runner.check_registry.get_metadata', return_value=None),
+        )
+        return CheckRunner(config), config, created, patches
+    
+    def test_checks_are_created_once(self, color_image):
+        runner, config, created, patches = self._runner(["lighting", "color_mode"])
+        with patches[0], patches[1]:
+            for _ in range(3):
+                result = asyncio.run(runner.run_checks(color_image, {}))
+        
+        assert len(created) == 2
+        assert result["overall_status"] == "APPROVED"
+    
+    def test_rebuild_swaps_plan(self):
+        runner, config, created, patches = self._runner(["lighting"])
+        with patches[0], patches[1]:
+            plan = runner.plan
+            config.get_check_params.return_value = {"threshold": 5}
+            runner.on_config_change(None, None)
+            
+            assert runner.plan is not plan
+            assert created[-1] == {"threshold": 5}
+            
+            # Invalid parameters keep the previous plan
+            rebuilt = runner.plan
+            config.get_check_params.return_value = {"invalid": True}
+            runner.rebuild()
+            assert runner.plan is rebuilt
+    
+    def test_enabled_checks_change_rebuilds_plan(self):
+        runner, config, created, patches = self._runner(["lighting"])
+        with patches[0], patches[1]:
+            assert list(runner.plan.checks) == ["lighting"]
+            config.get_enabled_checks.return_value = ["lighting", "color_mode"]
+            
+            assert list(runner.plan.checks) == ["lighting", "color_mode"]
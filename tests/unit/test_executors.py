@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import cv2
+
+from app.core.executors import BoundedExecutor, CheckExecutor, plan_check_threads, run_blocking
+from app.core.monitoring import PerformanceMonitor, monitor_event_loop_lag, performance_monitor
+
+
+class TestBoundedExecutor:
+    """Тесты выделенного пула для блокирующих этапов"""
+
+    def test_runs_off_event_loop_and_records_stage(self):
+        async def run():
+            loop_thread = threading.current_thread().name
+            worker_thread = await run_blocking("test_stage", lambda: threading.current_thread().name)
+            return loop_thread, worker_thread
+
+        loop_thread, worker_thread = asyncio.run(run())
+        assert worker_thread != loop_thread
+        assert worker_thread.startswith("ingest")
+        assert performance_monitor.get_stage_stats()["test_stage"]["count"] >= 1
+
+    def test_pending_work_is_bounded(self):
+        executor = BoundedExecutor(max_workers=4, max_pending=2, thread_name_prefix="test")
+        active = 0
+        max_active = 0
+        lock = threading.Lock()
+
+        def work():
+            nonlocal active, max_active
+            with lock:
+                active += 1
+                max_active = max(max_active, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+
+        async def run():
+            await asyncio.gather(*(executor.run("bounded", work) for _ in range(8)))
+
+        asyncio.run(run())
+        executor.shutdown()
+        assert max_active == 2
+
+    def test_exceptions_propagate(self):
+        def fail():
+            raise ValueError("broken")
+
+        async def run():
+            try:
+                await run_blocking("failing", fail)
+            except ValueError as e:
+                return str(e)
+
+        assert asyncio.run(run()) == "broken"
+
+
+class TestCheckExecutor:
+    """Тесты пула потоков проверок"""
+
+    def test_plan_does_not_oversubscribe(self):
+        assert plan_check_threads(32) == {"cpus": 32, "workers": 32, "cv_threads": 1, "blas_threads": 1}
+        assert plan_check_threads(16, workers=4)["cv_threads"] == 4
+        assert plan_check_threads(2, workers=8)["cv_threads"] == 1
+        assert plan_check_threads(8, workers=2, cv_threads=2)["cv_threads"] == 2
+
+    def test_configure_limits_opencv_threads(self):
+        executor = CheckExecutor(workers=2, cv_threads=0)
+        previous = cv2.getNumThreads()
+        try:
+            with patch.dict("os.environ"):
+                sizing = executor.configure(cpus=8)
+            assert sizing["workers"] == 2 and sizing["cv_threads"] == 4
+            assert cv2.getNumThreads() == 4
+            assert executor.executor._max_workers == 2
+            assert executor.get_stats()["oversubscription"] == 1.0
+        finally:
+            executor.shutdown()
+            cv2.setNumThreads(previous)
+
+    def test_stats_before_configure(self):
+        assert CheckExecutor().get_stats() == {"configured": False}
+
+
+class TestLoopLag:
+    """Тесты измерения задержки цикла событий"""
+
+    def test_blocking_call_is_measured(self):
+        async def run():
+            monitor = asyncio.create_task(monitor_event_loop_lag(interval=0.01))
+            await asyncio.sleep(0.03)
+            time.sleep(0.15)  # Блокирует цикл событий
+            await asyncio.sleep(0.03)
+            monitor.cancel()
+
+        asyncio.run(run())
+        assert performance_monitor.get_loop_lag_stats()["max_ms"] >= 100
+
+    def test_lag_stats(self):
+        monitor = PerformanceMonitor()
+        assert monitor.get_loop_lag_stats()["max_ms"] == 0.0
+        for lag in (0.001, 0.002, 0.5):
+            monitor.record_loop_lag(lag)
+        stats = monitor.get_loop_lag_stats()
+        assert stats["current_ms"] == 500.0
+        assert stats["max_ms"] == 500.0
@@ -0,0 +1,116 @@
+import struct
+import zlib
+from io import BytesIO
+from unittest.mock import MagicMock
+
+import pytest
+from PIL import Image
+
+from app.core.exceptions import FileValidationError
+from app.core.image_header import probe_image_header
+from app.cv.decoding import FullResolutionLoader, choose_reduction, decode_image
+
+
+def encode_image(fmt: str, mode: str = "RGB", size=(640, 480), **kwargs) -> bytes:
+    """Кодирует однотонное изображение в заданный формат"""
+    color = {"L": 128, "RGBA": (255, 0, 0, 128)}.get(mode, "red")
+    img = Image.new(mode, size, color=color)
+    buffer = BytesIO()
+    img.save(buffer, format=fmt, **kwargs)
+    return buffer.getvalue()
+
+
+def png_header(width: int, height: int) -> bytes:
+    """Минимальный PNG с заголовком IHDR без данных изображения"""
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + struct.pack(">I", len(ihdr)) + b"IHDR" + ihdr
+        + struct.pack(">I", zlib.crc32(b"IHDR" + ihdr))
+    )
+
+
+class TestProbeImageHeader:
+    """Тесты для чтения заголовков изображений"""
+
+    @pytest.mark.parametrize("fmt,mode,expected_format,channels,kwargs", [
+        ("JPEG", "RGB", "jpeg", 3, {}),
+        ("JPEG", "RGB", "jpeg", 3, {"progressive": True}),
+        ("JPEG", "L", "jpeg", 1, {}),
+        ("PNG", "RGB", "png", 3, {}),
+        ("PNG", "RGBA", "png", 4, {}),
+        ("WEBP", "RGB", "webp", 3, {}),
+        ("WEBP", "RGB", "webp", 3, {"lossless": True}),
+        ("WEBP", "RGBA", "webp", 4, {}),
+        ("BMP", "RGB", "bmp", 3, {}),
+        ("TIFF", "RGB", "tiff", 3, {}),
+    ])
+    def test_supported_formats(self, fmt, mode, expected_format, channels, kwargs):
+        """Формат, размеры и каналы читаются из заголовка"""
+        info = probe_image_header(encode_image(fmt, mode, **kwargs))
+        assert info is not None
+        assert info.format == expected_format
+        assert (info.width, info.height) == (640, 480)
+        assert info.channels == channels
+
+    def test_jpeg_with_exif_segment(self):
+        """Маркер SOF находится после сегментов APPn"""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        info = probe_image_header(encode_image("JPEG", exif=exif.tobytes()))
+        assert (info.width, info.height) == (640, 480)
+
+    def test_truncated_header_needs_more_data(self):
+        """Недостаточно данных для разбора заголовка"""
+        assert probe_image_header(encode_image("PNG")[:20]) is None
+
+    def test_decompression_bomb_dimensions(self):
+        """Размеры огромного изображения доступны без декодирования"""
+        info = probe_image_header(png_header(20000, 20000))
+        assert info.pixels == 400_000_000
+
+    def test_unsupported_content(self):
+        """Файл, не являющийся изображением, отклоняется"""
+        with pytest.raises(FileValidationError) as exc_info:
+            probe_image_header(b"GIF89a" + b"\x00" * 64)
+        assert exc_info.value.code == "INVALID_FILE_FORMAT"
+
+    def test_corrupted_png(self):
+        """Поврежденный заголовок PNG отклоняется"""
+        data = bytearray(encode_image("PNG"))
+        data[12:16] = b"XXXX"
+        with pytest.raises(FileValidationError) as exc_info:
+            probe_image_header(bytes(data))
+        assert exc_info.value.code == "INVALID_IMAGE_DATA"
+
+
+class TestReducedDecoding:
+    """Тесты для декодирования с уменьшением"""
+
+    @pytest.mark.parametrize("fmt,size,target,expected", [
+        ("jpeg", (6000, 4000), 1280, 4),
+        ("jpeg", (6000, 4000), 0, 1),
+        ("jpeg", (800, 600), 1280, 1),
+        ("jpeg", (12000, 9000), 1280, 8),
+        ("png", (6000, 4000), 1280, 1),
+    ])
+    def test_choose_reduction(self, fmt, size, target, expected):
+        """Коэффициент не уменьшает длинную сторону ниже целевой"""
+        assert choose_reduction(fmt, size[0], size[1], target) == expected
+
+    def test_reduced_jpeg_decode(self):
+        """JPEG декодируется сразу в уменьшенном размере"""
+        image = decode_image(encode_image("JPEG", size=(1600, 1200)), reduction=4)
+        assert image.shape == (300, 400, 3)
+
+    def test_full_resolution_loader_is_lazy(self):
+        """Полное разрешение декодируется только при обращении и один раз"""
+        content = encode_image("JPEG", size=(1600, 1200))
+        load_content = MagicMock(return_value=content)
+        loader = FullResolutionLoader(load_content)
+        assert not loader.loaded
+        load_content.assert_not_called()
+
+        assert loader().shape == (1200, 1600, 3)
+        assert loader() is loader()
+        load_content.assert_called_once()
@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import tarfile
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from app.api.ingest import iter_archive_members, read_multipart_upload, read_upload_stream
+from app.api.middleware import UploadSizeLimitMiddleware
+from app.core.exceptions import FileValidationError
+
+
+def _jpeg_bytes(size=(800, 600)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color='red').save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def _chunked(data, chunk_size, consumed=None):
+    async def generator():
+        for offset in range(0, len(data), chunk_size):
+            if consumed is not None:
+                consumed.append(offset)
+            yield data[offset:offset + chunk_size]
+    return generator()
+
+
+class TestReadUploadStream:
+    """Тесты потокового чтения загрузки"""
+
+    def test_hash_size_and_header(self):
+        data = _jpeg_bytes()
+        upload = asyncio.run(read_upload_stream(_chunked(data, 1024), len(data)))
+
+        assert upload.content == data
+        assert upload.size == len(data)
+        assert upload.content_hash == hashlib.sha256(data).hexdigest()
+        assert upload.image_info.format == "jpeg"
+        assert (upload.image_info.width, upload.image_info.height) == (800, 600)
+
+    def test_aborts_when_limit_exceeded(self):
+        data = _jpeg_bytes()
+        consumed = []
+        with pytest.raises(FileValidationError) as exc_info:
+            asyncio.run(read_upload_stream(_chunked(data, 1024, consumed), 2048))
+
+        assert exc_info.value.code == "FILE_TOO_LARGE"
+        assert len(consumed) == 3
+
+    def test_aborts_on_non_image_content(self):
+        data = b"%PDF-1.4" + b"\x00" * 100000
+        consumed = []
+        with pytest.raises(FileValidationError) as exc_info:
+            asyncio.run(read_upload_stream(_chunked(data, 1024, consumed), len(data)))
+
+        assert exc_info.value.code == "INVALID_FILE_FORMAT"
+        assert len(consumed) == 1
+
+
+def _multipart(parts, boundary="photo-boundary"):
+    body = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename is not None else "")
+        body += f"--{boundary}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + data + b"\r\n"
+    return f"multipart/form-data; boundary={boundary}", body + f"--{boundary}--\r\n".encode()
+
+
+def _ingest(max_size):
+    async def ingest(filename, chunks):
+        return await read_upload_stream(chunks, max_size)
+    return ingest
+
+
+class TestReadMultipartUpload:
+    """Тесты потокового разбора multipart-формы"""
+
+    def test_fields_around_file(self):
+        data = _jpeg_bytes()
+        content_type, body = _multipart([
+            ("priority", None, b"bulk"), ("file", "photo.jpg", data), ("callback_url", None, b"https://example.com/hook")
+        ])
+
+        form = asyncio.run(read_multipart_upload(content_type, _chunked(body, 1000), "file", _ingest(len(data))))
+
+        assert form.filename == "photo.jpg"
+        assert form.upload.content == data
+        assert form.upload.content_hash == hashlib.sha256(data).hexdigest()
+        assert form.fields == {"priority": "bulk", "callback_url": "https://example.com/hook"}
+
+    def test_oversized_file_aborts_stream(self):
+        data = _jpeg_bytes()
+        content_type, body = _multipart([("file", "photo.jpg", data)])
+        consumed = []
+        with pytest.raises(FileValidationError) as exc_info:
+            asyncio.run(read_multipart_upload(content_type, _chunked(body, 1024, consumed), "file", _ingest(2048)))
+
+        assert exc_info.value.code == "FILE_TOO_LARGE"
+        assert len(consumed) <= 4
+
+    def test_not_multipart(self):
+        consumed = []
+        form = asyncio.run(read_multipart_upload("application/json", _chunked(b"{}", 1, consumed), "file", _ingest(10)))
+
+        assert form.upload is None
+        assert consumed == []
+
+
+class TestArchiveMembers:
+    """Тесты чтения архивов пакетной загрузки"""
+
+    def _tar(self, members):
+        buffer = BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            for name, data in members:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, BytesIO(data))
+        buffer.seek(0)
+        return buffer
+
+    def test_streams_tar_members(self):
+        archive = self._tar([("a.jpg", b"a" * 10), ("big.jpg", b"b" * 100), (".hidden/c.jpg", b"c")])
+
+        members = list(iter_archive_members(archive, "photos.tar.gz", max_size=50))
+
+        assert members == [("a.jpg", b"a" * 10), ("big.jpg", None)]
+
+    def test_invalid_archive(self):
+        with pytest.raises(FileValidationError) as exc_info:
+            list(iter_archive_members(BytesIO(b"garbage" * 100), "photos.zip", max_size=50))
+
+        assert exc_info.value.code == "INVALID_ARCHIVE"
+
+
+class TestUploadSizeLimitMiddleware:
+    """Тесты ограничения размера тела запроса"""
+
+    def _run(self, headers, chunks):
+        handled = {}
+
+        async def app(scope, receive, send):
+            body = b""
+            while True:
+                message = await receive()
+                body += message.get("body", b"")
+                if not message.get("more_body"):
+                    break
+            handled["body"] = body
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        middleware = UploadSizeLimitMiddleware(app, limits={"/upload": 100})
+        messages = [
+            {"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+            for index, chunk in enumerate(chunks)
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": "/upload", "headers": headers}
+        asyncio.run(middleware(scope, receive, send))
+        return sent, handled, messages
+
+    def test_rejects_by_content_length(self):
+        sent, handled, remaining = self._run([(b"content-length", b"1000")], [b"x" * 1000])
+
+        assert sent[0]["status"] == 413
+        assert "body" not in handled
+        assert len(remaining) == 1
+
+    def test_aborts_chunked_body(self):
+        sent, handled, remaining = self._run([], [b"x" * 60] * 5)
+
+        assert sent[0]["status"] == 413
+        assert "body" not in handled
+        assert len(remaining) == 3
+
+    def test_passes_small_body(self):
+        sent, handled, _ = self._run([], [b"x" * 40, b"x" * 40])
+
+        assert sent[0]["status"] == 200
+        assert handled["body"] == b"x" * 80
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import threading
+import time
+from unittest.mock import patch
+
+from app.core.notification_bus import (
+    NotificationBus,
+    PostgresNotificationBus,
+    SocketNotificationBus,
+    create_notification_bus,
+)
+from app.core.notifications import ResultNotifier
+
+
+class TestResultNotifier:
+    """Тесты уведомлений о результатах внутри процесса"""
+
+    def test_publish_wakes_subscriber(self):
+        notifier = ResultNotifier()
+
+        async def run():
+            updates = notifier.subscribe("req-1")
+            notifier.publish("req-1", {"request_id": "req-1", "status": "PROCESSING"})
+            notifier.publish("req-1", {"request_id": "req-1", "status": "COMPLETED"})
+            result = await notifier.wait_for_result("req-1", updates, timeout=1)
+            notifier.unsubscribe("req-1", updates)
+            return result
+
+        assert asyncio.run(run())["status"] == "COMPLETED"
+        assert notifier.subscriber_count() == 0
+
+    def test_wait_timeout(self):
+        notifier = ResultNotifier()
+
+        async def run():
+            updates = notifier.subscribe("req-1")
+            notifier.publish("req-1", {"request_id": "req-1", "status": "PROCESSING"})
+            return await notifier.wait_for_result("req-1", updates, timeout=0.05)
+
+        assert asyncio.run(run()) is None
+
+    def test_remote_update_loads_state(self):
+        """Сообщение шины будит подписчика состоянием из БД"""
+        notifier = ResultNotifier()
+        loaded = []
+
+        def load_state(request_id):
+            loaded.append(request_id)
+            return {"request_id": request_id, "status": "COMPLETED"}
+
+        notifier.attach_bus(NotificationBus(), load_state)
+
+        async def run():
+            notifier.handle_remote("req-other", "COMPLETED")
+            updates = notifier.subscribe("req-1")
+            notifier.handle_remote("req-1", "COMPLETED")
+            return await notifier.wait_for_result("req-1", updates, timeout=1)
+
+        assert asyncio.run(run())["status"] == "COMPLETED"
+        # Запросы без подписчиков в процессе не читаются из БД
+        assert loaded == ["req-1"]
+
+
+class TestNotificationBus:
+    """Тесты шины уведомлений между процессами"""
+
+    def test_socket_bus_delivers_between_instances(self, tmp_path):
+        directory = str(tmp_path / "bus")
+        sender = SocketNotificationBus(directory)
+        receiver = SocketNotificationBus(directory)
+        received = []
+
+        async def run():
+            await sender.start(lambda *message: received.append(("sender",) + message))
+            await receiver.start(lambda *message: received.append(("receiver",) + message))
+            sender.send("req-1", "COMPLETED")
+            for _ in range(50):
+                if received:
+                    break
+                await asyncio.sleep(0.01)
+            await sender.stop()
+            await receiver.stop()
+
+        asyncio.run(run())
+        assert received == [("receiver", "req-1", "COMPLETED")]
+        assert list((tmp_path / "bus").iterdir()) == []
+
+    def test_socket_bus_removes_stale_sockets(self, tmp_path):
+        stale = tmp_path / "stale.sock"
+        stale.write_bytes(b"")
+        SocketNotificationBus(str(tmp_path)).send("req-1", "COMPLETED")
+        assert not stale.exists()
+
+    def test_ignores_own_and_malformed_messages(self):
+        bus = NotificationBus()
+        received = []
+        asyncio.run(bus.start(lambda *message: received.append(message)))
+        bus._dispatch(bus._encode("req-1", "COMPLETED"))
+        bus._dispatch("not json")
+        bus._dispatch(json.dumps({"request_id": "req-2", "status": "FAILED", "origin": "other"}))
+        assert received == [("req-2", "FAILED")]
+
+    def test_create_notification_bus(self, tmp_path):
+        postgres = create_notification_bus("postgresql+psycopg2://user:secret@db:5432/photos")
+        assert isinstance(postgres, PostgresNotificationBus)
+        assert postgres.dsn == "postgresql://user:secret@db:5432/photos"
+        assert isinstance(create_notification_bus("sqlite:///./test.db", socket_dir=str(tmp_path)), SocketNotificationBus)
+        assert create_notification_bus("sqlite:///./test.db", kind="none").name == "local"
+
+    def test_postgres_send_does_not_wait_for_database(self):
+        """NOTIFY выполняет поток отправки пачками; send не ждет медленного соединения"""
+        released = threading.Event()
+        executed = []
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                return False
+
+            def execute(self, query, params):
+                released.wait(5)
+                executed.append(params)
+
+        class Connection:
+            closed = False
+
+            def cursor(self):
+                return Cursor()
+
+            def close(self):
+                self.closed = True
+
+        bus = PostgresNotificationBus("postgresql://user@db/photos")
+        with patch.object(bus, "_connect", side_effect=Connection):
+            started = time.monotonic()
+            for i in range(3):
+                bus.send(f"req-{i}", "COMPLETED")
+            assert time.monotonic() - started < 0.5
+            released.set()
+            asyncio.run(bus.stop())
+
+        payloads = [json.loads(payload)["request_id"] for _, batch in executed for payload in batch]
+        assert payloads == ["req-0", "req-1", "req-2"]
+        assert all(channel == "validation_results" for channel, _ in executed)
+        assert not bus._sender.is_alive()
+
@@ -0,0 +1,71 @@
+import random
+
+import cv2
+import numpy as np
+import pytest
+
+from app.cv.perceptual_hash import BKTree, dhash, hamming_distance, hash_from_hex, hash_to_hex
+
+
+@pytest.fixture
+def photo():
+    """Изображение с плавными градиентами и фигурами"""
+    rng = np.random.default_rng(0)
+    img = np.zeros((480, 640, 3), dtype=np.uint8)
+    img[:] = np.linspace(40, 200, 640, dtype=np.uint8)[None, :, None]
+    cv2.circle(img, (320, 220), 120, (30, 160, 230), -1)
+    cv2.rectangle(img, (60, 300), (200, 460), (200, 40, 40), -1)
+    noise = rng.integers(0, 8, img.shape, dtype=np.uint8)
+    return cv2.add(img, noise)
+
+
+class TestDHash:
+    """Тесты перцептивного хэша"""
+
+    def test_stable_under_reencode_and_resize(self, photo):
+        original = dhash(photo)
+        _, encoded = cv2.imencode(".jpg", photo, [cv2.IMWRITE_JPEG_QUALITY, 40])
+        reencoded = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+        resized = cv2.resize(photo, (480, 360), interpolation=cv2.INTER_AREA)
+
+        assert hamming_distance(original, dhash(reencoded)) <= 4
+        assert hamming_distance(original, dhash(resized)) <= 4
+
+    def test_differs_for_other_image(self, photo):
+        flipped = cv2.flip(photo, 1)
+        assert hamming_distance(dhash(photo), dhash(flipped)) > 10
+
+    def test_hex_roundtrip(self, photo):
+        value = dhash(photo)
+        assert len(hash_to_hex(value)) == 16
+        assert hash_from_hex(hash_to_hex(value)) == value
+
+
+class TestBKTree:
+    """Тесты BK-дерева"""
+
+    def test_search_matches_brute_force(self):
+        rng = random.Random(1)
+        hashes = [rng.getrandbits(64) for _ in range(500)]
+        tree = BKTree()
+        for index, value in enumerate(hashes):
+            tree.add(value, index)
+        query = hashes[10] ^ 0b1011
+
+        found = tree.search(query, 12)
+        expected = sorted(
+            (hamming_distance(query, value), index) for index, value in enumerate(hashes)
+            if hamming_distance(query, value) <= 12
+        )
+
+        assert len(tree) == 500
+        assert [(distance, value) for distance, _, value in found] == expected
+        assert found[0] == (3, hashes[10], 10)
+
+    def test_same_hash_replaces_value(self):
+        tree = BKTree()
+        tree.add(0xFF, "old")
+        tree.add(0xFF, "new")
+
+        assert len(tree) == 1
+        assert tree.search(0xFF, 0) == [(0, 0xFF, "new")]
@@ -0,0 +1,147 @@
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core import result_cache as result_cache_module
+from app.core.config import settings
+from app.core.monitoring import performance_monitor
+from app.core.result_cache import ResultCache, get_config_version
+from app.db.models import ValidationResultCache
+from app.db.repositories import ResultCacheRepository
+
+
+@pytest.fixture
+def cached_result():
+    """Результат проверок для кэширования"""
+    return {"overall_status": "APPROVED", "checks": [{"check": "face_count", "status": "PASSED"}], "issues": []}
+
+
+@pytest.fixture
+def cache_db(tmp_path):
+    """Таблица validation_result_cache во временной SQLite, общая для экземпляров кэша"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    ValidationResultCache.__table__.create(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    @contextmanager
+    def session():
+        db = session_factory()
+        try:
+            yield db
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    with patch("app.db.repositories.get_db_session", session), \
+         patch.object(result_cache_module, "ResultCacheRepository", ResultCacheRepository):
+        yield session
+    engine.dispose()
+
+
+class TestResultCache:
+    """Тесты кэша результатов по хэшу содержимого"""
+
+    def test_hit_and_miss_are_counted(self, cached_result):
+        cache = ResultCache(max_entries=10, persistent=False)
+        hits, misses = performance_monitor.metrics.cache_hits, performance_monitor.metrics.cache_misses
+
+        assert cache.get("hash-1", "v1") is None
+        cache.put("hash-1", cached_result, "v1")
+        assert cache.get("hash-1", "v1")["overall_status"] == "APPROVED"
+
+        assert performance_monitor.metrics.cache_hits == hits + 1
+        assert performance_monitor.metrics.cache_misses == misses + 1
+
+    def test_lru_eviction(self, cached_result):
+        cache = ResultCache(max_entries=2, persistent=False)
+        cache.put("a", cached_result, "v1")
+        cache.put("b", cached_result, "v1")
+        cache.get("a", "v1")
+        cache.put("c", cached_result, "v1")
+
+        assert cache.get("a", "v1") is not None
+        assert cache.get("b", "v1") is None
+
+    def test_config_version_is_part_of_key(self, cached_result):
+        cache = ResultCache(persistent=False)
+        cache.put("hash-1", cached_result, "v1")
+
+        assert cache.get("hash-1", "v2") is None
+
+    def test_persistent_tier_fills_memory(self, isolated_result_cache, cached_result):
+        isolated_result_cache.get.return_value = cached_result
+        cache = ResultCache()
+
+        assert cache.get("hash-1", "v1") == cached_result
+        isolated_result_cache.get.return_value = None
+        assert cache.get("hash-1", "v1") == cached_result
+        assert isolated_result_cache.get.call_count == 1
+
+    def test_persistent_tier_errors_are_not_fatal(self, isolated_result_cache, cached_result):
+        isolated_result_cache.get.side_effect = RuntimeError("db down")
+        isolated_result_cache.put.side_effect = RuntimeError("db down")
+        cache = ResultCache()
+
+        cache.put("hash-1", cached_result, "v1")
+        assert cache.get("hash-1", "v1") == cached_result
+        assert cache.get("hash-2", "v1") is None
+
+    def test_config_change_drops_stale_entries(self, isolated_result_cache, cached_result):
+        cache = ResultCache()
+        cache.put("hash-1", cached_result, "old-version")
+        current = get_config_version()
+        cache.put("hash-2", cached_result, current)
+
+        cache.on_config_change(None, None)
+
+        assert cache.get("hash-1", "old-version") is None
+        assert cache.get("hash-2", current) is not None
+        isolated_result_cache.delete_stale.assert_called_once_with(current)
+
+    def test_find_similar(self, cached_result):
+        cache = ResultCache(persistent=False)
+        cache.put("hash-1", cached_result, "v1", perceptual_hash=0b1111_0000)
+
+        near = cache.find_similar(0b1111_0011, max_distance=2, config_version="v1")
+
+        assert near.content_hash == "hash-1"
+        assert near.distance == 2
+        assert near.result["overall_status"] == "APPROVED"
+        assert cache.find_similar(0b1111_0011, max_distance=1, config_version="v1") is None
+        assert cache.find_similar(0b1111_0000, max_distance=2, config_version="v2") is None
+
+    def test_similarity_index_loaded_from_db(self, isolated_result_cache, cached_result):
+        isolated_result_cache.get_perceptual_hashes.return_value = [("hash-1", "00000000000000f0")]
+        isolated_result_cache.get.return_value = cached_result
+        cache = ResultCache()
+
+        near = cache.find_similar(0xF1, max_distance=2, config_version="v1")
+
+        assert near.content_hash == "hash-1"
+        isolated_result_cache.get_perceptual_hashes.assert_called_once_with("v1", None)
+
+    def test_similarity_index_sees_other_processes(self, cache_db, cached_result):
+        """Хэши, записанные другим процессом, находятся без перезапуска"""
+        api, worker = ResultCache(), ResultCache()
+        assert api.find_similar(0xF1, max_distance=2, config_version="v1") is None
+
+        worker.put("hash-1", cached_result, "v1", perceptual_hash=0xF0)
+        with patch.object(settings, "NEAR_DUPLICATE_INDEX_REFRESH_SECONDS", 60):
+            assert api.find_similar(0xF1, max_distance=2, config_version="v1") is None
+        with patch.object(settings, "NEAR_DUPLICATE_INDEX_REFRESH_SECONDS", 0):
+            near = api.find_similar(0xF1, max_distance=2, config_version="v1")
+
+        assert near.content_hash == "hash-1"
+        assert near.result["overall_status"] == "APPROVED"
+
+    def test_version_follows_check_parameters(self):
+        before = get_config_version()
+        with patch.dict(result_cache_module.check_config.config, {"check_order": ["changed"]}):
+            assert get_config_version() != before
+        assert get_config_version() == before
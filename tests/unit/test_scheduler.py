@@ -0,0 +1,232 @@
+import asyncio
+import time
+
+import pytest
+
+from app.worker.scheduler import BULK, INTERACTIVE, PriorityScheduler
+
+
+def dispatch(scheduler, count):
+    """Получает count задач, не дожидаясь освобождения слотов"""
+    async def run():
+        return [(await scheduler.get())["request_id"] for _ in range(count)]
+    return asyncio.run(run())
+
+
+def fill(scheduler, priority, count):
+    for i in range(count):
+        scheduler.put({"request_id": f"{priority}-{i}"}, priority)
+
+
+def fill_tenant(scheduler, tenant, count, priority=BULK):
+    for i in range(count):
+        scheduler.put({"request_id": f"{tenant}-{i}"}, priority, tenant)
+
+
+class TestPriorityScheduler:
+    """Тесты планировщика очереди обработки"""
+
+    def test_bulk_leaves_reserved_slots(self):
+        scheduler = PriorityScheduler(capacity=3, reserved_interactive=1)
+        fill(scheduler, BULK, 5)
+
+        async def run():
+            started = [await scheduler.get() for _ in range(2)]
+            # Третий слот зарезервирован: bulk его не получает
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(scheduler.get(), timeout=0.05)
+            scheduler.put({"request_id": "kiosk"}, INTERACTIVE)
+            kiosk = await asyncio.wait_for(scheduler.get(), timeout=1)
+            return started, kiosk
+
+        started, kiosk = asyncio.run(run())
+        assert [job["request_id"] for job in started] == ["bulk-0", "bulk-1"]
+        assert kiosk["request_id"] == "kiosk"
+        assert scheduler.running(BULK) == 2 and scheduler.running(INTERACTIVE) == 1
+
+    def test_task_done_frees_slot(self):
+        scheduler = PriorityScheduler(capacity=1, reserved_interactive=0)
+        fill(scheduler, BULK, 2)
+
+        async def run():
+            first = await scheduler.get()
+            waiter = asyncio.ensure_future(scheduler.get())
+            await asyncio.sleep(0.01)
+            assert not waiter.done()
+            scheduler.task_done(first)
+            return await asyncio.wait_for(waiter, timeout=1)
+
+        assert asyncio.run(run())["request_id"] == "bulk-1"
+        assert scheduler.running() == 1
+
+    def test_weighted_share_does_not_starve_bulk(self):
+        scheduler = PriorityScheduler(capacity=100, reserved_interactive=10, interactive_weight=4)
+        fill(scheduler, BULK, 20)
+        fill(scheduler, INTERACTIVE, 20)
+
+        order = dispatch(scheduler, 10)
+
+        assert sum(job.startswith(BULK) for job in order) == 2
+        assert sum(job.startswith(BULK) for job in order[:5]) == 1
+        # Внутри очереди порядок поступления сохраняется
+        assert [job for job in order if job.startswith(INTERACTIVE)] == [f"interactive-{i}" for i in range(8)]
+
+    def test_single_slot_is_never_reserved(self):
+        scheduler = PriorityScheduler(capacity=1, reserved_interactive=3)
+        fill(scheduler, BULK, 1)
+
+        assert dispatch(scheduler, 1) == ["bulk-0"]
+
+    def test_unknown_priority(self):
+        with pytest.raises(ValueError):
+            PriorityScheduler().put({"request_id": "r"}, "urgent")
+
+    def test_stats(self):
+        scheduler = PriorityScheduler(capacity=2, reserved_interactive=1)
+        fill(scheduler, BULK, 3)
+        dispatch(scheduler, 1)
+
+        stats = scheduler.get_stats()
+        assert stats["bulk"]["queued"] == 2
+        assert stats["bulk"]["running"] == 1
+        assert stats["bulk"]["dispatched"] == 1
+        assert stats["interactive"]["wait_p99_ms"] == 0.0
+
+
+class TestTenantFairness:
+    """Тесты разделения слотов между арендаторами"""
+
+    def test_noisy_tenant_does_not_block_others(self):
+        scheduler = PriorityScheduler(capacity=100, reserved_interactive=0)
+        fill_tenant(scheduler, "noisy", 50)
+        fill_tenant(scheduler, "quiet", 2)
+
+        order = dispatch(scheduler, 4)
+
+        assert order == ["noisy-0", "quiet-0", "noisy-1", "quiet-1"]
+
+    def test_weights(self):
+        scheduler = PriorityScheduler(capacity=100, reserved_interactive=0, tenant_weights={"gold": 3})
+        fill_tenant(scheduler, "gold", 20)
+        fill_tenant(scheduler, "basic", 20)
+
+        order = dispatch(scheduler, 8)
+
+        assert sum(job.startswith("gold") for job in order) == 6
+        assert order[:4] == ["gold-0", "gold-1", "gold-2", "basic-0"]
+
+    def test_in_flight_cap(self):
+        scheduler = PriorityScheduler(
+            capacity=10, reserved_interactive=0, tenant_max_in_flight={"noisy": 2}
+        )
+        fill_tenant(scheduler, "noisy", 5)
+
+        async def run():
+            started = [await scheduler.get() for _ in range(2)]
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(scheduler.get(), timeout=0.05)
+            fill_tenant(scheduler, "quiet", 1)
+            quiet = await asyncio.wait_for(scheduler.get(), timeout=1)
+            waiter = asyncio.ensure_future(scheduler.get())
+            await asyncio.sleep(0.01)
+            assert not waiter.done()
+            scheduler.task_done(started[0])
+            return quiet, await asyncio.wait_for(waiter, timeout=1)
+
+        quiet, resumed = asyncio.run(run())
+        assert quiet["request_id"] == "quiet-0"
+        assert resumed["request_id"] == "noisy-2"
+
+    def test_tenant_stats(self):
+        scheduler = PriorityScheduler(capacity=10, reserved_interactive=0, tenant_weights={"a": 2})
+        fill_tenant(scheduler, "a", 3)
+        fill_tenant(scheduler, "b", 1, priority=INTERACTIVE)
+        dispatch(scheduler, 2)
+
+        tenants = scheduler.get_stats()["tenants"]
+        assert tenants["a"]["weight"] == 2
+        assert tenants["a"]["queued"] + tenants["a"]["running"] == 3
+        assert tenants["b"]["running"] == 1
+
+
+class TestDeadlines:
+    """Тесты планирования по дедлайнам"""
+
+    def test_earliest_deadline_first(self):
+        scheduler = PriorityScheduler(capacity=10, reserved_interactive=0)
+        now = time.time()
+        scheduler.put({"request_id": "no-deadline"}, BULK)
+        scheduler.put({"request_id": "late"}, BULK, deadline=now + 60)
+        scheduler.put({"request_id": "soon"}, BULK, deadline=now + 5)
+
+        assert dispatch(scheduler, 3) == ["soon", "late", "no-deadline"]
+
+    def test_expired_job_returned_without_slot(self):
+        scheduler = PriorityScheduler(capacity=1, reserved_interactive=0)
+        scheduler.put({"request_id": "running"}, BULK)
+
+        async def run():
+            await scheduler.get()
+            scheduler.put({"request_id": "stale"}, BULK, deadline=time.time() + 0.05)
+            # Слот занят, но задача возвращается по истечении дедлайна
+            return await asyncio.wait_for(scheduler.get(), timeout=1)
+
+        job = asyncio.run(run())
+        assert job["request_id"] == "stale" and job["expired"]
+        assert scheduler.running() == 1
+        assert scheduler.get_stats()["bulk"]["expired"] == 1
+
+
+class TestInlineSlots:
+    """Тесты выдачи слотов обработке вне очереди"""
+
+    def test_acquire_waits_in_scheduler_order(self):
+        """Слот inline-обработки выдается в порядке планировщика и освобождается task_done"""
+        scheduler = PriorityScheduler(capacity=1, reserved_interactive=0)
+        scheduler.put({"request_id": "queued"}, INTERACTIVE, "acme")
+
+        async def run():
+            inline = asyncio.ensure_future(scheduler.acquire("inline", INTERACTIVE, "acme"))
+            queued = await asyncio.wait_for(scheduler.get(), timeout=1)
+            await asyncio.sleep(0.01)
+            # Задача очереди поставлена раньше: inline ждет ее слот
+            assert not inline.done()
+            scheduler.task_done(queued)
+            slot = await asyncio.wait_for(inline, timeout=1)
+            assert scheduler.get_stats()["tenants"]["acme"]["running"] == 1
+            scheduler.task_done(slot)
+            return queued, slot
+
+        queued, slot = asyncio.run(run())
+        assert queued["request_id"] == "queued"
+        assert slot["request_id"] == "inline" and slot["tenant"] == "acme"
+        assert scheduler.running() == 0
+        assert scheduler.get_stats()["interactive"]["dispatched"] == 2
+
+    def test_acquire_without_worker(self):
+        """Заявка получает слот и без ожидающего обработчика; задачи очереди передаются ему позже"""
+        scheduler = PriorityScheduler(capacity=2, reserved_interactive=0)
+        scheduler.put({"request_id": "queued"}, BULK)
+
+        async def run():
+            slot = await asyncio.wait_for(scheduler.acquire("inline"), timeout=1)
+            queued = await asyncio.wait_for(scheduler.get(), timeout=1)
+            return slot, queued
+
+        slot, queued = asyncio.run(run())
+        assert slot["request_id"] == "inline" and queued["request_id"] == "queued"
+        assert scheduler.running() == 2
+
+    def test_removed_acquire_gets_no_slot(self):
+        scheduler = PriorityScheduler(capacity=1, reserved_interactive=0)
+        scheduler.put({"request_id": "running"}, BULK)
+
+        async def run():
+            await scheduler.get()
+            inline = asyncio.ensure_future(scheduler.acquire("inline"))
+            await asyncio.sleep(0.01)
+            assert scheduler.remove("inline") is not None
+            return await asyncio.wait_for(inline, timeout=1)
+
+        assert asyncio.run(run()) is None
+        assert scheduler.running() == 1 and scheduler.qsize() == 0
@@ -0,0 +1,281 @@
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import WebhookDelivery
+from app.db.repositories import WebhookDeliveryRepository
+from app.worker import webhooks
+from app.worker.webhooks import WebhookDispatcher
+
+
+class StubReceiver:
+    """Локальный HTTP-сервер, принимающий webhook"""
+
+    def __init__(self, status_codes=(200,), delay=0.0):
+        self.status_codes = list(status_codes)
+        self.delay = delay
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                with receiver._lock:
+                    receiver.active += 1
+                    receiver.max_active = max(receiver.max_active, receiver.active)
+                    code = receiver.status_codes.pop(0) if len(receiver.status_codes) > 1 else receiver.status_codes[0]
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                time.sleep(receiver.delay)
+                with receiver._lock:
+                    receiver.requests.append((dict(self.headers), json.loads(body)))
+                    receiver.active -= 1
+                self.send_response(code)
+                if code == 429:
+                    self.send_header("Retry-After", "120")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hook"
+        self._thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def receiver():
+    receivers = []
+
+    def create(*args, **kwargs):
+        receivers.append(StubReceiver(*args, **kwargs))
+        return receivers[-1]
+
+    yield create
+    for stub in receivers:
+        stub.close()
+
+
+@pytest.fixture
+def outbox():
+    with patch.object(webhooks, "WebhookDeliveryRepository") as repository:
+        yield repository
+
+
+@pytest.fixture(autouse=True)
+def allow_loopback():
+    """Тестовые получатели слушают 127.0.0.1: он разрешен явно"""
+    with patch.object(webhooks.settings, "WEBHOOK_ALLOWED_HOSTS", ["127.0.0.1"]):
+        yield
+
+
+def make_delivery(url, delivery_id=1, attempts=0):
+    return {
+        "id": delivery_id,
+        "request_id": f"req-{delivery_id}",
+        "url": url,
+        "status": "PENDING",
+        "attempts": attempts,
+        "leased_until": datetime(2026, 10, 16, 12, 0, 30),
+        "payload": {
+            "request_id": f"req-{delivery_id}",
+            "status": "COMPLETED",
+            "overall_status": "APPROVED",
+            "checks": [],
+            "processed_at": "2026-10-16T12:00:00",
+            "processing_time": 0.4,
+            "created_at": "2026-10-16T12:00:00",
+        },
+    }
+
+
+def run_once(dispatcher):
+    async def run():
+        try:
+            return await dispatcher.run_once()
+        finally:
+            await dispatcher.stop()
+    return asyncio.run(run())
+
+
+class TestWebhookDispatcher:
+    """Тесты доставки webhook из outbox"""
+
+    def test_delivers_result(self, receiver, outbox):
+        stub = receiver()
+        outbox.claim_due.return_value = [make_delivery(stub.url)]
+
+        assert run_once(WebhookDispatcher()) == 1
+
+        outbox.mark_delivered.assert_called_once_with(1, 1)
+        headers, body = stub.requests[0]
+        assert headers["X-Request-ID"] == "req-1"
+        assert body["requestId"] == "req-1"
+        assert body["overallStatus"] == "APPROVED"
+
+    def test_server_error_is_retried_with_backoff(self, receiver, outbox):
+        stub = receiver(status_codes=(503,))
+        outbox.claim_due.return_value = [make_delivery(stub.url, attempts=2)]
+
+        before = datetime.utcnow()
+        run_once(WebhookDispatcher())
+
+        delivery_id, attempts, next_attempt_at, error = outbox.schedule_retry.call_args[0]
+        assert (delivery_id, attempts, error) == (1, 3, "HTTP 503")
+        # Третья попытка: base * 2^2 с джиттером 0.5-1.0
+        delay = (next_attempt_at - before).total_seconds()
+        assert 4 - 0.1 <= delay <= 8 + 1
+        outbox.mark_failed.assert_not_called()
+
+    def test_retry_after_is_respected(self, receiver, outbox):
+        stub = receiver(status_codes=(429,))
+        outbox.claim_due.return_value = [make_delivery(stub.url)]
+
+        before = datetime.utcnow()
+        run_once(WebhookDispatcher())
+
+        next_attempt_at = outbox.schedule_retry.call_args[0][2]
+        assert (next_attempt_at - before).total_seconds() >= 119
+
+    def test_client_error_fails_permanently(self, receiver, outbox):
+        stub = receiver(status_codes=(404,))
+        outbox.claim_due.return_value = [make_delivery(stub.url)]
+
+        run_once(WebhookDispatcher())
+
+        outbox.mark_failed.assert_called_once_with(1, 1, "HTTP 404")
+        outbox.schedule_retry.assert_not_called()
+
+    def test_gives_up_after_max_attempts(self, receiver, outbox):
+        stub = receiver(status_codes=(500,))
+        outbox.claim_due.return_value = [make_delivery(stub.url, attempts=webhooks.settings.WEBHOOK_MAX_ATTEMPTS - 1)]
+
+        run_once(WebhookDispatcher())
+
+        outbox.mark_failed.assert_called_once()
+        outbox.schedule_retry.assert_not_called()
+
+    def test_unreachable_host_is_retried(self, outbox):
+        outbox.claim_due.return_value = [make_delivery("http://127.0.0.1:9/hook")]
+
+        run_once(WebhookDispatcher())
+
+        assert outbox.schedule_retry.call_args[0][3].startswith("ConnectError")
+
+    def test_expired_lease_is_not_sent(self, receiver, outbox):
+        """Доставку, взятую другим процессом за время ожидания семафора, не отправляем"""
+        stub = receiver()
+        outbox.claim_due.return_value = [make_delivery(stub.url)]
+        outbox.renew_lease.return_value = None
+
+        run_once(WebhookDispatcher())
+
+        assert stub.requests == []
+        outbox.mark_delivered.assert_not_called()
+        outbox.schedule_retry.assert_not_called()
+
+    def test_internal_address_is_rejected(self, outbox):
+        """Без списка разрешенных хостов доставка на внутренний адрес не выполняется"""
+        outbox.claim_due.return_value = [
+            make_delivery("http://localhost/hook", delivery_id=1),
+            make_delivery("http://169.254.169.254/latest", delivery_id=2),
+        ]
+
+        with patch.object(webhooks.settings, "WEBHOOK_ALLOWED_HOSTS", []):
+            run_once(WebhookDispatcher())
+
+        assert outbox.mark_failed.call_count == 2
+        assert "internal address" in outbox.mark_failed.call_args[0][2]
+        outbox.schedule_retry.assert_not_called()
+
+    def test_public_host_is_pinned_to_resolved_address(self, receiver, outbox):
+        """Соединение устанавливается с проверенным адресом, имя хоста передается в Host"""
+        stub = receiver()
+        port = stub.server.server_port
+        outbox.claim_due.return_value = [make_delivery(f"http://hooks.example.com:{port}/hook")]
+
+        async def resolve(hostname, port):
+            return "127.0.0.1"
+
+        with patch.object(webhooks.settings, "WEBHOOK_ALLOWED_HOSTS", []), \
+             patch.object(webhooks, "resolve_callback_host", resolve):
+            run_once(WebhookDispatcher())
+
+        outbox.mark_delivered.assert_called_once()
+        assert stub.requests[0][0]["Host"] == f"hooks.example.com:{port}"
+
+    def test_address_checks(self):
+        assert webhooks.is_public_address("93.184.216.34")
+        for address in ("127.0.0.1", "10.1.2.3", "192.168.0.1", "169.254.169.254", "::1", "fe80::1", "::ffff:10.0.0.1", "240.0.0.1"):
+            assert not webhooks.is_public_address(address)
+
+    def test_per_host_concurrency_limit(self, receiver, outbox):
+        slow = receiver(delay=0.1)
+        other = receiver(delay=0.1)
+        deliveries = [make_delivery(slow.url, delivery_id=i) for i in range(5)]
+        deliveries.append(make_delivery(other.url, delivery_id=5))
+        outbox.claim_due.return_value = deliveries
+
+        with patch.object(webhooks.settings, "WEBHOOK_PER_HOST_CONCURRENCY", 2):
+            run_once(WebhookDispatcher())
+
+        assert len(slow.requests) == 5 and len(other.requests) == 1
+        assert slow.max_active == 2
+        assert outbox.mark_delivered.call_count == 6
+
+
+class TestWebhookDeliveryRepository:
+    """Тесты резерва доставок в outbox"""
+
+    @pytest.fixture
+    def deliveries_db(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'webhooks.db'}")
+        WebhookDelivery.__table__.create(engine)
+        session_factory = sessionmaker(bind=engine)
+
+        @contextmanager
+        def session():
+            db = session_factory()
+            try:
+                yield db
+                db.commit()
+            finally:
+                db.close()
+
+        with patch("app.db.repositories.get_db_session", session):
+            yield session
+        engine.dispose()
+
+    def test_renew_lease_after_takeover_fails(self, deliveries_db):
+        with deliveries_db() as db:
+            db.add(WebhookDelivery(
+                request_id="req-1", url="https://example.com/hook", payload={}, status="PENDING",
+                attempts=0, next_attempt_at=datetime.utcnow() - timedelta(seconds=1)
+            ))
+
+        first = WebhookDeliveryRepository.claim_due(10, 0.0)[0]
+        assert WebhookDeliveryRepository.renew_lease(first["id"], first["leased_until"], 60) is not None
+        # Резерв первого процесса продлен: доставка не выдается другому
+        assert WebhookDeliveryRepository.claim_due(10, 60) == []
+
+        with deliveries_db() as db:
+            db.query(WebhookDelivery).update({"next_attempt_at": datetime.utcnow() - timedelta(seconds=1)})
+        second = WebhookDeliveryRepository.claim_due(10, 60)[0]
+        assert WebhookDeliveryRepository.renew_lease(first["id"], first["leased_until"], 60) is None
+        assert WebhookDeliveryRepository.renew_lease(second["id"], second["leased_until"], 60) is not None
@@ -0,0 +1,440 @@
+import asyncio
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import cv2
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.exceptions import ProcessingCancelled
+from app.worker import tasks
+from app.worker.cancellation import running_jobs
+from app.db.models import ValidationJob
+from app.worker import job_queue as job_queue_module
+from app.worker.frames import FrameHandle, SharedFrameHandle, create_frame_handle
+from app.worker.job_queue import JobQueueConsumer
+from app.worker.process_engine import ProcessCheckEngine
+from app.worker.scheduler import BULK, INTERACTIVE, PriorityScheduler
+from app.worker.single_flight import inflight_jobs
+
+
+@pytest.fixture
+def frame_image():
+    """Небольшой цветной кадр для тестов"""
+    img = np.zeros((60, 80, 3), dtype=np.uint8)
+    img[:, :40] = [0, 0, 255]
+    return img
+
+
+@pytest.fixture
+def runner_result():
+    """Результат CheckRunner без проверок"""
+    return {"overall_status": "APPROVED", "checks": [], "issues": []}
+
+
+class TestFrameHandles:
+    """Тесты для передачи декодированных кадров"""
+
+    def test_in_process_handle(self, frame_image):
+        """Кадр передается без копирования"""
+        handle = create_frame_handle(frame_image)
+        assert isinstance(handle, FrameHandle)
+        assert handle.get() is frame_image
+        handle.release()
+        with pytest.raises(RuntimeError):
+            handle.get()
+
+    def test_shared_handle_roundtrip(self, frame_image):
+        """Кадр в разделяемой памяти восстанавливается после сериализации"""
+        handle = create_frame_handle(frame_image, shared=True)
+        assert isinstance(handle, SharedFrameHandle)
+        try:
+            restored = pickle.loads(pickle.dumps(handle))
+            assert np.array_equal(restored.get(), frame_image)
+            restored.close()
+        finally:
+            handle.release()
+
+
+class TestProcessImageTask:
+    """Тесты для задачи обработки изображения"""
+
+    def test_frame_skips_storage_read(self, frame_image, runner_result):
+        """При наличии кадра файл не читается из хранилища"""
+        with patch.object(tasks, "storage_client") as storage, \
+             patch.object(tasks, "ValidationRequestRepository") as repo, \
+             patch.object(tasks.CheckRunner, "run_checks", return_value=runner_result) as run_checks, \
+             patch.object(tasks.check_config, "get_enabled_checks", return_value=[]):
+            asyncio.run(tasks.process_image_task("req-1", "req-1.jpg", FrameHandle(frame_image)))
+
+        storage.get_file.assert_not_called()
+        storage.delete_file.assert_called_once_with("req-1.jpg")
+        assert run_checks.call_args[0][0] is frame_image
+        assert repo.update_result.call_args.kwargs["status"] == "COMPLETED"
+
+    def test_expired_deadline_skips_checks(self, frame_image):
+        """Задача с истекшим дедлайном завершается со статусом EXPIRED без проверок"""
+        frame = FrameHandle(frame_image)
+        with patch.object(tasks, "storage_client") as storage, \
+             patch.object(tasks, "ValidationRequestRepository") as repo, \
+             patch.object(tasks.CheckRunner, "run_checks") as run_checks:
+            asyncio.run(tasks.process_image_task("req-3", "req-3.jpg", frame, deadline=time.time() - 1))
+
+        run_checks.assert_not_called()
+        assert repo.update_error.call_args.kwargs["status"] == "EXPIRED"
+        storage.delete_file.assert_called_once_with("req-3.jpg")
+        with pytest.raises(RuntimeError):
+            frame.get()
+
+
+class TestInlineValidation:
+    """Тесты для синхронной валидации"""
+
+    def test_result_returned_and_persisted(self, frame_image, runner_result):
+        """Результат возвращается сразу, запись в БД выполняется в фоне"""
+        created = []
+
+        async def run():
+            result = await tasks.run_inline_validation(
+                "req-2", FrameHandle(frame_image), b"", lambda: created.append("req-2")
+            )
+            await asyncio.gather(*(asyncio.all_tasks() - {asyncio.current_task()}))
+            return result
+
+        with patch.object(tasks, "ValidationRequestRepository") as repo, \
+             patch.object(tasks.CheckRunner, "run_checks", return_value=runner_result), \
+             patch.object(tasks.check_config, "get_enabled_checks", return_value=[]):
+            result = asyncio.run(run())
+
+        assert result["status"] == "COMPLETED"
+        assert result["overall_status"] == "APPROVED"
+        assert created == ["req-2"]
+        assert repo.update_result.call_args.kwargs["request_id"] == "req-2"
+
+    def test_slot_granted_by_scheduler(self, frame_image, runner_result):
+        """Слот выдает планировщик в очереди interactive арендатора запроса"""
+        async def run():
+            scheduler = tasks.processing_queue
+            scheduler.put({"request_id": "queued-1"}, INTERACTIVE, "acme")
+            queued = await scheduler.get()
+            # Все слоты заняты задачами очереди: inline ждет освобождения
+            for i in range(scheduler.capacity - 1):
+                scheduler.put({"request_id": f"queued-{i + 2}"}, INTERACTIVE)
+                await scheduler.get()
+            inline = asyncio.create_task(tasks.run_inline_validation(
+                "req-5", FrameHandle(frame_image), b"", lambda: None, tenant="acme"
+            ))
+            await asyncio.sleep(0.05)
+            assert not inline.done()
+            scheduler.task_done(queued)
+            result = await asyncio.wait_for(inline, timeout=1)
+            await asyncio.gather(*(asyncio.all_tasks() - {asyncio.current_task()}))
+            return result, scheduler.get_stats()
+
+        with patch.object(tasks, "ValidationRequestRepository"), \
+             patch.object(tasks.CheckRunner, "run_checks", return_value=runner_result), \
+             patch.object(tasks.check_config, "get_enabled_checks", return_value=[]):
+            result, stats = asyncio.run(run())
+
+        assert result["status"] == "COMPLETED"
+        assert stats["tenants"]["acme"]["running"] == 0
+        assert stats["interactive"]["dispatched"] >= 2
+        assert tasks.processing_queue.running() == tasks.processing_queue.capacity - 1
+
+
+class TestSingleFlight:
+    """Тесты объединения обработок одинаковых файлов"""
+
+    def test_duplicate_waits_for_leader(self, frame_image, runner_result):
+        """Повторная загрузка получает результат ведущей обработки без своего слота"""
+        async def run():
+            inflight_jobs.register("hash-1")
+            leader = inflight_jobs.follow("hash-1", "req-dup")
+            follower = asyncio.create_task(tasks.follow_inflight_job("req-dup", leader, "hash-1"))
+            await tasks.process_image_task("req-lead", "req-lead.jpg", FrameHandle(frame_image), "hash-1")
+            result = await follower
+            await asyncio.gather(*(asyncio.all_tasks() - {asyncio.current_task()}))
+            return result
+
+        with patch.object(tasks, "storage_client"), \
+             patch.object(tasks, "ValidationRequestRepository") as repo, \
+             patch.object(tasks.CheckRunner, "run_checks", return_value=runner_result) as run_checks, \
+             patch.object(tasks.check_config, "get_enabled_checks", return_value=[]):
+            result = asyncio.run(run())
+
+        assert run_checks.call_count == 1
+        assert result["request_id"] == "req-dup"
+        assert result["status"] == "COMPLETED"
+        assert "hash-1" not in inflight_jobs
+        updated = [call.kwargs["request_id"] for call in repo.update_result.call_args_list]
+        assert sorted(updated) == ["req-dup", "req-lead"]
+
+    def test_follower_takes_over_cancelled_leader(self, frame_image, runner_result):
+        """После отмены ведущей обработки повторная загрузка получает результат проверок, а не CANCELLED"""
+        async def run():
+            inflight_jobs.register("hash-1")
+            second = inflight_jobs.follow("hash-1", "req-dup")
+            third = inflight_jobs.follow("hash-1", "req-dup-2")
+            follower = asyncio.create_task(tasks.follow_inflight_job("req-dup", second, "hash-1"))
+            await tasks.abandon_image_task("req-lead", "req-lead.jpg", FrameHandle(frame_image), "hash-1", "CANCELLED")
+            job = await asyncio.wait_for(tasks.processing_queue.get(), timeout=1)
+            await tasks.process_image_task(job["request_id"], job["file_path"], job["frame"], job["content_hash"])
+            result = await follower
+            await asyncio.gather(*(asyncio.all_tasks() - {asyncio.current_task()}))
+            return job, result, await third
+
+        encoded = cv2.imencode(".png", frame_image)[1].tobytes()
+        with patch.object(tasks, "storage_client") as storage, \
+             patch.object(tasks, "ValidationRequestRepository") as repo, \
+             patch.object(tasks.CheckRunner, "run_checks", return_value=runner_result) as run_checks, \
+             patch.object(tasks.check_config, "get_enabled_checks", return_value=[]):
+            storage.get_file.return_value = encoded
+            job, result, third = asyncio.run(run())
+
+        assert job["request_id"] == "req-dup"
+        assert job["file_path"] == "req-lead.jpg"
+        assert run_checks.call_count == 1
+        assert result["request_id"] == "req-dup"
+        assert result["status"] == "COMPLETED"
+        assert third["status"] == "COMPLETED"
+        assert repo.update_error.call_args.kwargs == {
+            "request_id": "req-lead", "error_message": "Cancelled by client", "status": "CANCELLED"
+        }
+        storage.delete_file.assert_called_once_with("req-lead.jpg")
+        assert "hash-1" not in inflight_jobs
+
+
+class TestCancellation:
+    """Тесты отмены обработки"""
+
+    def test_queued_job_removed(self, frame_image):
+        """Ожидающая задача снимается с очереди и завершается без проверок"""
+        frame = FrameHandle(frame_image)
+
+        async def run():
+            await tasks.add_processing_task("req-q", "req-q.jpg", frame=frame, priority="bulk")
+            return await tasks.cancel_processing_task("req-q")
+
+        with patch.object(tasks, "storage_client") as storage, \
+             patch.object(tasks, "ValidationRequestRepository") as repo:
+            assert asyncio.run(run()) == "CANCELLED"
+
+        assert tasks.processing_queue.qsize() == 0
+        assert repo.update_error.call_args.kwargs["status"] == "CANCELLED"
+        storage.delete_file.assert_called_once_with("req-q.jpg")
+        with pytest.raises(RuntimeError):
+            frame.get()
+
+    def test_running_job_stops_at_check_boundary(self, frame_image):
+        """Выполняющаяся обработка прерывается перед следующей проверкой"""
+        async def run_checks(image, context):
+            assert await tasks.cancel_processing_task("req-r") == "CANCELLING"
+            runner = tasks.CheckRunner()
+            runner._raise_if_cancelled(context, "next")
+
+        with patch.object(tasks, "storage_client") as storage, \
+             patch.object(tasks, "ValidationRequestRepository") as repo, \
+             patch.object(tasks.CheckRunner, "run_checks", side_effect=run_checks):
+            asyncio.run(tasks.process_image_task("req-r", "req-r.jpg", FrameHandle(frame_image)))
+
+        assert repo.update_error.call_args.kwargs["status"] == "CANCELLED"
+        repo.update_result.assert_not_called()
+        storage.delete_file.assert_called_once_with("req-r.jpg")
+        assert "req-r" not in running_jobs
+
+    def test_unknown_job(self):
+        """Задача, не ожидающая и не выполняющаяся в процессе, не отменяется"""
+        assert asyncio.run(tasks.cancel_processing_task("req-missing")) is None
+
+    def test_runner_checks_flag(self):
+        """CheckRunner не запускает проверки после установки флага отмены"""
+        cancelled = threading.Event()
+        cancelled.set()
+        with patch.object(tasks.check_config, "get_enabled_checks", return_value=["faceCount", "lighting"]):
+            with pytest.raises(ProcessingCancelled):
+                asyncio.run(tasks.CheckRunner().run_checks(np.zeros((10, 10, 3), dtype=np.uint8), {"cancelled": cancelled}))
+
+
+class TestProcessEngine:
+    """Тесты выполнения проверок в пуле процессов"""
+
+    def test_analyze_image_uses_pool(self, frame_image):
+        analysis = {"overall_status": "APPROVED", "checks": [], "issues": [], "completed": True}
+        with patch.object(settings, "CHECK_ENGINE", "process"), \
+             patch.object(tasks.process_check_engine, "run", return_value=analysis) as run, \
+             patch.object(tasks.CheckRunner, "run_checks") as run_checks:
+            result = asyncio.run(tasks.analyze_image("req-1", frame_image, file_path="req-1.jpg"))
+
+        assert result == analysis
+        assert run.call_args.args[:4] == ("req-1", frame_image, 1, "req-1.jpg")
+        run_checks.assert_not_called()
+
+    def test_cancelled_before_dispatch(self, frame_image):
+        engine = ProcessCheckEngine(max_workers=1)
+        cancelled = threading.Event()
+        cancelled.set()
+
+        with pytest.raises(ProcessingCancelled):
+            asyncio.run(engine.run("req-1", frame_image, cancelled=cancelled))
+        assert engine.get_stats()["in_flight"] == 0
+
+    def test_pipeline_runs_in_worker_process(self, frame_image):
+        """Конвейер выполняется целиком в процессе пула, результат - в нативных типах"""
+        engine = ProcessCheckEngine(max_workers=1)
+
+        async def run():
+            await engine.start()
+            return await engine.run("req-1", frame_image)
+
+        try:
+            analysis = asyncio.run(run())
+        finally:
+            engine.shutdown()
+
+        assert analysis["overall_status"] in ("APPROVED", "REJECTED", "MANUAL_REVIEW")
+        assert analysis["checks"]
+        pickle.dumps(analysis)
+        assert engine.get_stats()["completed"] == 1
+
+
+@pytest.fixture
+def job_db(tmp_path):
+    """Таблица validation_jobs во временной SQLite"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    ValidationJob.__table__.create(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    @contextmanager
+    def session():
+        db = session_factory()
+        try:
+            yield db
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    with patch("app.db.repositories.get_db_session", session), \
+         patch.object(job_queue_module, "ValidationRequestRepository") as repo:
+        yield session, repo
+    engine.dispose()
+
+
+def consumer(worker_id, capacity=2):
+    return JobQueueConsumer(PriorityScheduler(capacity=capacity, reserved_interactive=0), worker_id)
+
+
+def job_row(session, request_id):
+    with session() as db:
+        job = db.query(ValidationJob).filter(ValidationJob.request_id == request_id).first()
+        return job.to_dict() if job is not None else None
+
+
+class TestJobQueue:
+    """Тесты очереди обработки в БД"""
+
+    def test_lease_is_exclusive_and_expires(self, job_db):
+        session, _ = job_db
+        first, second = consumer("first"), consumer("second")
+
+        async def run():
+            await first.enqueue("req-1", "req-1.jpg")
+            assert await first.run_once() == 1
+            assert await second.run_once() == 0
+            # Аренда остановившегося процесса истекает, задачу получает другой
+            await asyncio.sleep(0.2)
+            assert await second.run_once() == 1
+            first.complete("req-1")
+            await first.run_once()
+            assert job_row(session, "req-1")["attempts"] == 2
+            second.complete("req-1")
+            await second.run_once()
+
+        with patch.object(settings, "JOB_QUEUE_VISIBILITY_TIMEOUT_SECONDS", 0.1):
+            asyncio.run(run())
+        assert job_row(session, "req-1") is None
+        assert second.scheduler.qsize(INTERACTIVE) == 1
+        assert second.get_stats()["completed"] == 1
+
+    def test_dead_letter(self, job_db):
+        session, repo = job_db
+        first, second = consumer("first"), consumer("second")
+
+        async def run():
+            await first.enqueue("req-1", "req-1.jpg")
+            with patch.object(settings, "JOB_QUEUE_VISIBILITY_TIMEOUT_SECONDS", 0.05), \
+                 patch.object(settings, "JOB_QUEUE_MAX_ATTEMPTS", 1):
+                await first.run_once()
+                await asyncio.sleep(0.1)
+                return await second.run_once()
+
+        assert asyncio.run(run()) == 0
+        assert job_row(session, "req-1")["status"] == "DEAD"
+        assert repo.update_error.call_args.kwargs["status"] == "FAILED"
+        assert second.scheduler.qsize() == 0
+
+    def test_bulk_share(self, job_db):
+        worker = consumer("worker", capacity=5)
+
+        async def run():
+            for i in range(10):
+                await worker.enqueue(f"bulk-{i}", "f.jpg", priority=BULK)
+                await worker.enqueue(f"interactive-{i}", "f.jpg")
+            return await worker.run_once()
+
+        with patch.object(settings, "INTERACTIVE_WEIGHT", 4):
+            assert asyncio.run(run()) == 5
+        assert worker.scheduler.qsize(BULK) == 1
+        assert worker.scheduler.qsize(INTERACTIVE) == 4
+
+    def test_accepting_process_finishes_remote_job(self, job_db, frame_image, isolated_admission):
+        session, repo = job_db
+        api, worker = consumer("api"), consumer("worker")
+        frame = FrameHandle(frame_image)
+        repo.get_by_id.return_value = MagicMock(to_dict=lambda: {"request_id": "req-1", "status": "COMPLETED"})
+
+        async def run():
+            isolated_admission.admit("req-1", 1.0)
+            inflight_jobs.register("hash-1")
+            follower = inflight_jobs.follow("hash-1", "req-dup")
+            await api.enqueue("req-1", "req-1.jpg", frame, "hash-1")
+            await worker.run_once()
+            with patch.object(settings, "JOB_QUEUE_CONSUME", False):
+                # Задачу выполняет другой процесс: кадр освобождается
+                await api.run_once()
+                assert not follower.done()
+                worker.complete("req-1")
+                await worker.run_once()
+                await api.run_once()
+            return await asyncio.wait_for(follower, timeout=1)
+
+        assert asyncio.run(run())["status"] == "COMPLETED"
+        assert isolated_admission.depth == 0
+        assert worker.scheduler.qsize() == 1
+        with pytest.raises(RuntimeError):
+            frame.get()
+
+    def test_cancel_queued_job(self, job_db):
+        session, _ = job_db
+
+        async def run():
+            await tasks.add_processing_task("req-1", "req-1.jpg")
+            return await tasks.cancel_processing_task("req-1")
+
+        with patch.object(settings, "JOB_QUEUE", "database"), \
+             patch.object(tasks, "job_queue", consumer("api")), \
+             patch.object(tasks, "storage_client") as storage, \
+             patch.object(tasks, "ValidationRequestRepository") as repo:
+            assert asyncio.run(run()) == "CANCELLED"
+
+        assert job_row(session, "req-1") is None
+        assert repo.update_error.call_args.kwargs["status"] == "CANCELLED"
+        storage.delete_file.assert_called_once_with("req-1.jpg")